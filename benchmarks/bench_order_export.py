@@ -0,0 +1,58 @@
+"""
+Throughput (pedidos/s) e pico de memória da exportação de pedidos, por formato,
+com e sem gzip, em dois tamanhos de base para mostrar que a memória não cresce.
+
+    python -m benchmarks.bench_order_export
+"""
+import os
+import time
+import tracemalloc
+from sqlalchemy.orm import sessionmaker
+from benchmarks.fixtures import BENCH_DATABASE_URL, make_engine, make_session, make_order_payload
+
+# core.order_export importa o app (database.py); aponta para o banco do benchmark
+os.environ.setdefault("DATABASE_URL", BENCH_DATABASE_URL)
+from core.order_export import iter_export  # noqa: E402
+from core.order_writer import bulk_insert_order
+
+SIZES = (2000, 8000)
+ITEMS, OPTIONS, CUSTOMIZATIONS = 5, 2, 1
+
+def seed(engine, start, count):
+    db = make_session(engine)
+    for seq in range(start, start + count):
+        bulk_insert_order(make_order_payload(ITEMS, OPTIONS, CUSTOMIZATIONS, seq=seq), "PLACED", db)
+        if seq % 500 == 0:
+            db.commit()
+    db.commit()
+    db.close()
+
+def run(session_factory, fmt, compress):
+    tracemalloc.start()
+    start = time.perf_counter()
+    total = 0
+    for chunk in iter_export(session_factory, [], fmt, compress):
+        total += len(chunk)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, total, peak
+
+def main():
+    engine = make_engine()
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    seeded = 0
+    print(f"{'pedidos':>8} {'formato':<8} {'gzip':<5} {'pedidos/s':>10} {'MB saída':>9} {'pico MB':>8}")
+    for size in SIZES:
+        seed(engine, seeded, size - seeded)
+        seeded = size
+        for fmt in ("ndjson", "csv"):
+            for compress in (False, True):
+                elapsed, total, peak = run(session_factory, fmt, compress)
+                print(
+                    f"{size:>8} {fmt:<8} {'sim' if compress else 'não':<5} {size / elapsed:>10.0f} "
+                    f"{total / 1e6:>9.2f} {peak / 1e6:>8.2f}"
+                )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Custo de escrita e espaço em disco por pedido em cada ORDER_STORAGE_MODE,
+com e sem compressão do payload bruto.
+
+    python -m benchmarks.bench_order_storage
+
+No SQLite o tamanho é páginas usadas x tamanho da página; no Postgres,
+pg_total_relation_size das tabelas de pedidos (com TOAST e índices).
+"""
+import time
+from sqlalchemy import text
+from benchmarks.fixtures import make_engine, make_session, make_order_payload, StatementCounter
+from core.order_writer import bulk_insert_order
+from models.order import Base as OrderBase
+
+CONFIGS = [
+    ("normalized", "none"),
+    ("hybrid", "none"),
+    ("hybrid", "zlib"),
+    ("raw", "none"),
+    ("raw", "zlib"),
+]
+SIZES = [(5, 2, 1), (30, 3, 1)]
+ORDERS = 300
+
+def database_bytes(engine):
+    with engine.connect() as conn:
+        if engine.dialect.name == "postgresql":
+            return sum(
+                conn.execute(text("SELECT pg_total_relation_size(:t)"), {"t": table.name}).scalar()
+                for table in OrderBase.metadata.sorted_tables
+            )
+        page_size = conn.execute(text("PRAGMA page_size")).scalar()
+        used = conn.execute(text("PRAGMA page_count")).scalar() - conn.execute(text("PRAGMA freelist_count")).scalar()
+        return used * page_size
+
+def run(mode, compression, size):
+    engine = make_engine()
+    counter = StatementCounter(engine)
+    db = make_session(engine)
+    baseline = database_bytes(engine)
+    payloads = [make_order_payload(*size, seq=seq) for seq in range(ORDERS)]
+    counter.reset()
+    start = time.perf_counter()
+    for payload in payloads:
+        bulk_insert_order(payload, "PLACED", db, mode=mode, compression=compression)
+        db.commit()
+    elapsed = time.perf_counter() - start
+    trips = counter.count / ORDERS
+    db.close()
+    per_order = (database_bytes(engine) - baseline) / ORDERS
+    engine.dispose()
+    return elapsed / ORDERS * 1000, trips, per_order
+
+def main():
+    print(f"{'itens':>6} {'modo':>11} {'compressão':>11} {'ms/pedido':>10} {'round trips':>12} {'KB/pedido':>10}")
+    for size in SIZES:
+        for mode, compression in CONFIGS:
+            ms, trips, per_order = run(mode, compression, size)
+            print(f"{size[0]:>6} {mode:>11} {compression:>11} {ms:>10.2f} {trips:>12.1f} {per_order / 1024:>10.2f}")
+
+if __name__ == "__main__":
+    main()
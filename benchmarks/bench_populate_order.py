@@ -0,0 +1,37 @@
+"""
+Round trips e tempo por pedido de populate/bulk_insert_order, por tamanho de pedido.
+
+    python -m benchmarks.bench_populate_order
+"""
+import time
+from benchmarks.fixtures import make_engine, make_session, make_order_payload, StatementCounter
+from core.order_writer import bulk_insert_order
+
+SIZES = [(1, 0, 0), (5, 2, 1), (30, 3, 1), (30, 5, 2), (100, 5, 2)]
+REPEAT = 50
+
+def main():
+    engine = make_engine()
+    counter = StatementCounter(engine)
+    db = make_session(engine)
+    seq = 0
+    print(f"{'itens':>6} {'opções':>7} {'custom.':>8} {'linhas':>7} {'round trips':>12} {'ms/pedido':>10}")
+    for n_items, n_options, n_custom in SIZES:
+        payloads = []
+        for _ in range(REPEAT):
+            payloads.append(make_order_payload(n_items, n_options, n_custom, seq=seq))
+            seq += 1
+        rows = 5 + n_items * (1 + n_options * (1 + n_custom))
+        counter.reset()
+        start = time.perf_counter()
+        for payload in payloads:
+            bulk_insert_order(payload, "PLACED", db)
+            db.commit()
+        elapsed = time.perf_counter() - start
+        # descontando o COMMIT, que não passa por before_cursor_execute
+        trips = counter.count / REPEAT
+        print(f"{n_items:>6} {n_options:>7} {n_custom:>8} {rows:>7} {trips:>12.1f} {elapsed / REPEAT * 1000:>10.2f}")
+    db.close()
+
+if __name__ == "__main__":
+    main()
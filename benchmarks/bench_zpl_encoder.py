@@ -0,0 +1,78 @@
+"""
+Tempo e tamanho do ^GFA gerado: loop pixel a pixel antigo x image_to_zpl.
+
+    python -m benchmarks.bench_zpl_encoder
+"""
+import time
+import qrcode
+from PIL import Image, ImageDraw
+from printing.zpl_utils import image_to_zpl
+
+def legacy_pil_to_zpl(image):
+    # Implementação original de pil_to_zpl, mantida aqui como referência
+    width, height = image.size
+    row_bytes = (width + 7) // 8
+    total_bytes = row_bytes * height
+    data = bytearray()
+    pixels = image.load()
+    for y in range(height):
+        byte = 0
+        bits = 0
+        for x in range(width):
+            if pixels[x, y] == 0:  # preto
+                byte |= (1 << (7 - bits))
+            bits += 1
+            if bits == 8:
+                data.append(byte)
+                byte = 0
+                bits = 0
+        if bits > 0:
+            data.append(byte)
+    hex_data = data.hex().upper()
+    return f"^GFA,{total_bytes},{total_bytes},{row_bytes},{hex_data}"
+
+def qr_image():
+    qr = qrcode.QRCode(box_size=1, border=1)
+    qr.add_data("https://lolla.pet/nfe/4f6c9a3e-3a1b-4f1e-9d9a-6c1f0b3e2a10")
+    qr.make(fit=True)
+    return qr.make_image(fill_color="black", back_color="white").convert("1").resize((180, 180), Image.NEAREST)
+
+def artwork_image(size):
+    image = Image.new("L", size, 255)
+    draw = ImageDraw.Draw(image)
+    width, height = size
+    for i in range(0, min(size) // 2, 12):
+        draw.ellipse((i, i, width - i, height - i), outline=0, width=4)
+    draw.rectangle((width // 4, height // 3, width * 3 // 4, height // 2), fill=0)
+    return image.convert("1")
+
+def photo_image(size):
+    # gradiente com dithering: pior caso para run-length
+    image = Image.linear_gradient("L").resize(size)
+    return image.convert("1")
+
+CASES = [
+    ("QR 180x180", qr_image()),
+    ("arte 400x400", artwork_image((400, 400))),
+    ("etiqueta 800x1200", artwork_image((800, 1200))),
+    ("foto 800x1200", photo_image((800, 1200))),
+]
+
+def timed(fn, image, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(image)
+    return (time.perf_counter() - start) / repeat * 1000, len(result)
+
+def main():
+    print(f"{'imagem':<18} {'encoder':<14} {'ms':>9} {'bytes':>9} {'vs antigo':>10}")
+    for name, image in CASES:
+        repeat = 20 if image.size[0] < 500 else 3
+        base_ms, base_bytes = timed(legacy_pil_to_zpl, image, repeat)
+        print(f"{name:<18} {'pixel a pixel':<14} {base_ms:>9.2f} {base_bytes:>9} {'1.00x':>10}")
+        for compression in ("hex", "acs", "z64"):
+            ms, size = timed(lambda img: image_to_zpl(img, compression), image, repeat)
+            print(f"{name:<18} {compression:<14} {ms:>9.2f} {size:>9} {base_ms / ms:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Throughput do rasterizador local de ZPL (PNG/PDF) com a etiqueta iFood.
+
+    python -m benchmarks.bench_zpl_render
+"""
+import time
+from types import SimpleNamespace
+from printing.zpl_render import render_zpl, zpl_to_pdf, zpl_to_png
+from printing.zpl_utils import gerar_zpl_ifood
+
+def make_order(seq):
+    return SimpleNamespace(
+        order_id=f"4f6c9a3e-3a1b-4f1e-9d9a-{seq:012d}",
+        display_id=str(1000 + seq),
+        order_amount=59.9 + seq,
+        customer=SimpleNamespace(name=f"Cliente {seq}"),
+        delivery=SimpleNamespace(
+            address_street="Rua das Flores", address_number=str(seq), address_complement=None,
+            address_neighborhood="Centro", address_city="São Paulo"
+        ),
+    )
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for seq in range(repeat):
+        fn(seq)
+    elapsed = time.perf_counter() - start
+    return elapsed / repeat * 1000, repeat / elapsed
+
+def main():
+    labels = {
+        (qr_mode, graphics_mode): [gerar_zpl_ifood(make_order(i), qr_mode, graphics_mode) for i in range(50)]
+        for qr_mode in ("native", "bitmap") for graphics_mode in ("stored", "inline")
+    }
+    print(f"{'saída':<10} {'qr':<8} {'logo':<8} {'dpmm':>5} {'ms/etiqueta':>12} {'etiquetas/s':>12}")
+    for (qr_mode, graphics_mode), zpls in labels.items():
+        for dpmm in (8, 12):
+            cases = [
+                ("imagem", lambda seq: render_zpl(zpls[seq % len(zpls)], dpmm=dpmm)),
+                ("png", lambda seq: zpl_to_png(zpls[seq % len(zpls)], dpmm=dpmm)),
+                ("pdf", lambda seq: zpl_to_pdf(zpls[seq % len(zpls)], dpmm=dpmm)),
+            ]
+            for name, fn in cases:
+                ms, per_second = timed(fn, 30)
+                print(f"{name:<10} {qr_mode:<8} {graphics_mode:<8} {dpmm:>5} {ms:>12.2f} {per_second:>12.1f}")
+    batch = "\n".join(labels[("native", "stored")])
+    start = time.perf_counter()
+    zpl_to_pdf(batch)
+    elapsed = time.perf_counter() - start
+    print(f"\nPDF com {len(labels[('native', 'stored')])} páginas: {elapsed * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
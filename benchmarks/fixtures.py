@@ -0,0 +1,130 @@
+import os
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from models.order import Base as OrderBase
+
+# Benchmarks rodam em SQLite em memória por padrão; aponte BENCH_DATABASE_URL
+# para um Postgres descartável para medir round trips reais de rede.
+BENCH_DATABASE_URL = os.getenv("BENCH_DATABASE_URL", "sqlite://")
+
+def make_engine(url: str = None):
+    engine = create_engine(url or BENCH_DATABASE_URL)
+    OrderBase.metadata.drop_all(bind=engine)
+    OrderBase.metadata.create_all(bind=engine)
+    return engine
+
+def make_session(engine):
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+class StatementCounter:
+    """
+    Conta os comandos enviados ao banco (cada execute/executemany é um round trip).
+    """
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+    def reset(self):
+        self.count = 0
+
+def make_order_payload(n_items=5, n_options=2, n_customizations=1, seq=0, created_at=None,
+                       merchant_id="merchant-1", customer_id=None, full_code="PLACED"):
+    created_at = created_at or datetime(2026, 1, 1, 12, 0) + timedelta(minutes=seq)
+    items = []
+    for i in range(n_items):
+        options = []
+        for o in range(n_options):
+            options.append({
+                "id": f"opt-{i}-{o}",
+                "name": f"Opção {o}",
+                "type": "ADDITION",
+                "groupName": "Extras",
+                "externalCode": f"EXT-{o}",
+                "quantity": 1,
+                "unit": "UN",
+                "unitPrice": 2.5,
+                "addition": 2.5,
+                "price": 2.5,
+                "customizations": [
+                    {
+                        "id": f"cus-{i}-{o}-{c}",
+                        "externalCode": f"C{c}",
+                        "name": f"Personalização {c}",
+                        "groupName": "Sabor",
+                        "type": "CUSTOM",
+                        "quantity": 1,
+                        "unitPrice": 0.5,
+                        "addition": 0.5,
+                        "price": 0.5
+                    }
+                    for c in range(n_customizations)
+                ]
+            })
+        items.append({
+            "id": f"item-{i}",
+            "uniqueId": str(uuid.uuid4()),
+            "name": f"Ração Premium {i}",
+            "externalCode": f"SKU-{i}",
+            "ean": "7890000000000",
+            "quantity": 1,
+            "unit": "UN",
+            "unitPrice": 49.9,
+            "optionsPrice": 2.5 * n_options,
+            "totalPrice": 49.9 + 2.5 * n_options,
+            "price": 49.9,
+            "observations": "",
+            "type": "DEFAULT",
+            "options": options
+        })
+    return {
+        "id": str(uuid.UUID(int=seq + 1)),
+        "displayId": f"{seq:04d}",
+        "fullCode": full_code,
+        "createdAt": created_at.isoformat() + "Z",
+        "category": "FOOD",
+        "orderTiming": "IMMEDIATE",
+        "orderType": "DELIVERY",
+        "isTest": False,
+        "salesChannel": "IFOOD",
+        "merchant": {"id": merchant_id, "name": "Lollapet"},
+        "customer": {
+            "id": customer_id or f"customer-{seq % 50}",
+            "name": "Maria Silva",
+            "documentNumber": "00000000000",
+            "phone": {"number": "0800 000 0000", "localizer": "12345678"},
+            "ordersCountOnMerchant": 3,
+            "segmentation": "NEW"
+        },
+        "delivery": {
+            "mode": "DEFAULT",
+            "deliveredBy": "IFOOD",
+            "deliveryDateTime": created_at.isoformat() + "Z",
+            "deliveryAddress": {
+                "streetName": "Rua das Flores",
+                "streetNumber": "123",
+                "formattedAddress": "Rua das Flores, 123",
+                "neighborhood": "Centro",
+                "complement": "Apto 12",
+                "postalCode": "01000000",
+                "city": "São Paulo",
+                "state": "SP",
+                "country": "BR",
+                "coordinates": {"latitude": -23.55, "longitude": -46.63}
+            }
+        },
+        "items": items,
+        "payments": [
+            {"value": 120.0, "currency": "BRL", "method": "CREDIT", "prepaid": True, "type": "ONLINE",
+             "card": {"brand": "VISA"}}
+        ],
+        "additionalFees": [
+            {"type": "SMALL_ORDER_FEE", "description": "Taxa", "fullDescription": "Taxa de pedido mínimo",
+             "value": 3.0, "liabilities": [{"name": "IFOOD", "percentage": 100}]}
+        ],
+        "total": {"orderAmount": 120.0, "subTotal": 110.0, "deliveryFee": 7.0, "benefits": 0, "additionalFees": 3.0}
+    }
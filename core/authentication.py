@@ -1,18 +1,46 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from models.user import User, UserCreate, UserUpdate, UserORM
-from database import get_db
+from database import get_async_db, get_db
+from core import metrics
+from core.cache import ReadThroughCache, TTLCache
+from core.password_pool import PasswordPoolFull, password_hash_seconds, password_pool, password_verify_seconds
 from passlib.context import CryptContext
 from jose import jwt, JWTError
 import os
+import time
 
 SECRET_KEY = os.getenv("SECRET_KEY", "changeme")
 ALGORITHM = "HS256"
+# Custo do bcrypt. Hashes com custo menor são refeitos no próximo login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1024"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "30"))  # segundos
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "600"))  # segundos, limitado ao exp do token
+
+# Perfil mínimo (User) por id. É por processo: update_me/delete_me invalidam o
+# processo que os atendeu, o TTL limita o resto.
+user_cache = ReadThroughCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+# Token com assinatura já verificada -> id do usuário
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL)
+
+user_cache_hits = metrics.counter("auth_user_cache_hits", "Requisições autenticadas sem consultar o usuário no banco")
+user_cache_misses = metrics.counter("auth_user_cache_misses", "Requisições autenticadas que consultaram o usuário")
+metrics.gauge("auth_user_cache_hit_rate", lambda: metrics.ratio(user_cache_hits, user_cache_misses))
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="users/token")
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS
+)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
@@ -20,6 +48,25 @@ def get_password_hash(password):
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
+async def hash_password_async(password):
+    return await password_pool.submit(password_hash_seconds, pwd_context.hash, password)
+
+async def verify_and_update_async(plain_password, hashed_password):
+    """
+    (senha confere, hash novo ou None). O hash novo vem quando o atual usa um
+    esquema ou custo desatualizado.
+    """
+    return await password_pool.submit(
+        password_verify_seconds, pwd_context.verify_and_update, plain_password, hashed_password
+    )
+
+def _password_pool_full():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many login attempts in progress, try again shortly",
+        headers={"Retry-After": "1"},
+    )
+
 def create_access_token(data: dict):
     from datetime import datetime, timedelta
     to_encode = data.copy()
@@ -33,10 +80,58 @@ def get_user_by_username(db: Session, username: str):
 def get_user_by_id(db: Session, user_id: int):
     return db.query(UserORM).filter(UserORM.id == user_id).first()
 
-def authenticate_user(db: Session, username: str, password: str):
-    user = get_user_by_username(db, username)
-    if not user or not verify_password(password, user.hashed_password):
+def invalidate_user_cache(user_id: int):
+    user_cache.invalidate(user_id)
+
+def _load_profile(db: Session, user_id: int):
+    user = get_user_by_id(db, user_id)
+    return User.model_validate(user) if user else None
+
+def get_cached_user(db: Session, user_id: int):
+    """
+    Perfil do usuário pelo cache; só vai ao banco na falta (uma carga por id,
+    mesmo com requisições concorrentes). Usuário inexistente não é cacheado.
+    """
+    profile = user_cache.get(user_id)
+    if profile is not None:
+        user_cache_hits.inc()
+        return profile
+    user_cache_misses.inc()
+    return user_cache.get_or_load(user_id, lambda: _load_profile(db, user_id))
+
+def verify_token(token: str):
+    """
+    Id do usuário do token, decodificando o JWT só na primeira vez: a
+    verificação fica em cache até o exp (no máximo TOKEN_CACHE_TTL).
+    Levanta JWTError se a assinatura ou o exp forem inválidos.
+    """
+    user_id = token_cache.get(token)
+    if user_id is not None:
+        return user_id
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    sub = payload.get("sub")
+    if sub is None:
         return None
+    user_id = int(sub)
+    ttl = min(payload.get("exp", 0) - time.time(), TOKEN_CACHE_TTL)
+    if ttl > 0:
+        token_cache.set(token, user_id, ttl=ttl)
+    return user_id
+
+async def authenticate_user(db: AsyncSession, username: str, password: str):
+    """
+    Verifica a senha no pool de senhas e, se o hash estiver desatualizado,
+    grava o hash novo (rehash transparente no login).
+    """
+    user = (await db.execute(select(UserORM).where(UserORM.username == username))).scalar_one_or_none()
+    if not user:
+        return None
+    valid, new_hash = await verify_and_update_async(password, user.hashed_password)
+    if not valid:
+        return None
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
     return user
 
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
@@ -46,22 +141,41 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-        user = get_user_by_id(db, int(user_id))
+        user_id = verify_token(token)
     except JWTError:
         raise credentials_exception
+    if user_id is None:
+        raise credentials_exception
+    user = get_cached_user(db, user_id)
     if user is None:
         raise credentials_exception
+    # Como no original, usuário desativado continua autenticando: é assim que ele
+    # se reativa (PUT /users/me) ou apaga a conta; quem precisar barrar checa `disabled`
+    return user
+
+def get_current_user_orm(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """
+    Para os endpoints que alteram o próprio usuário: carrega a linha do banco
+    (get_current_user devolve só o perfil em cache).
+    """
+    user = get_user_by_id(db, current_user.id)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
 
 @router.post("/register", response_model=User)
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    if get_user_by_username(db, user.username):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    existing = await db.execute(select(UserORM.id).where(UserORM.username == user.username))
+    if existing.first():
         raise HTTPException(status_code=400, detail="Username already registered")
-    hashed_password = get_password_hash(user.password)
+    try:
+        hashed_password = await hash_password_async(user.password)
+    except PasswordPoolFull:
+        raise _password_pool_full()
     db_user = UserORM(
         username=user.username,
         email=user.email,
@@ -70,24 +184,27 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
         disabled=False
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @router.post("/token")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    try:
+        user = await authenticate_user(db, form_data.username, form_data.password)
+    except PasswordPoolFull:
+        raise _password_pool_full()
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect username or password")
     access_token = create_access_token(data={"sub": str(user.id)})
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=User)
-def read_me(current_user: UserORM = Depends(get_current_user)):
+def read_me(current_user: User = Depends(get_current_user)):
     return current_user
 
 @router.put("/me", response_model=User)
-def update_me(user_update: UserUpdate, db: Session = Depends(get_db), current_user: UserORM = Depends(get_current_user)):
+def update_me(user_update: UserUpdate, db: Session = Depends(get_db), current_user: UserORM = Depends(get_current_user_orm)):
     if user_update.email is not None:
         current_user.email = user_update.email
     if user_update.full_name is not None:
@@ -95,11 +212,13 @@ def update_me(user_update: UserUpdate, db: Session = Depends(get_db), current_us
     if user_update.disabled is not None:
         current_user.disabled = user_update.disabled
     db.commit()
+    invalidate_user_cache(current_user.id)
     db.refresh(current_user)
     return current_user
 
 @router.delete("/me")
-def delete_me(db: Session = Depends(get_db), current_user: UserORM = Depends(get_current_user)):
+def delete_me(db: Session = Depends(get_db), current_user: UserORM = Depends(get_current_user_orm)):
     db.delete(current_user)
     db.commit()
+    invalidate_user_cache(current_user.id)
     return {"success": True}
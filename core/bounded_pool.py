@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from core import metrics
+
+class PoolFull(Exception):
+    pass
+
+def _timed_call(fn, args):
+    # Roda no worker (thread ou processo); mede só o tempo de execução de `fn`
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+class BoundedPool:
+    """
+    Executor dedicado (threads ou processos) para trabalho pesado fora do event
+    loop, com fila limitada a `max_pending`: acima disso submit() rejeita na hora
+    com `full_error` em vez de acumular espera.
+
+    As métricas usam `name` como prefixo: <name>_pending, <name>_queue_wait_seconds
+    e <name>_rejected. No modo "process", `fn` e os argumentos precisam ser
+    serializáveis (pickle).
+    """
+    def __init__(self, name: str, workers: int, max_pending: int, kind: str = "thread",
+                 full_error=PoolFull):
+        self.name = name
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self.full_error = full_error
+        self.pending = 0
+        self._executor = None
+        self.queue_wait = metrics.histogram(f"{name}_queue_wait_seconds", f"Tempo na fila do pool {name}")
+        self.rejected = metrics.counter(f"{name}_rejected", f"Tarefas rejeitadas com a fila do pool {name} cheia")
+        metrics.gauge(f"{name}_pending", lambda: self.pending)
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix=self.name.replace("_", "-")
+                )
+        return self._executor
+
+    async def start(self):
+        executor = self._get_executor()
+        if self.kind == "process":
+            # Sobe os processos agora, e não na primeira tarefa
+            await asyncio.gather(*[
+                asyncio.get_running_loop().run_in_executor(executor, time.sleep, 0)
+                for _ in range(self.workers)
+            ])
+        logging.info(
+            f"Pool {self.name}: {self.workers} workers ({self.kind}), até {self.max_pending} pendentes."
+        )
+
+    async def stop(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    async def submit(self, histogram, fn, *args):
+        """
+        Roda `fn(*args)` no pool e registra o tempo de execução em `histogram`.
+        Levanta `full_error` se a fila estiver cheia.
+        """
+        if self.pending >= self.max_pending:
+            self.rejected.inc()
+            raise self.full_error(f"Fila do pool {self.name} cheia ({self.pending} pendentes)")
+        self.pending += 1
+        enqueued_at = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result, elapsed = await loop.run_in_executor(self._get_executor(), _timed_call, fn, args)
+        finally:
+            self.pending -= 1
+        histogram.observe(elapsed)
+        self.queue_wait.observe(max(0.0, time.perf_counter() - enqueued_at - elapsed))
+        return result
@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+class TTLCache:
+    """
+    Cache LRU em memória com expiração por TTL, seguro entre threads
+    (os endpoints síncronos rodam no threadpool do FastAPI).
+    """
+    def __init__(self, maxsize: int = 1024, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or entry[0] < time.monotonic():
+                if entry is not _MISSING:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl: float = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+class ReadThroughCache(TTLCache):
+    """
+    TTLCache que carrega valores ausentes com `loader()`. Chamadas concorrentes
+    para a mesma chave esperam uma única carga (single-flight). Uma invalidação
+    que chega durante a carga descarta o resultado em vez de gravá-lo no cache.
+    """
+    def __init__(self, maxsize: int = 1024, ttl: float = 30.0):
+        super().__init__(maxsize, ttl)
+        self._inflight = {}
+        self._generations = {}
+        self._flight_lock = threading.Lock()
+
+    def get_or_load(self, key, loader):
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        with self._flight_lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = {"event": threading.Event(), "value": None, "error": None}
+                self._inflight[key] = flight
+                generation = self._generations.get(key, 0)
+
+        if not leader:
+            flight["event"].wait()
+            if flight["error"] is not None:
+                raise flight["error"]
+            return flight["value"]
+
+        try:
+            value = loader()
+            flight["value"] = value
+            with self._flight_lock:
+                if value is not None and self._generations.get(key, 0) == generation:
+                    self.set(key, value)
+            return value
+        except Exception as exc:
+            flight["error"] = exc
+            raise
+        finally:
+            with self._flight_lock:
+                self._inflight.pop(key, None)
+            flight["event"].set()
+
+    def invalidate(self, key):
+        with self._flight_lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            if len(self._generations) > self.maxsize * 4:
+                # só importa enquanto há carga em andamento para a chave
+                self._generations = {k: v for k, v in self._generations.items() if k in self._inflight}
+            super().invalidate(key)
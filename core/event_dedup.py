@@ -0,0 +1,129 @@
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from core import metrics
+from core.retention import delete_in_batches, register_purge
+from core.sql import dialect_insert
+from models.webhook import ProcessedEventORM
+
+# Quantas chaves de eventos já processados ficam na memória, por processo
+EVENT_DEDUP_MEMORY_SIZE = int(os.getenv("EVENT_DEDUP_MEMORY_SIZE", "50000"))
+# Por quanto tempo um evento processado fica em processed_events. Precisa
+# cobrir a janela de reentrega do marketplace; depois disso a linha é apagada
+EVENT_DEDUP_RETENTION_HOURS = float(os.getenv("EVENT_DEDUP_RETENTION_HOURS", "168"))
+
+events_unique = metrics.counter("webhook_events_unique", "Eventos de webhook processados pela primeira vez")
+events_duplicate_memory = metrics.counter(
+    "webhook_events_duplicate_memory", "Reentregas descartadas pelo filtro em memória, sem ir ao banco"
+)
+events_duplicate_db = metrics.counter(
+    "webhook_events_duplicate_db", "Reentregas descartadas pela constraint de processed_events"
+)
+
+def _duplicate_rate():
+    duplicates = events_duplicate_memory.value + events_duplicate_db.value
+    total = duplicates + events_unique.value
+    return round(duplicates / total, 4) if total else None
+
+metrics.gauge("webhook_events_duplicate_rate", _duplicate_rate)
+
+def ifood_event_key(payload: dict):
+    """
+    Id do evento iFood. Payloads sem id próprio (só orderId, ou o "id" é o do
+    pedido) usam order_id:fullCode, já que um pedido não passa duas vezes pelo
+    mesmo status.
+    """
+    if payload.get("orderId") and payload.get("id"):
+        return str(payload["id"])
+    order_id = payload.get("orderId") or payload.get("id")
+    event_type = payload.get("fullCode") or payload.get("eventType") or payload.get("status")
+    return f"{order_id}:{event_type}"
+
+class EventDeduplicator:
+    """
+    Idempotência dos webhooks: a tabela processed_events (unique em source +
+    event_key) é a fonte da verdade, e um LRU exato em memória com as chaves
+    já gravadas descarta as reentregas conhecidas sem consultar o banco.
+    """
+    def __init__(self, maxsize: int = EVENT_DEDUP_MEMORY_SIZE):
+        self.maxsize = maxsize
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+        metrics.gauge("webhook_events_dedup_memory_keys", lambda: len(self._seen))
+
+    def seen(self, source: str, event_key: str):
+        """
+        True se a chave já foi processada por este processo. Conta como duplicado.
+        """
+        with self._lock:
+            if (source, event_key) not in self._seen:
+                return False
+            self._seen.move_to_end((source, event_key))
+        events_duplicate_memory.inc()
+        return True
+
+    def remember(self, source: str, event_key: str):
+        with self._lock:
+            self._seen[(source, event_key)] = None
+            self._seen.move_to_end((source, event_key))
+            while len(self._seen) > self.maxsize:
+                self._seen.popitem(last=False)
+
+    async def claim(self, db: AsyncSession, source: str, event_key: str, order_id=None, event_type=None):
+        """
+        Reserva o evento dentro da transação corrente. Retorna False se é
+        duplicado. A reserva vale quando a transação do processamento for
+        commitada; se o processamento falhar, chame release().
+        """
+        if self.seen(source, event_key):
+            return False
+        insert = dialect_insert(db)
+        stmt = insert(ProcessedEventORM).values(
+            source=source,
+            event_key=event_key,
+            order_id=order_id,
+            event_type=event_type,
+            processed_at=datetime.utcnow()
+        ).on_conflict_do_nothing(index_elements=["source", "event_key"])
+        result = await db.execute(stmt)
+        if result.rowcount == 0:
+            events_duplicate_db.inc()
+            self.remember(source, event_key)
+            return False
+        return True
+
+    def confirm(self, source: str, event_key: str):
+        """
+        Chamado depois do commit do processamento: a partir daqui o filtro em
+        memória já descarta as reentregas.
+        """
+        events_unique.inc()
+        self.remember(source, event_key)
+
+    async def release(self, db: AsyncSession, source: str, event_key: str):
+        """
+        Desfaz a reserva de um evento cujo processamento falhou, para que a
+        reentrega (ou o retry da fila) possa processá-lo.
+        """
+        await db.rollback()
+        await db.execute(
+            delete(ProcessedEventORM)
+            .filter_by(source=source, event_key=event_key)
+        )
+        await db.commit()
+
+event_dedup = EventDeduplicator()
+
+async def purge_processed_events(db: AsyncSession, retention_hours: float = None):
+    """
+    Apaga as marcas de eventos processados há mais que a retenção; reentregas
+    tão atrasadas não chegam mais.
+    """
+    hours = EVENT_DEDUP_RETENTION_HOURS if retention_hours is None else retention_hours
+    cutoff = datetime.utcnow() - timedelta(hours=hours)
+    return await delete_in_batches(db, ProcessedEventORM, ProcessedEventORM.processed_at < cutoff)
+
+register_purge("processed_events", purge_processed_events)
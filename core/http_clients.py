@@ -0,0 +1,76 @@
+import logging
+import os
+import httpx
+
+def _upstream_config(name: str, max_connections: int, max_keepalive: int, timeout: float):
+    prefix = f"HTTP_{name.upper()}_"
+    return {
+        "max_connections": int(os.getenv(prefix + "MAX_CONNECTIONS", str(max_connections))),
+        "max_keepalive_connections": int(os.getenv(prefix + "MAX_KEEPALIVE", str(max_keepalive))),
+        "keepalive_expiry": float(os.getenv(prefix + "KEEPALIVE_EXPIRY", "30")),
+        "timeout": float(os.getenv(prefix + "TIMEOUT", str(timeout))),
+        "connect_timeout": float(os.getenv(prefix + "CONNECT_TIMEOUT", "5")),
+        "http2": os.getenv(prefix + "HTTP2", "false").lower() in ("1", "true", "yes"),
+    }
+
+# Limites e timeouts por upstream; todos sobrescrevíveis por variáveis de
+# ambiente, ex.: HTTP_IFOOD_MAX_CONNECTIONS=50, HTTP_PRINTNODE_HTTP2=true
+UPSTREAMS = {
+    "ifood": _upstream_config("ifood", max_connections=50, max_keepalive=20, timeout=10),
+    "printnode": _upstream_config("printnode", max_connections=20, max_keepalive=10, timeout=15),
+    "labelary": _upstream_config("labelary", max_connections=10, max_keepalive=5, timeout=20),
+}
+
+def _http2_available():
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+class HttpClientRegistry:
+    """
+    Um httpx.AsyncClient por upstream, compartilhado pela aplicação inteira para
+    reaproveitar conexões (keep-alive, sessão TLS). Criado e fechado pelo lifespan
+    do FastAPI; fora dele (scripts, testes) o cliente é criado sob demanda.
+    """
+    def __init__(self, upstreams: dict):
+        self.upstreams = upstreams
+        self._clients = {}
+
+    def _create(self, name: str):
+        config = self.upstreams[name]
+        http2 = config["http2"]
+        if http2 and not _http2_available():
+            logging.warning(f"HTTP/2 pedido para '{name}', mas o pacote h2 não está instalado; usando HTTP/1.1.")
+            http2 = False
+        return httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=config["max_connections"],
+                max_keepalive_connections=config["max_keepalive_connections"],
+                keepalive_expiry=config["keepalive_expiry"],
+            ),
+            timeout=httpx.Timeout(config["timeout"], connect=config["connect_timeout"]),
+            http2=http2,
+        )
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._create(name)
+            self._clients[name] = client
+        return client
+
+    async def start(self):
+        for name in self.upstreams:
+            self.get(name)
+
+    async def aclose(self):
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+http_clients = HttpClientRegistry(UPSTREAMS)
+
+def get_http_client(name: str) -> httpx.AsyncClient:
+    return http_clients.get(name)
@@ -0,0 +1,91 @@
+import bisect
+import threading
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Counter:
+    def __init__(self, description: str = ""):
+        self.description = description
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+class Histogram:
+    """
+    Histograma com buckets fixos (em segundos, por padrão), no estilo Prometheus.
+    """
+    def __init__(self, description: str = "", buckets=DEFAULT_BUCKETS):
+        self.description = description
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self._lock:
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            return {
+                "count": self.count,
+                "sum": round(self.sum, 6),
+                "avg": round(self.sum / self.count, 6) if self.count else None,
+                "buckets": buckets
+            }
+
+class Gauge:
+    """
+    Valor calculado na hora da leitura por `fn()` (ex.: tamanho de fila, taxa de acerto).
+    """
+    def __init__(self, fn, description: str = ""):
+        self.description = description
+        self.fn = fn
+
+    def snapshot(self):
+        return self.fn()
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+def _get_or_create(name, factory):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = factory()
+            _registry[name] = metric
+        return metric
+
+def counter(name: str, description: str = ""):
+    return _get_or_create(name, lambda: Counter(description))
+
+def histogram(name: str, description: str = "", buckets=DEFAULT_BUCKETS):
+    return _get_or_create(name, lambda: Histogram(description, buckets))
+
+def gauge(name: str, fn, description: str = ""):
+    with _registry_lock:
+        _registry[name] = Gauge(fn, description)
+        return _registry[name]
+
+def ratio(hits: Counter, misses: Counter):
+    total = hits.value + misses.value
+    return round(hits.value / total, 4) if total else None
+
+def snapshot():
+    with _registry_lock:
+        metrics = dict(_registry)
+    return {name: metric.snapshot() for name, metric in sorted(metrics.items())}
@@ -0,0 +1,9 @@
+from fastapi import APIRouter, Depends
+from core.authentication import get_current_user
+from core.metrics import snapshot
+
+router = APIRouter()
+
+@router.get("")
+def read_metrics(user=Depends(get_current_user)):
+    return snapshot()
@@ -1,38 +1,125 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database import get_db
+from datetime import datetime
+from types import SimpleNamespace
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Response
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, selectinload
+from database import get_async_db, get_db
 from core.authentication import get_current_user  # Adicione esta linha
-from models.order import (
-    OrderORM, OrderMerchantORM, OrderCustomerORM, OrderDeliveryORM,
-    OrderItemORM, OrderItemOptionORM, OrderItemCustomizationORM,
-    OrderPaymentORM, OrderAdditionalFeeORM
+from core.cache import ReadThroughCache
+from core.order_storage import raw_payload, stores_raw
+from core.order_writer import (
+    customer_row, customization_row, delivery_row, fee_row, item_row, merchant_row, option_row, payment_row
 )
+from models.order import OrderArchiveORM, OrderORM, OrderItemORM, OrderItemOptionORM, OrderMerchantORM
+from printing.label_cache import label_cache, label_cache_key
+from printing.render_pool import RenderPoolFull, gerar_zpl_ifood_async
+from printing.zpl_utils import LABEL_SIZE
+import base64
+import hashlib
+import json
+import os
+import zlib
 
 router = APIRouter()
 
-@router.get("/{order_id}")
-def get_order_by_id(
-    order_id: str,
-    db: Session = Depends(get_db),
-    user=Depends(get_current_user)  # Protege o endpoint com autenticação
-):
-    order = db.query(OrderORM).filter_by(order_id=order_id).first()
-    if not order:
-        raise HTTPException(status_code=404, detail="Pedido não encontrado")
+ORDER_CACHE_SIZE = int(os.getenv("ORDER_CACHE_SIZE", "1024"))
+ORDER_CACHE_TTL = float(os.getenv("ORDER_CACHE_TTL", "30"))  # segundos
+ORDER_LIST_MAX_LIMIT = int(os.getenv("ORDER_LIST_MAX_LIMIT", "200"))
+
+# Payload serializado + ETag por order_id. É por processo: a invalidação do
+# webhook só alcança o processo que o recebeu, o TTL limita o resto.
+order_cache = ReadThroughCache(maxsize=ORDER_CACHE_SIZE, ttl=ORDER_CACHE_TTL)
 
-    merchant = db.query(OrderMerchantORM).filter_by(id=order.merchant_id).first()
-    customer = db.query(OrderCustomerORM).filter_by(id=order.customer_id).first()
-    delivery = db.query(OrderDeliveryORM).filter_by(id=order.delivery_id).first()
-    items = db.query(OrderItemORM).filter_by(order_id=order.id).all()
-    payments = db.query(OrderPaymentORM).filter_by(order_id=order.id).all()
-    additional_fees = db.query(OrderAdditionalFeeORM).filter_by(order_id=order.id).all()
+def invalidate_order_cache(order_id: str):
+    order_cache.invalidate(order_id)
+
+# A etiqueta só precisa de customer e delivery
+LABEL_GRAPH = (joinedload(OrderORM.customer), joinedload(OrderORM.delivery))
+
+LABEL_MEDIA_TYPES = {
+    "zpl": "application/zpl",
+    "png": "image/png",
+    "pdf": "application/pdf",
+}
+
+def order_graph_options():
+    """
+    Carrega o grafo completo do pedido em número constante de queries:
+    merchant/customer/delivery no mesmo SELECT do pedido (JOIN) e uma query
+    por nível para itens, opções, personalizações, pagamentos e taxas.
+    """
+    return (
+        joinedload(OrderORM.merchant),
+        joinedload(OrderORM.customer),
+        joinedload(OrderORM.delivery),
+        selectinload(OrderORM.items)
+        .selectinload(OrderItemORM.options)
+        .selectinload(OrderItemOptionORM.customizations),
+        selectinload(OrderORM.payments),
+        selectinload(OrderORM.additional_fees),
+    )
+
+def load_order(db: Session, order_id: str):
+    return (
+        db.query(OrderORM)
+        .options(*order_graph_options())
+        .filter_by(order_id=order_id)
+        .first()
+    )
+
+async def load_order_async(db: AsyncSession, order_id: str, options=None):
+    """
+    Versão async de load_order. `options` troca o grafo carregado (ex.: só
+    customer e delivery para a etiqueta); relacionamentos não carregados aqui
+    não podem ser acessados depois, pois lazy load não funciona em AsyncSession.
+    """
+    stmt = (
+        select(OrderORM)
+        .options(*(order_graph_options() if options is None else options))
+        .filter_by(order_id=order_id)
+    )
+    return (await db.execute(stmt)).scalars().first()
+
+def _raw_graph(raw: dict):
+    """
+    Payload bruto convertido nas mesmas linhas que o writer grava nas tabelas
+    normalizadas, com os atributos do ORM: a resposta sai no mesmo formato
+    (campos, datas) qualquer que seja a fonte do pedido.
+    """
+    merchant = merchant_row(raw.get("merchant") or {})
+    customer = customer_row(raw.get("customer") or {})
+    items = [
+        SimpleNamespace(**item_row(item, idx), options=[
+            SimpleNamespace(**option_row(option, oidx), customizations=[
+                SimpleNamespace(**customization_row(customization))
+                for customization in option.get("customizations", [])
+            ])
+            for oidx, option in enumerate(item.get("options", []))
+        ])
+        for idx, item in enumerate(raw.get("items") or [])
+    ]
+    return SimpleNamespace(
+        merchant=SimpleNamespace(**merchant) if merchant["merchant_id"] is not None else None,
+        customer=SimpleNamespace(**customer) if customer["customer_id"] is not None else None,
+        delivery=SimpleNamespace(**delivery_row(raw.get("delivery") or {})),
+        items=items,
+        payments=[SimpleNamespace(**payment_row(p)) for p in raw.get("payments") or [] if isinstance(p, dict)],
+        additional_fees=[SimpleNamespace(**fee_row(f)) for f in raw.get("additionalFees") or []],
+    )
+
+def _normalized_sections(order: OrderORM):
+    merchant = order.merchant
+    customer = order.customer
+    delivery = order.delivery
+    payments = order.payments
+    additional_fees = order.additional_fees
 
     items_payload = []
-    for item in items:
-        options = db.query(OrderItemOptionORM).filter_by(item_id=item.id).all()
+    for item in order.items:
         options_payload = []
-        for option in options:
-            customizations = db.query(OrderItemCustomizationORM).filter_by(option_id=option.id).all()
+        for option in item.options:
+            customizations = option.customizations
             options_payload.append({
                 "id": option.option_id,
                 "name": option.name,
@@ -79,17 +166,7 @@ def get_order_by_id(
             "options": options_payload
         })
 
-    payload = {
-        "id": order.order_id,
-        "displayId": order.display_id,
-        "createdAt": order.created_at.isoformat() if order.created_at else None,
-        "category": order.category,
-        "orderTiming": order.order_timing,
-        "orderType": order.order_type,
-        "preparationStartDateTime": order.preparation_start.isoformat() if order.preparation_start else None,
-        "isTest": order.is_test,
-        "salesChannel": order.sales_channel,
-        "fullCode": order.status,
+    return {
         "merchant": {
             "id": merchant.merchant_id,
             "name": merchant.name
@@ -151,7 +228,30 @@ def get_order_by_id(
                 "liabilities": f.liabilities
             }
             for f in additional_fees
-        ],
+        ]
+    }
+
+def serialize_order(order: OrderORM, include_details: bool = True):
+    """
+    Pedido no formato da API. Os campos da linha de orders (inclusive o status
+    atual) vêm sempre das colunas; as seções aninhadas vêm do payload bruto se
+    ele foi gravado e carregado, senão das tabelas normalizadas.
+    """
+    raw = raw_payload(order)
+    sections = _normalized_sections(_raw_graph(raw) if raw is not None else order)
+
+    payload = {
+        "id": order.order_id,
+        "displayId": order.display_id,
+        "createdAt": order.created_at.isoformat() if order.created_at else None,
+        "category": order.category,
+        "orderTiming": order.order_timing,
+        "orderType": order.order_type,
+        "preparationStartDateTime": order.preparation_start.isoformat() if order.preparation_start else None,
+        "isTest": order.is_test,
+        "salesChannel": order.sales_channel,
+        "fullCode": order.status,
+        **sections,
         "total": {
             "orderAmount": order.order_amount,
             "subTotal": order.sub_total,
@@ -159,7 +259,197 @@ def get_order_by_id(
             "benefits": order.benefits,
             "additionalFees": order.additional_fees_total
         },
-        "details": order.details
     }
+    if include_details:
+        payload["details"] = raw
 
     return payload
+
+def load_stored_order(db: Session, order_id: str):
+    """
+    Carrega o pedido pela fonte mais barata: onde o payload bruto é gravado,
+    só a linha de orders (uma query, sem joins); no modo normalized, ou para
+    pedidos gravados sem o bruto, o grafo completo.
+    """
+    if not stores_raw():
+        return load_order(db, order_id)
+    order = db.query(OrderORM).filter_by(order_id=order_id).first()
+    if order is None or raw_payload(order) is not None:
+        return order
+    return load_order(db, order_id)
+
+def order_body(order: OrderORM):
+    return json.dumps(serialize_order(order), ensure_ascii=False, separators=(",", ":")).encode()
+
+def load_archived_body(db: Session, order_id: str):
+    """
+    Corpo gravado no arquivo de pedidos finalizados (core.order_archive), ou None.
+    """
+    stored = db.execute(
+        select(OrderArchiveORM.body).where(OrderArchiveORM.order_id == order_id).limit(1)
+    ).scalar()
+    return zlib.decompress(stored) if stored is not None else None
+
+def _load_order_body(db: Session, order_id: str):
+    order = load_stored_order(db, order_id)
+    if order:
+        body = order_body(order)
+    else:
+        body = load_archived_body(db, order_id)
+        if body is None:
+            return None
+    etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+    return body, etag
+
+def _etag_matches(if_none_match: str, etag: str):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in candidates
+
+def _preview_pool_full():
+    return HTTPException(
+        status_code=503,
+        detail="Too many label previews in progress, try again shortly",
+        headers={"Retry-After": "1"},
+    )
+
+# Colunas da listagem; details (payload completo) fica de fora
+ORDER_SUMMARY_COLUMNS = (
+    OrderORM.id, OrderORM.order_id, OrderORM.display_id, OrderORM.created_at, OrderORM.status,
+    OrderORM.order_type, OrderORM.sales_channel, OrderORM.order_amount, OrderMerchantORM.merchant_id,
+)
+
+def encode_cursor(created_at: datetime, pk: int):
+    raw = f"{created_at.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, pk = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(pk)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+def order_filters(status=None, merchant_id=None, order_type=None, created_from=None, created_to=None):
+    criteria = []
+    if status:
+        criteria.append(OrderORM.status == status)
+    if merchant_id:
+        # Filtra pela FK (índice em orders), resolvendo o id externo numa subquery
+        criteria.append(OrderORM.merchant_id == (
+            select(OrderMerchantORM.id).where(OrderMerchantORM.merchant_id == merchant_id).scalar_subquery()
+        ))
+    if order_type:
+        criteria.append(OrderORM.order_type == order_type)
+    if created_from:
+        criteria.append(OrderORM.created_at >= created_from)
+    if created_to:
+        criteria.append(OrderORM.created_at < created_to)
+    return criteria
+
+def list_orders_query(status=None, merchant_id=None, order_type=None, created_from=None, created_to=None):
+    """
+    SELECT da listagem, mais recentes primeiro. Pedidos sem created_at ficam de
+    fora, pois não têm posição na paginação.
+    """
+    return (
+        select(*ORDER_SUMMARY_COLUMNS)
+        .outerjoin(OrderMerchantORM, OrderORM.merchant_id == OrderMerchantORM.id)
+        .where(OrderORM.created_at.is_not(None))
+        .where(*order_filters(status, merchant_id, order_type, created_from, created_to))
+        .order_by(OrderORM.created_at.desc(), OrderORM.id.desc())
+    )
+
+def serialize_order_summary(row):
+    return {
+        "id": row.order_id,
+        "displayId": row.display_id,
+        "createdAt": row.created_at.isoformat() if row.created_at else None,
+        "fullCode": row.status,
+        "orderType": row.order_type,
+        "salesChannel": row.sales_channel,
+        "merchantId": row.merchant_id,
+        "orderAmount": row.order_amount,
+    }
+
+@router.get("")
+def list_orders(
+    status: str = None,
+    merchant_id: str = None,
+    order_type: str = None,
+    created_from: datetime = None,
+    created_to: datetime = None,
+    cursor: str = None,
+    limit: int = Query(50, ge=1),
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user)
+):
+    """
+    Lista pedidos com paginação por cursor (keyset em created_at, id): cada
+    página é uma busca no índice a partir do último pedido da anterior, com o
+    mesmo custo em qualquer profundidade. Passe `next_cursor` em `cursor`.
+    """
+    limit = min(limit, ORDER_LIST_MAX_LIMIT)
+    stmt = list_orders_query(status, merchant_id, order_type, created_from, created_to)
+    if cursor:
+        stmt = stmt.where(tuple_(OrderORM.created_at, OrderORM.id) < tuple_(*decode_cursor(cursor)))
+    rows = db.execute(stmt.limit(limit + 1)).all()
+    next_cursor = encode_cursor(rows[limit - 1].created_at, rows[limit - 1].id) if len(rows) > limit else None
+    return {"items": [serialize_order_summary(row) for row in rows[:limit]], "next_cursor": next_cursor}
+
+@router.get("/{order_id}/label")
+async def get_order_label(
+    order_id: str,
+    format: str = Query("pdf", pattern="^(zpl|png|pdf)$"),
+    dpmm: int = Query(8, ge=6, le=24),
+    if_none_match: str = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(get_current_user)
+):
+    order = await load_order_async(db, order_id, options=LABEL_GRAPH)
+    if not order:
+        raise HTTPException(status_code=404, detail="Pedido não encontrado")
+    # Logo inline: o ZPL baixado imprime em qualquer impressora, sem ~DG prévio
+    try:
+        zpl = await gerar_zpl_ifood_async(order, graphics_mode="inline", preview=True)
+    except RenderPoolFull:
+        raise _preview_pool_full()
+    width_mm, _, height_mm = LABEL_SIZE.partition("x")
+    key = label_cache_key(zpl, format, int(width_mm), int(height_mm), dpmm)
+    etag = f'"{key}"'
+    headers = {
+        "ETag": etag,
+        # O mesmo pedido pode gerar outra etiqueta se os dados mudarem; revalida sempre
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": f'inline; filename="etiqueta-{order.display_id or order_id}.{format}"',
+    }
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    if format == "zpl":
+        content = zpl.encode()
+    else:
+        try:
+            content = await label_cache.get_or_render(key, format, zpl, int(width_mm), int(height_mm), dpmm)
+        except RenderPoolFull:
+            raise _preview_pool_full()
+    return Response(content=content, media_type=LABEL_MEDIA_TYPES[format], headers=headers)
+
+@router.get("/{order_id}")
+def get_order_by_id(
+    order_id: str,
+    if_none_match: str = Header(None),
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user)  # Protege o endpoint com autenticação
+):
+    cached = order_cache.get_or_load(order_id, lambda: _load_order_body(db, order_id))
+    if cached is None:
+        raise HTTPException(status_code=404, detail="Pedido não encontrado")
+    body, etag = cached
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
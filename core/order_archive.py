@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import os
+import time
+import zlib
+from datetime import datetime, timedelta
+from sqlalchemy import delete, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from core import metrics
+from core.order import invalidate_order_cache, order_body, order_graph_options
+from database import AsyncSessionLocal
+from models.order import (
+    OrderArchiveORM, OrderORM, OrderDeliveryORM, OrderItemORM, OrderItemOptionORM,
+    OrderItemCustomizationORM, OrderPaymentORM, OrderAdditionalFeeORM
+)
+
+# Pedidos finalizados há mais que isso saem de orders para orders_archive; 0 desliga
+ORDER_ARCHIVE_AFTER_DAYS = int(os.getenv("ORDER_ARCHIVE_AFTER_DAYS", "90"))
+ORDER_ARCHIVE_STATUSES = tuple(
+    status.strip() for status in os.getenv("ORDER_ARCHIVE_STATUSES", "delivered,concluded,cancelled").split(",")
+)
+ORDER_ARCHIVE_BATCH = int(os.getenv("ORDER_ARCHIVE_BATCH", "500"))
+ORDER_ARCHIVE_INTERVAL = float(os.getenv("ORDER_ARCHIVE_INTERVAL", "3600"))  # segundos
+
+orders_archived = metrics.counter("orders_archived", "Pedidos movidos para orders_archive")
+archive_batch_seconds = metrics.histogram("order_archive_batch_seconds", "Tempo de cada lote do arquivamento")
+
+# Partições mensais já garantidas por este processo
+_partitions = set()
+
+def _month_start(value: datetime):
+    return datetime(value.year, value.month, 1)
+
+def _next_month(month: datetime):
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+async def ensure_archive_partitions(db: AsyncSession, dates):
+    """
+    Cria (se faltar) a partição mensal de orders_archive de cada data, na
+    transação corrente. Só no Postgres; nos outros bancos a tabela não é
+    particionada. Retorna os meses tocados, para marcar depois do commit.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return set()
+    months = {_month_start(value) for value in dates} - _partitions
+    for month in sorted(months):
+        await db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS orders_archive_{month:%Y_%m} PARTITION OF orders_archive "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_next_month(month):%Y-%m-%d}')"
+        ))
+    return months
+
+async def _delete_orders(db: AsyncSession, order_pks, delivery_pks):
+    # Em lote, de baixo para cima; cliente e loja são compartilhados e ficam
+    items = select(OrderItemORM.id).where(OrderItemORM.order_id.in_(order_pks))
+    options = select(OrderItemOptionORM.id).where(OrderItemOptionORM.item_id.in_(items))
+    for stmt in (
+        delete(OrderItemCustomizationORM).where(OrderItemCustomizationORM.option_id.in_(options)),
+        delete(OrderItemOptionORM).where(OrderItemOptionORM.item_id.in_(items)),
+        delete(OrderItemORM).where(OrderItemORM.order_id.in_(order_pks)),
+        delete(OrderPaymentORM).where(OrderPaymentORM.order_id.in_(order_pks)),
+        delete(OrderAdditionalFeeORM).where(OrderAdditionalFeeORM.order_id.in_(order_pks)),
+        delete(OrderORM).where(OrderORM.id.in_(order_pks)),
+        delete(OrderDeliveryORM).where(OrderDeliveryORM.id.in_(delivery_pks)),
+    ):
+        await db.execute(stmt.execution_options(synchronize_session=False))
+
+async def archive_batch(db: AsyncSession, cutoff: datetime, limit: int = ORDER_ARCHIVE_BATCH):
+    """
+    Move até `limit` pedidos finalizados criados antes de `cutoff` para
+    orders_archive, numa transação: grava o corpo da resposta de GET
+    /orders/{id} comprimido e apaga o pedido e seus filhos. SKIP LOCKED deixa
+    vários processos rodarem o job sem pegar os mesmos pedidos.
+    Retorna quantos pedidos foram arquivados.
+    """
+    stmt = (
+        select(OrderORM)
+        .options(*order_graph_options())
+        .where(OrderORM.status.in_(ORDER_ARCHIVE_STATUSES), OrderORM.created_at < cutoff)
+        .order_by(OrderORM.created_at)
+        .limit(limit)
+        .with_for_update(of=OrderORM, skip_locked=True)
+    )
+    orders = (await db.execute(stmt)).scalars().all()
+    if not orders:
+        return 0
+
+    archived_at = datetime.utcnow()
+    rows = [
+        {
+            "order_id": order.order_id,
+            "created_at": order.created_at,
+            "status": order.status,
+            "display_id": order.display_id,
+            "merchant_id": order.merchant.merchant_id if order.merchant else None,
+            "order_amount": order.order_amount,
+            "archived_at": archived_at,
+            "body": zlib.compress(order_body(order), 6),
+        }
+        for order in orders
+    ]
+    months = await ensure_archive_partitions(db, [row["created_at"] for row in rows])
+    await db.execute(insert(OrderArchiveORM), rows)
+    await _delete_orders(
+        db, [order.id for order in orders], [order.delivery_id for order in orders if order.delivery_id]
+    )
+    await db.commit()
+    _partitions.update(months)
+    for order in orders:
+        invalidate_order_cache(order.order_id)
+    orders_archived.inc(len(orders))
+    return len(orders)
+
+class OrderArchiver:
+    """
+    Job periódico que arquiva os pedidos finalizados há mais de
+    ORDER_ARCHIVE_AFTER_DAYS, em lotes, até não sobrar nenhum.
+    """
+    def __init__(self, after_days: int = ORDER_ARCHIVE_AFTER_DAYS):
+        self.after_days = after_days
+        self._task = None
+
+    async def start(self):
+        if self._task is None and self.after_days > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                archived = await self.archive_once()
+                if archived:
+                    logging.info(f"{archived} pedidos finalizados movidos para orders_archive.")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logging.exception("Erro inesperado no arquivamento de pedidos")
+            await asyncio.sleep(ORDER_ARCHIVE_INTERVAL)
+
+    async def archive_once(self):
+        cutoff = datetime.utcnow() - timedelta(days=self.after_days)
+        total = 0
+        while True:
+            start = time.perf_counter()
+            async with AsyncSessionLocal() as db:
+                archived = await archive_batch(db, cutoff, ORDER_ARCHIVE_BATCH)
+            archive_batch_seconds.observe(time.perf_counter() - start)
+            total += archived
+            if archived < ORDER_ARCHIVE_BATCH:
+                return total
+
+order_archiver = OrderArchiver()
@@ -0,0 +1,204 @@
+import csv
+import io
+import json
+import os
+import zlib
+from datetime import datetime
+from fastapi import APIRouter, Depends, Header, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.orm import defer, joinedload, selectinload
+from database import SessionLocal
+from core.authentication import get_current_user
+from core.order import order_filters, order_graph_options, serialize_order
+from core.order_storage import raw_payload, stores_raw
+from models.order import OrderORM, OrderItemORM, OrderItemOptionORM
+
+router = APIRouter()
+
+# Pedidos por lote do cursor no servidor (e por pedaço enviado ao cliente)
+ORDER_EXPORT_CHUNK = int(os.getenv("ORDER_EXPORT_CHUNK", "500"))
+
+# Uma linha por item; pedido sem itens sai numa linha com as colunas de item vazias
+CSV_COLUMNS = [
+    "order_id", "display_id", "created_at", "status", "order_type", "sales_channel",
+    "merchant_id", "customer_name", "order_amount", "sub_total", "delivery_fee", "benefits",
+    "additional_fees_total", "payment_methods", "payments_total", "fees",
+    "item_index", "item_name", "item_external_code", "item_quantity", "item_unit_price",
+    "item_total_price", "item_options",
+]
+
+def export_query(criteria):
+    """
+    Pedidos em ordem cronológica com o que a exportação usa. Onde o payload
+    bruto é gravado basta a linha de orders (pedidos antigos sem ele ganham o
+    grafo em load_missing_graphs); senão o grafo normalizado, e com yield_per
+    o selectinload roda por lote (IN nos ids do lote), não para o resultado
+    todo.
+    """
+    if stores_raw():
+        options = ()
+    else:
+        options = (
+            defer(OrderORM.details),
+            defer(OrderORM.details_compressed),
+            joinedload(OrderORM.merchant),
+            joinedload(OrderORM.customer),
+            joinedload(OrderORM.delivery),
+            selectinload(OrderORM.items)
+            .selectinload(OrderItemORM.options)
+            .selectinload(OrderItemOptionORM.customizations),
+            selectinload(OrderORM.payments),
+            selectinload(OrderORM.additional_fees),
+        )
+    return (
+        select(OrderORM)
+        .options(*options)
+        .where(*criteria)
+        .order_by(OrderORM.created_at, OrderORM.id)
+    )
+
+def load_missing_graphs(db, orders):
+    """
+    Carrega, numa query por nível para o lote todo, o grafo dos pedidos sem
+    payload bruto (gravados no modo normalized); sem isso cada um faria lazy
+    load dos itens, opções etc. (N+1).
+    """
+    pks = [order.id for order in orders if raw_payload(order) is None]
+    if pks:
+        db.execute(select(OrderORM).options(*order_graph_options()).where(OrderORM.id.in_(pks))).scalars().all()
+
+def flatten_order(order: dict):
+    """
+    Linhas do CSV a partir do pedido serializado (serialize_order), seja qual
+    for a fonte.
+    """
+    total = order.get("total") or {}
+    payments = order.get("payments") or []
+    fees = order.get("additionalFees") or []
+    base = {
+        "order_id": order.get("id"),
+        "display_id": order.get("displayId"),
+        "created_at": order.get("createdAt"),
+        "status": order.get("fullCode"),
+        "order_type": order.get("orderType"),
+        "sales_channel": order.get("salesChannel"),
+        "merchant_id": (order.get("merchant") or {}).get("id"),
+        "customer_name": (order.get("customer") or {}).get("name"),
+        "order_amount": total.get("orderAmount"),
+        "sub_total": total.get("subTotal"),
+        "delivery_fee": total.get("deliveryFee"),
+        "benefits": total.get("benefits"),
+        "additional_fees_total": total.get("additionalFees"),
+        "payment_methods": ";".join(p.get("method") or "" for p in payments),
+        "payments_total": sum(p.get("value") or 0 for p in payments),
+        "fees": ";".join(f"{f.get('type')}={f.get('value')}" for f in fees),
+    }
+    items = order.get("items") or []
+    if not items:
+        return [base]
+    return [
+        dict(
+            base,
+            item_index=index,
+            item_name=item.get("name"),
+            item_external_code=item.get("externalCode"),
+            item_quantity=item.get("quantity"),
+            item_unit_price=item.get("unitPrice"),
+            item_total_price=item.get("totalPrice"),
+            item_options=";".join(f"{o.get('quantity')}x {o.get('name')}" for o in item.get("options") or []),
+        )
+        for index, item in enumerate(items)
+    ]
+
+def _encode_ndjson(orders):
+    return "".join(
+        json.dumps(serialize_order(order, include_details=False), ensure_ascii=False, separators=(",", ":")) + "\n"
+        for order in orders
+    ).encode()
+
+def _encode_csv(orders, header=False):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction="ignore")
+    if header:
+        writer.writeheader()
+    for order in orders:
+        writer.writerows(flatten_order(serialize_order(order, include_details=False)))
+    return buffer.getvalue().encode()
+
+def iter_export(session_factory, criteria, fmt: str = "ndjson", compress: bool = False,
+                chunk_size: int = ORDER_EXPORT_CHUNK):
+    """
+    Gera o arquivo em pedaços de bytes. Abre a própria sessão (o gerador roda
+    depois que o endpoint retornou) e lê com cursor no servidor em lotes de
+    `chunk_size`. O identity map guarda referências fracas, então cada lote é
+    coletado assim que escrito: a memória fica constante, qualquer que seja o
+    período exportado.
+    """
+    compressor = zlib.compressobj(wbits=31) if compress else None  # wbits=31: formato gzip
+    db = session_factory()
+    try:
+        if fmt == "csv":
+            header = _encode_csv([], header=True)
+            yield compressor.compress(header) if compressor else header
+        result = db.execute(export_query(criteria).execution_options(yield_per=chunk_size))
+        for orders in result.scalars().partitions():
+            if stores_raw():
+                load_missing_graphs(db, orders)
+            chunk = _encode_csv(orders) if fmt == "csv" else _encode_ndjson(orders)
+            del orders
+            if compressor:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+        if compressor:
+            yield compressor.flush()
+    finally:
+        db.close()
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+def _accepts_gzip(accept_encoding: str):
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.partition(";")
+        if coding.strip().lower() != "gzip":
+            continue
+        quality = params.strip().removeprefix("q=")
+        try:
+            return not params.strip() or float(quality) > 0
+        except ValueError:
+            return False
+    return False
+
+@router.get("/export")
+def export_orders(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    status: str = None,
+    merchant_id: str = None,
+    order_type: str = None,
+    created_from: datetime = None,
+    created_to: datetime = None,
+    accept_encoding: str = Header(None),
+    user=Depends(get_current_user)
+):
+    """
+    Exporta os pedidos filtrados em NDJSON (um pedido aninhado por linha, sem o
+    payload bruto) ou CSV (uma linha por item). Compacta em gzip se o cliente
+    aceitar.
+    """
+    criteria = order_filters(status, merchant_id, order_type, created_from, created_to)
+    compress = _accepts_gzip(accept_encoding)
+    headers = {
+        "Content-Disposition": f'attachment; filename="pedidos.{format}"',
+        "Vary": "Accept-Encoding",
+    }
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        iter_export(SessionLocal, criteria, format, compress),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers=headers
+    )
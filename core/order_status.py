@@ -0,0 +1,71 @@
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from core import metrics
+from models.order import OrderORM
+
+transitions_applied = metrics.counter("order_transitions_applied", "Mudanças de status aplicadas")
+transitions_rejected = metrics.counter(
+    "order_transitions_rejected", "Eventos fora de ordem descartados (status atual não permite a transição)"
+)
+transitions_unmapped = metrics.counter(
+    "order_transitions_unmapped", "Eventos sem transição mapeada, reconhecidos sem mudar o status"
+)
+
+def final_statuses(transitions: dict):
+    """
+    Status de onde nenhum evento sai (ex.: entregue, cancelado, concluído).
+    """
+    sources = set().union(*(t.allowed_from for t in transitions.values()))
+    return {t.status for t in transitions.values()} - sources
+
+class Transition:
+    """
+    Linha da tabela de transições: o status novo, os status a partir dos quais
+    o evento é aceito e os efeitos colaterais, corrotinas
+    `effect(order_id, payload, db)` executadas só quando a transição acontece.
+    """
+    def __init__(self, status: str, allowed_from, effects=()):
+        self.status = status
+        self.allowed_from = tuple(allowed_from)
+        self.effects = tuple(effects)
+
+async def apply_transition(db: AsyncSession, order_id: str, event_type: str, transitions: dict):
+    """
+    Aplica o evento com um único UPDATE ... WHERE status IN (...) RETURNING,
+    sem carregar o pedido. Status finais (que não aparecem em nenhum
+    allowed_from) nunca são deixados. Pedido com status fora da tabela (nulo
+    ou legado) só aceita as transições para um status final. Eventos fora da
+    tabela não alteram o status. Não faz commit.
+
+    Retorna (resultado, status, transição), com resultado "applied", "rejected"
+    (status atual não permite; `status` é o atual), "unmapped" (evento fora da
+    tabela; `status` é o atual) ou "missing" (pedido não existe).
+    """
+    transition = transitions.get(event_type)
+    if transition is not None:
+        allowed = [OrderORM.status.in_(transition.allowed_from)]
+        if transition.status in final_statuses(transitions):
+            known = {t.status for t in transitions.values()}.union(*(t.allowed_from for t in transitions.values()))
+            allowed += [OrderORM.status.not_in(known), OrderORM.status.is_(None)]
+        stmt = (
+            update(OrderORM)
+            .where(OrderORM.order_id == order_id, or_(*allowed))
+            .values(status=transition.status)
+            .returning(OrderORM.status)
+            .execution_options(synchronize_session=False)
+        )
+        status = (await db.execute(stmt)).scalar_one_or_none()
+        if status is not None:
+            transitions_applied.inc()
+            return "applied", status, transition
+
+    # Caminho raro: descobre se o pedido não existe, se o evento chegou fora de
+    # ordem ou se não está na tabela
+    current = (await db.execute(select(OrderORM.status).where(OrderORM.order_id == order_id))).first()
+    if current is None:
+        return "missing", None, transition
+    if transition is None:
+        transitions_unmapped.inc()
+        return "unmapped", current[0], None
+    transitions_rejected.inc()
+    return "rejected", current[0], transition
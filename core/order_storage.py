@@ -0,0 +1,50 @@
+import json
+import os
+import zlib
+from sqlalchemy import inspect
+
+# Como o pedido é gravado: "normalized" (só as tabelas de itens, opções etc.),
+# "raw" (só o payload bruto na linha de orders) ou "hybrid" (os dois).
+# A troca vale para pedidos novos; a leitura usa o que cada pedido tiver.
+ORDER_STORAGE_MODE = os.getenv("ORDER_STORAGE_MODE", "hybrid")
+# "zlib" grava o payload bruto comprimido em details_compressed em vez de details
+ORDER_RAW_COMPRESSION = os.getenv("ORDER_RAW_COMPRESSION", "none")
+
+STORAGE_MODES = ("normalized", "raw", "hybrid")
+RAW_COMPRESSIONS = ("none", "zlib")
+
+if ORDER_STORAGE_MODE not in STORAGE_MODES:
+    raise ValueError(f"ORDER_STORAGE_MODE inválido: '{ORDER_STORAGE_MODE}' (use {', '.join(STORAGE_MODES)}).")
+if ORDER_RAW_COMPRESSION not in RAW_COMPRESSIONS:
+    raise ValueError(f"ORDER_RAW_COMPRESSION inválido: '{ORDER_RAW_COMPRESSION}' (use {', '.join(RAW_COMPRESSIONS)}).")
+
+def stores_normalized(mode: str = None):
+    return (mode or ORDER_STORAGE_MODE) in ("normalized", "hybrid")
+
+def stores_raw(mode: str = None):
+    return (mode or ORDER_STORAGE_MODE) in ("raw", "hybrid")
+
+def raw_columns(payload, compression: str = None):
+    """
+    Valores de details/details_compressed para gravar o payload bruto.
+    """
+    if (compression or ORDER_RAW_COMPRESSION) == "zlib":
+        data = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode()
+        return {"details": None, "details_compressed": zlib.compress(data, 6)}
+    return {"details": payload, "details_compressed": None}
+
+def raw_payload(order):
+    """
+    Payload bruto do pedido, de qualquer uma das colunas. None se o pedido só
+    tem as tabelas normalizadas ou se as colunas não foram carregadas (defer):
+    nunca dispara uma query.
+    """
+    state = inspect(order, raiseerr=False)
+    unloaded = state.unloaded if state is not None else ()
+    if "details_compressed" not in unloaded:
+        compressed = getattr(order, "details_compressed", None)
+        if compressed is not None:
+            return json.loads(zlib.decompress(compressed))
+    if "details" not in unloaded:
+        return getattr(order, "details", None)
+    return None
@@ -0,0 +1,283 @@
+from datetime import datetime, timezone
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+import logging
+import os
+from core.cache import TTLCache
+from core.order_storage import raw_columns, stores_normalized, stores_raw
+from core.sql import dialect_insert
+from models.order import (
+    OrderORM, OrderMerchantORM, OrderCustomerORM, OrderDeliveryORM,
+    OrderItemORM, OrderItemOptionORM, OrderItemCustomizationORM,
+    OrderPaymentORM, OrderAdditionalFeeORM
+)
+
+# Poucas lojas e que quase nunca mudam: merchant_id -> PK fica em memória
+MERCHANT_CACHE_TTL = float(os.getenv("MERCHANT_CACHE_TTL", "3600"))  # segundos
+merchant_pks = TTLCache(maxsize=256, ttl=MERCHANT_CACHE_TTL)
+
+def parse_datetime(dt):
+    """
+    Data ISO do payload como datetime UTC sem fuso, como as colunas DateTime
+    guardam (o asyncpg recusa datetimes com fuso nelas).
+    """
+    if not dt:
+        return None
+    try:
+        value = datetime.fromisoformat(dt.replace("Z", "+00:00"))
+    except Exception:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def merchant_row(merchant_data):
+    return {
+        "merchant_id": merchant_data.get("id"),
+        "name": merchant_data.get("name")
+    }
+
+def customer_row(customer_data):
+    phone = customer_data.get("phone", {})
+    return {
+        "customer_id": customer_data.get("id"),
+        "name": customer_data.get("name"),
+        "document_number": customer_data.get("documentNumber"),
+        "phone_number": phone.get("number"),
+        "phone_localizer": phone.get("localizer"),
+        "phone_localizer_expiration": parse_datetime(phone.get("localizerExpiration")),
+        "orders_count_on_merchant": customer_data.get("ordersCountOnMerchant"),
+        "segmentation": customer_data.get("segmentation")
+    }
+
+def delivery_row(delivery_data):
+    address = delivery_data.get("deliveryAddress", {})
+    return {
+        "mode": delivery_data.get("mode"),
+        "description": delivery_data.get("description"),
+        "delivered_by": delivery_data.get("deliveredBy"),
+        "delivery_datetime": parse_datetime(delivery_data.get("deliveryDateTime")),
+        "observations": delivery_data.get("observations"),
+        "pickup_code": delivery_data.get("pickupCode"),
+        "address_street": address.get("streetName"),
+        "address_number": address.get("streetNumber"),
+        "address_formatted": address.get("formattedAddress"),
+        "address_neighborhood": address.get("neighborhood"),
+        "address_complement": address.get("complement"),
+        "address_postal_code": address.get("postalCode"),
+        "address_city": address.get("city"),
+        "address_state": address.get("state"),
+        "address_country": address.get("country"),
+        "address_reference": address.get("reference"),
+        "address_latitude": address.get("coordinates", {}).get("latitude"),
+        "address_longitude": address.get("coordinates", {}).get("longitude"),
+    }
+
+def order_row(payload, full_code):
+    total = payload.get("total", {})
+    return {
+        "order_id": payload.get("id"),
+        "display_id": payload.get("displayId"),
+        "created_at": parse_datetime(payload.get("createdAt")),
+        "category": payload.get("category"),
+        "order_timing": payload.get("orderTiming"),
+        "order_type": payload.get("orderType"),
+        "preparation_start": parse_datetime(payload.get("preparationStartDateTime")),
+        "is_test": payload.get("isTest"),
+        "sales_channel": payload.get("salesChannel"),
+        "status": full_code,
+        "order_amount": total.get("orderAmount"),
+        "sub_total": total.get("subTotal"),
+        "delivery_fee": total.get("deliveryFee"),
+        "benefits": total.get("benefits"),
+        "additional_fees_total": total.get("additionalFees"),
+    }
+
+def item_row(item, idx):
+    return {
+        "index": idx,
+        "item_id": item.get("id"),
+        "unique_id": item.get("uniqueId"),
+        "name": item.get("name"),
+        "external_code": item.get("externalCode"),
+        "ean": item.get("ean"),
+        "quantity": item.get("quantity"),
+        "unit": item.get("unit"),
+        "unit_price": item.get("unitPrice"),
+        "options_price": item.get("optionsPrice"),
+        "total_price": item.get("totalPrice"),
+        "price": item.get("price"),
+        "observations": item.get("observations"),
+        "image_url": item.get("imageUrl"),
+        "type": item.get("type")
+    }
+
+def option_row(option, oidx):
+    return {
+        "index": oidx,
+        "option_id": option.get("id"),
+        "name": option.get("name"),
+        "type": option.get("type"),
+        "group_name": option.get("groupName"),
+        "external_code": option.get("externalCode"),
+        "ean": option.get("ean"),
+        "quantity": option.get("quantity"),
+        "unit": option.get("unit"),
+        "unit_price": option.get("unitPrice"),
+        "addition": option.get("addition"),
+        "price": option.get("price"),
+        "option_type": option.get("optionType")
+    }
+
+def customization_row(customization):
+    return {
+        "customization_id": customization.get("id"),
+        "external_code": customization.get("externalCode"),
+        "name": customization.get("name"),
+        "group_name": customization.get("groupName"),
+        "type": customization.get("type"),
+        "quantity": customization.get("quantity"),
+        "unit_price": customization.get("unitPrice"),
+        "addition": customization.get("addition"),
+        "price": customization.get("price")
+    }
+
+def payment_row(payment):
+    return {
+        "value": payment.get("value"),
+        "currency": payment.get("currency"),
+        "method": payment.get("method"),
+        "prepaid": payment.get("prepaid"),
+        "type": payment.get("type"),
+        "card_brand": payment.get("card", {}).get("brand")
+    }
+
+def fee_row(fee):
+    return {
+        "type": fee.get("type"),
+        "description": fee.get("description"),
+        "full_description": fee.get("fullDescription"),
+        "value": fee.get("value"),
+        "liabilities": fee.get("liabilities")
+    }
+
+def _insert_returning(db: Session, model, rows, *columns):
+    """
+    INSERT em lote (insertmanyvalues) devolvendo o id e as colunas usadas para
+    correlacionar cada linha gerada com a linha enviada.
+    """
+    if not rows:
+        return []
+    stmt = insert(model).returning(model.id, *columns)
+    return db.execute(stmt, rows).all()
+
+def _insert_many(db: Session, model, rows):
+    if rows:
+        db.execute(insert(model), rows)
+
+def _upsert_id(db: Session, model, key_column, row):
+    """
+    INSERT ... ON CONFLICT (chave) DO UPDATE ... RETURNING id: um único comando,
+    sem corrida entre webhooks concorrentes. Atualiza as demais colunas com os
+    dados mais recentes do payload. Sem a chave (ex.: cliente sem `id` no
+    payload) não há com o que casar: grava uma linha nova, para o pedido não
+    perder os dados.
+    """
+    if row[key_column.key] is None:
+        return db.execute(insert(model).returning(model.id), row).scalar_one()
+    stmt = dialect_insert(db)(model).values(row)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[key_column.key],
+        set_={column: stmt.excluded[column] for column in row if column != key_column.key}
+    ).returning(model.id)
+    return db.execute(stmt).scalar_one()
+
+def _merchant_pk(db: Session, row):
+    merchant_id = row["merchant_id"]
+    pk = merchant_pks.get(merchant_id) if merchant_id is not None else None
+    if pk is not None:
+        return pk
+    pk = _upsert_id(db, OrderMerchantORM, OrderMerchantORM.merchant_id, row)
+    if merchant_id is not None:
+        # Só entra no cache depois do commit: um rollback pode desfazer o INSERT
+        db.info.setdefault("merchant_pks", {})[merchant_id] = pk
+    return pk
+
+@event.listens_for(Session, "after_commit")
+def _cache_committed_merchants(session):
+    for merchant_id, pk in session.info.pop("merchant_pks", {}).items():
+        merchant_pks.set(merchant_id, pk)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_uncommitted_merchants(session):
+    session.info.pop("merchant_pks", None)
+
+def bulk_insert_order(payload, full_code, db: Session, mode: str = None, compression: str = None):
+    """
+    Grava o pedido com um número fixo de comandos, independente da quantidade
+    de itens/opções: um INSERT por tabela, com os ids gerados lidos via
+    RETURNING e casados pelo `index` de cada item/opção. Não faz commit.
+    Retorna o id (PK) do pedido.
+
+    A linha de orders (colunas da listagem, filtros e status) e a loja são
+    sempre gravadas; `mode` decide entre as tabelas normalizadas, o payload
+    bruto ou os dois; por padrão, ORDER_STORAGE_MODE (ver core.order_storage).
+    """
+    merchant_pk = _merchant_pk(db, merchant_row(payload.get("merchant", {})))
+    row = order_row(payload, full_code)
+    row.update(merchant_id=merchant_pk, customer_id=None, delivery_id=None)
+    row.update(raw_columns(payload, compression) if stores_raw(mode) else {"details": None, "details_compressed": None})
+    if not stores_normalized(mode):
+        return db.execute(insert(OrderORM).returning(OrderORM.id), row).scalar_one()
+
+    row["customer_id"] = _upsert_id(
+        db, OrderCustomerORM, OrderCustomerORM.customer_id, customer_row(payload.get("customer", {}))
+    )
+    row["delivery_id"] = db.execute(
+        insert(OrderDeliveryORM).returning(OrderDeliveryORM.id), delivery_row(payload.get("delivery", {}))
+    ).scalar_one()
+    order_pk = db.execute(insert(OrderORM).returning(OrderORM.id), row).scalar_one()
+
+    # Items
+    items = payload.get("items", [])
+    item_rows = [dict(item_row(item, idx), order_id=order_pk) for idx, item in enumerate(items)]
+    item_pks = {
+        idx: pk for pk, idx in _insert_returning(db, OrderItemORM, item_rows, OrderItemORM.index)
+    }
+
+    # Options (todas as opções de todos os itens num único INSERT)
+    option_rows = []
+    option_sources = []
+    for idx, item in enumerate(items):
+        for oidx, option in enumerate(item.get("options", [])):
+            option_rows.append(dict(option_row(option, oidx), item_id=item_pks[idx]))
+            option_sources.append(option)
+    option_pks = {
+        (item_pk, oidx): pk
+        for pk, item_pk, oidx in _insert_returning(
+            db, OrderItemOptionORM, option_rows, OrderItemOptionORM.item_id, OrderItemOptionORM.index
+        )
+    }
+
+    # Customizations
+    customization_rows = [
+        dict(customization_row(customization), option_id=option_pks[(row["item_id"], row["index"])])
+        for row, option in zip(option_rows, option_sources)
+        for customization in option.get("customizations", [])
+    ]
+    _insert_many(db, OrderItemCustomizationORM, customization_rows)
+
+    # Payments
+    payment_rows = []
+    for payment in payload.get("payments", []):
+        if isinstance(payment, dict):
+            payment_rows.append(dict(payment_row(payment), order_id=order_pk))
+        else:
+            logging.info(f"Pagamento ignorado (não é dict):{payment}")
+    _insert_many(db, OrderPaymentORM, payment_rows)
+
+    # Additional Fees
+    fee_rows = [dict(fee_row(fee), order_id=order_pk) for fee in payload.get("additionalFees", [])]
+    _insert_many(db, OrderAdditionalFeeORM, fee_rows)
+
+    return order_pk
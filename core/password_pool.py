@@ -0,0 +1,21 @@
+import os
+from core import metrics
+from core.bounded_pool import BoundedPool, PoolFull
+
+# O bcrypt libera o GIL, então threads bastam; o que importa é não disputar o
+# threadpool do FastAPI, que atende todos os endpoints síncronos
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+# Máximo de hashes aguardando ou em execução; acima disso rejeita na hora (503)
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+
+password_hash_seconds = metrics.histogram("password_hash_seconds", "Tempo do bcrypt ao gerar hash (cadastro, rehash)")
+password_verify_seconds = metrics.histogram("password_verify_seconds", "Tempo do bcrypt ao verificar senha (login)")
+
+class PasswordPoolFull(PoolFull):
+    pass
+
+# Uma rajada de logins espera aqui (ou é rejeitada) sem ocupar as threads dos
+# outros endpoints
+password_pool = BoundedPool(
+    "password_hash", PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING, full_error=PasswordPoolFull
+)
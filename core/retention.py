@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import os
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from core import metrics
+from database import AsyncSessionLocal
+
+# Limpeza periódica das tabelas que só crescem (eventos processados, fila de
+# webhooks, jobs de impressão); cada módulo registra a sua com register_purge
+RETENTION_INTERVAL = float(os.getenv("RETENTION_INTERVAL", "3600"))  # segundos; 0 desliga
+RETENTION_BATCH = int(os.getenv("RETENTION_BATCH", "5000"))
+
+rows_purged = metrics.counter("retention_rows_purged", "Linhas apagadas pela limpeza periódica")
+
+_purges = {}
+
+def register_purge(name: str, purge):
+    """
+    Registra a corrotina `purge(db)` (`db` é um AsyncSession), que apaga o que
+    passou da retenção e retorna quantas linhas apagou.
+    """
+    _purges[name] = purge
+
+async def delete_in_batches(db: AsyncSession, model, *criteria, batch: int = RETENTION_BATCH):
+    """
+    DELETE das linhas de `model` que atendem `criteria`, em lotes de `batch`
+    com commit a cada um: transações curtas, sem segurar locks na tabela
+    quente durante um expurgo grande.
+    """
+    total = 0
+    while True:
+        ids = select(model.id).where(*criteria).limit(batch).scalar_subquery()
+        result = await db.execute(
+            delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        total += result.rowcount
+        if result.rowcount < batch:
+            return total
+
+class RetentionJob:
+    def __init__(self, interval: float = RETENTION_INTERVAL):
+        self.interval = interval
+        self._task = None
+
+    async def start(self):
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                purged = await self.purge_once()
+                if any(purged.values()):
+                    logging.info(f"Limpeza periódica: {purged}")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logging.exception("Erro inesperado na limpeza periódica")
+            await asyncio.sleep(self.interval)
+
+    async def purge_once(self):
+        """
+        Roda todas as limpezas registradas. Retorna {nome: linhas apagadas}.
+        """
+        purged = {}
+        for name, purge in _purges.items():
+            async with AsyncSessionLocal() as db:
+                purged[name] = await purge(db)
+            rows_purged.inc(purged[name])
+        return purged
+
+retention_job = RetentionJob()
@@ -0,0 +1,13 @@
+from sqlalchemy.dialects import postgresql, sqlite
+
+def dialect_insert(db):
+    """
+    insert() do dialeto da sessão (Session ou AsyncSession), que aceita
+    on_conflict_do_nothing/on_conflict_do_update.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert
+    if dialect == "sqlite":
+        return sqlite.insert
+    raise NotImplementedError(f"Sem suporte a ON CONFLICT em {dialect}")
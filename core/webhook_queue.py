@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import os
+import socket
+from datetime import datetime, timedelta
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.retention import delete_in_batches, register_purge
+from database import AsyncSessionLocal
+from models.webhook import WebhookEventORM
+
+# inline: processa o webhook na própria requisição
+# queue: grava o evento e responde 200 na hora; os workers processam depois
+WEBHOOK_MODE = os.getenv("WEBHOOK_MODE", "inline").lower()
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "4"))
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "10"))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "5"))
+WEBHOOK_VISIBILITY_TIMEOUT = int(os.getenv("WEBHOOK_VISIBILITY_TIMEOUT", "60"))  # segundos
+WEBHOOK_RETRY_BACKOFF = int(os.getenv("WEBHOOK_RETRY_BACKOFF", "5"))  # segundos, dobra a cada tentativa
+WEBHOOK_POLL_INTERVAL = float(os.getenv("WEBHOOK_POLL_INTERVAL", "1.0"))
+# Eventos concluídos saem da fila depois disso; os em dead-letter ficam mais,
+# para dar tempo de investigar e reenfileirar
+WEBHOOK_DONE_RETENTION_HOURS = float(os.getenv("WEBHOOK_DONE_RETENTION_HOURS", "24"))
+WEBHOOK_DEAD_RETENTION_DAYS = float(os.getenv("WEBHOOK_DEAD_RETENTION_DAYS", "30"))
+
+_handlers = {}
+_wakeup = asyncio.Event()
+
+def register_handler(source: str, handler):
+    """
+    Registra a corrotina `handler(payload, db)` que processa os eventos de `source`
+    (`db` é um AsyncSession).
+    Qualquer exceção levantada pelo handler conta como falha e o evento volta para a fila.
+    """
+    _handlers[source] = handler
+
+async def enqueue_event(db: AsyncSession, source: str, payload: dict):
+    now = datetime.utcnow()
+    event = WebhookEventORM(
+        source=source,
+        payload=payload,
+        status="pending",
+        attempts=0,
+        available_at=now,
+        created_at=now
+    )
+    db.add(event)
+    await db.commit()
+    _wakeup.set()
+    return event
+
+async def claim_events(db: AsyncSession, worker_id: str, limit: int = WEBHOOK_BATCH_SIZE):
+    """
+    Reserva até `limit` eventos visíveis para o worker. Eventos em "processing" cujo
+    visibility timeout expirou (worker caiu no meio) voltam a ser visíveis.
+    """
+    now = datetime.utcnow()
+    stmt = (
+        select(WebhookEventORM)
+        .filter(
+            WebhookEventORM.status.in_(("pending", "processing")),
+            WebhookEventORM.available_at <= now
+        )
+        .order_by(WebhookEventORM.available_at, WebhookEventORM.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    events = (await db.execute(stmt)).scalars().all()
+    for event in events:
+        event.status = "processing"
+        event.attempts += 1
+        event.locked_by = worker_id
+        event.available_at = now + timedelta(seconds=WEBHOOK_VISIBILITY_TIMEOUT)
+    await db.commit()
+    return events
+
+async def complete_event(db: AsyncSession, event: WebhookEventORM):
+    event.status = "done"
+    event.locked_by = None
+    event.last_error = None
+    event.processed_at = datetime.utcnow()
+    await db.commit()
+
+async def fail_event(db: AsyncSession, event: WebhookEventORM, error: str):
+    event.locked_by = None
+    event.last_error = error
+    if event.attempts >= WEBHOOK_MAX_ATTEMPTS:
+        event.status = "dead"
+        logging.error(f"Evento {event.id} ({event.source}) movido para dead-letter após {event.attempts} tentativas: {error}")
+    else:
+        event.status = "pending"
+        delay = WEBHOOK_RETRY_BACKOFF * (2 ** (event.attempts - 1))
+        event.available_at = datetime.utcnow() + timedelta(seconds=delay)
+        logging.warning(f"Evento {event.id} ({event.source}) falhou (tentativa {event.attempts}), nova tentativa em {delay}s: {error}")
+    await db.commit()
+
+async def requeue_dead_events(db: AsyncSession, source: str = None):
+    """
+    Devolve para a fila os eventos em dead-letter (ex.: depois de corrigir a causa da falha).
+    """
+    stmt = (
+        update(WebhookEventORM)
+        .where(WebhookEventORM.status == "dead")
+        .values(status="pending", attempts=0, available_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    if source:
+        stmt = stmt.where(WebhookEventORM.source == source)
+    result = await db.execute(stmt)
+    await db.commit()
+    _wakeup.set()
+    return result.rowcount
+
+async def purge_webhook_events(db: AsyncSession):
+    """
+    Apaga os eventos concluídos e os dead-letter que passaram da retenção,
+    para a fila (e a varredura do claim) não crescer para sempre.
+    """
+    now = datetime.utcnow()
+    done = await delete_in_batches(
+        db, WebhookEventORM,
+        WebhookEventORM.status == "done",
+        WebhookEventORM.processed_at < now - timedelta(hours=WEBHOOK_DONE_RETENTION_HOURS)
+    )
+    dead = await delete_in_batches(
+        db, WebhookEventORM,
+        WebhookEventORM.status == "dead",
+        WebhookEventORM.created_at < now - timedelta(days=WEBHOOK_DEAD_RETENTION_DAYS)
+    )
+    return done + dead
+
+register_purge("webhook_events", purge_webhook_events)
+
+class WebhookWorkerPool:
+    def __init__(self, size: int = WEBHOOK_WORKERS):
+        self.size = size
+        self._tasks = []
+        self._stopping = False
+
+    async def start(self):
+        self._stopping = False
+        hostname = socket.gethostname()
+        for i in range(self.size):
+            worker_id = f"{hostname}:{os.getpid()}:{i}"
+            self._tasks.append(asyncio.create_task(self._run(worker_id)))
+        logging.info(f"{self.size} workers de webhook iniciados.")
+
+    async def stop(self):
+        self._stopping = True
+        _wakeup.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self, worker_id: str):
+        while not self._stopping:
+            try:
+                processed = await self._drain_once(worker_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logging.exception(f"Erro inesperado no worker de webhook {worker_id}")
+                processed = 0
+            if not processed:
+                _wakeup.clear()
+                try:
+                    await asyncio.wait_for(_wakeup.wait(), timeout=WEBHOOK_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _drain_once(self, worker_id: str):
+        async with AsyncSessionLocal() as db:
+            events = await claim_events(db, worker_id)
+            # Valores simples: o rollback de um handler que falhou expira os
+            # objetos da sessão, e ler event.payload depois dispararia I/O fora
+            # do greenlet (MissingGreenlet)
+            claimed = [(event.id, event.source, event.payload) for event in events]
+        for event_id, source, payload in claimed:
+            # Uma sessão por evento: a falha de um não afeta os outros do lote
+            async with AsyncSessionLocal() as db:
+                handler = _handlers.get(source)
+                if handler is None:
+                    await fail_event(db, await db.get(WebhookEventORM, event_id), f"Nenhum handler registrado para '{source}'")
+                    continue
+                try:
+                    await handler(payload, db)
+                except Exception as exc:
+                    await db.rollback()
+                    await fail_event(db, await db.get(WebhookEventORM, event_id), repr(exc))
+                else:
+                    await complete_event(db, await db.get(WebhookEventORM, event_id))
+        return len(claimed)
+
+webhook_workers = WebhookWorkerPool()
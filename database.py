@@ -1,10 +1,14 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
 import os
 
 from models.user import Base as UserBase
 from models.order import Base as OrderBase
+from models.webhook import Base as WebhookBase
+from models.print_job import Base as PrintJobBase
 
 load_dotenv()
 
@@ -13,9 +17,62 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+_ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def _async_url(url: str):
+    """
+    Deriva a URL async a partir da síncrona (postgresql:// -> postgresql+asyncpg://).
+    """
+    parsed = make_url(url)
+    driver = _ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise ValueError(f"Sem driver async conhecido para '{parsed.drivername}'; defina ASYNC_DATABASE_URL.")
+    return parsed.set(drivername=driver)
+
+# Engine async para os handlers async (webhooks, workers), que não podem
+# bloquear o event loop com o Session síncrono
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _async_url(DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+def ensure_columns(metadata):
+    """
+    create_all também não altera tabelas que já existem; adiciona as colunas
+    novas (anuláveis, sem default no banco) que ainda não estão nelas.
+    """
+    inspector = inspect(engine)
+    quote = engine.dialect.identifier_preparer.quote
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column_type}"))
+
+def ensure_indexes(metadata):
+    """
+    create_all só cria índices junto com tabelas novas; garante que índices
+    adicionados depois também existam nas tabelas que já estão no banco.
+    """
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
 # Cria as tabelas
 UserBase.metadata.create_all(bind=engine)
 OrderBase.metadata.create_all(bind=engine)
+WebhookBase.metadata.create_all(bind=engine)
+PrintJobBase.metadata.create_all(bind=engine)
+ensure_columns(OrderBase.metadata)
+ensure_indexes(OrderBase.metadata)
+ensure_indexes(WebhookBase.metadata)
 
 def get_db():
     db = SessionLocal()
@@ -23,3 +80,7 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
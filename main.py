@@ -1,14 +1,57 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from core.authentication import router as auth_router
 from core.order import router as order_router
+from core.order_export import router as order_export_router
 from marketplace.ifood import router as ifood_router
 from marketplace.amazon import router as amazon_router
 from marketplace.shopee import router as shopee_router
+from core.webhook_queue import WEBHOOK_MODE, webhook_workers
+from core.monitoring import router as metrics_router
+from core.order_archive import order_archiver
+from core.retention import retention_job
+from marketplace.ifood_auth import IFOOD_CLIENT_ID, ifood_tokens
+from core.http_clients import http_clients
+from core.password_pool import password_pool
+from printing.render_pool import preview_pool, render_pool
+from printing.spooler import PRINT_MODE, print_spooler
+from printing.backends import close_printer_backend
+from database import async_engine
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await http_clients.start()
+    await render_pool.start()
+    await preview_pool.start()
+    if PRINT_MODE == "spool":
+        await print_spooler.start()
+    if IFOOD_CLIENT_ID:
+        await ifood_tokens.start()
+    if WEBHOOK_MODE == "queue":
+        await webhook_workers.start()
+    await order_archiver.start()
+    await retention_job.start()
+    yield
+    await retention_job.stop()
+    await order_archiver.stop()
+    if WEBHOOK_MODE == "queue":
+        await webhook_workers.stop()
+    await print_spooler.stop()
+    await close_printer_backend()
+    await ifood_tokens.stop()
+    await http_clients.aclose()
+    await render_pool.stop()
+    await preview_pool.stop()
+    await password_pool.stop()
+    await async_engine.dispose()
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(auth_router, prefix="/users")
+# Antes do order_router, senão /orders/export cai em /orders/{order_id}
+app.include_router(order_export_router, prefix="/orders")
 app.include_router(order_router, prefix="/orders")
 app.include_router(ifood_router, prefix="/webhook/ifood")
 app.include_router(amazon_router, prefix="/webhook/amazon")
 app.include_router(shopee_router, prefix="/webhook/shopee")
+app.include_router(metrics_router, prefix="/metrics")
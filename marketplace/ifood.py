@@ -1,228 +1,129 @@
 from fastapi import APIRouter, Request, HTTPException, Depends
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
-import httpx
+from sqlalchemy.ext.asyncio import AsyncSession
 import os
-from datetime import datetime
-from database import get_db
-from models.order import (
-    OrderORM, OrderMerchantORM, OrderCustomerORM, OrderDeliveryORM,
-    OrderItemORM, OrderItemOptionORM, OrderItemCustomizationORM,
-    OrderPaymentORM, OrderAdditionalFeeORM
-)
+from database import get_async_db
+from core.order_writer import bulk_insert_order
+from core.order import LABEL_GRAPH, invalidate_order_cache, load_order_async
+from core.order_status import Transition, apply_transition
 import json
-from printing.zpl_utils import gerar_zpl_ifood
-from printing.printnode_utils import imprimir_zpl_printnode
+from printing.render_pool import gerar_zpl_ifood_async
+from printing.backends import DEFAULT_PRINTER_ID, get_printer_backend
+from printing.spooler import PRINT_MODE, enqueue_print
 import logging
-# from labelary_utils import gerar_pdf_labelary  # Se quiser PDF
+from marketplace.ifood_auth import ifood_tokens
+from core.webhook_queue import WEBHOOK_MODE, enqueue_event, register_handler
+from core.event_dedup import event_dedup, ifood_event_key
+# from printing.labelary_utils import gerar_pdf_etiqueta  # Se quiser PDF
 
 router = APIRouter()
 
-IFOOD_CLIENT_ID = os.getenv("IFOOD_CLIENT_ID")
-IFOOD_CLIENT_SECRET = os.getenv("IFOOD_CLIENT_SECRET")
-IFOOD_AUTH_URL = "https://merchant-api.ifood.com.br/authentication/v1.0/oauth/token"
 IFOOD_ORDER_URL = "https://merchant-api.ifood.com.br/orders/{}/virtual-bag"
 
-async def get_ifood_token():
-    async with httpx.AsyncClient() as client:
-        data = {
-            "grantType": "client_credentials",
-            "clientId": IFOOD_CLIENT_ID,
-            "clientSecret": IFOOD_CLIENT_SECRET
-        }
-        headers = {"Content-Type": "application/x-www-form-urlencoded"}
-        response = await client.post(IFOOD_AUTH_URL, data=data, headers=headers)
-        if response.status_code != 200:
-            raise HTTPException(status_code=500, detail=f"Erro ao autenticar no iFood: {response.text}")
-        return response.json()["accessToken"]
-
-async def get_ifood_order(order_id: str, token: str):
-    headers = {"Authorization": f"Bearer {token}"}
-    async with httpx.AsyncClient() as client:
-        response = await client.get(IFOOD_ORDER_URL.format(order_id), headers=headers)
-        if response.status_code != 200:
-            raise HTTPException(status_code=500, detail=f"Erro ao buscar detalhes do pedido no iFood: {response.text}")
-        return response.json()
+async def get_ifood_order(order_id: str):
+    response = await ifood_tokens.request("GET", IFOOD_ORDER_URL.format(order_id))
+    if response.status_code != 200:
+        raise HTTPException(status_code=500, detail=f"Erro ao buscar detalhes do pedido no iFood: {response.text}")
+    return response.json()
+
+async def populate_order_from_payload_async(payload, full_code, db: AsyncSession):
+    # run_sync executa o writer síncrono sobre a conexão async (greenlet),
+    # então os INSERTs não bloqueiam o event loop
+    await db.run_sync(lambda session: bulk_insert_order(payload, full_code, session))
+
+async def process_ifood_event(payload, db: AsyncSession):
+    """
+    Processa um evento do iFood já validado, numa única transação (marca de
+    evento processado, pedido, status e etiqueta na fila), commitada aqui.
+    Retorna (status_code, conteúdo da resposta). Reentregas de um evento já
+    processado são descartadas sem efeito.
+    """
+    order_id = payload.get("orderId") or payload.get("id")
+    event_type = payload.get("fullCode") or payload.get("eventType") or payload.get("status")
+    event_key = ifood_event_key(payload)
 
-def parse_datetime(dt):
-    if not dt:
-        return None
+    if not await event_dedup.claim(db, "ifood", event_key, order_id, event_type):
+        logging.info(f"Evento {event_key} do pedido {order_id} já processado, ignorando.")
+        return 200, {"success": True, "order_id": order_id, "duplicate": True}
     try:
-        return datetime.fromisoformat(dt.replace("Z", "+00:00"))
+        status_code, content = await _apply_ifood_event(payload, order_id, event_type, db)
     except Exception:
-        return None
-
-def populate_order_from_payload(payload, full_code, db: Session):
-    # Merchant
-    merchant_data = payload.get("merchant", {})
-    merchant = db.query(OrderMerchantORM).filter_by(merchant_id=merchant_data.get("id")).first()
-    if not merchant:
-        merchant = OrderMerchantORM(
-            merchant_id=merchant_data.get("id"),
-            name=merchant_data.get("name")
-        )
-        db.add(merchant)
-        db.flush()
-
-    # Customer
-    customer_data = payload.get("customer", {})
-    customer = db.query(OrderCustomerORM).filter_by(customer_id=customer_data.get("id")).first()
-    if not customer:
-        customer = OrderCustomerORM(
-            customer_id=customer_data.get("id"),
-            name=customer_data.get("name"),
-            document_number=customer_data.get("documentNumber"),
-            phone_number=customer_data.get("phone", {}).get("number"),
-            phone_localizer=customer_data.get("phone", {}).get("localizer"),
-            phone_localizer_expiration=parse_datetime(customer_data.get("phone", {}).get("localizerExpiration")),
-            orders_count_on_merchant=customer_data.get("ordersCountOnMerchant"),
-            segmentation=customer_data.get("segmentation")
-        )
-        db.add(customer)
-        db.flush()
-
-    # Delivery
-    delivery_data = payload.get("delivery", {})
-    address = delivery_data.get("deliveryAddress", {})
-    delivery = OrderDeliveryORM(
-        mode=delivery_data.get("mode"),
-        description=delivery_data.get("description"),
-        delivered_by=delivery_data.get("deliveredBy"),
-        delivery_datetime=parse_datetime(delivery_data.get("deliveryDateTime")),
-        observations=delivery_data.get("observations"),
-        pickup_code=delivery_data.get("pickupCode"),
-        address_street=address.get("streetName"),
-        address_number=address.get("streetNumber"),
-        address_formatted=address.get("formattedAddress"),
-        address_neighborhood=address.get("neighborhood"),
-        address_complement=address.get("complement"),
-        address_postal_code=address.get("postalCode"),
-        address_city=address.get("city"),
-        address_state=address.get("state"),
-        address_country=address.get("country"),
-        address_reference=address.get("reference"),
-        address_latitude=address.get("coordinates", {}).get("latitude"),
-        address_longitude=address.get("coordinates", {}).get("longitude"),
-    )
-    db.add(delivery)
-    db.flush()
-
-    # Order
-    total = payload.get("total", {})
-    order = OrderORM(
-        order_id=payload.get("id"),
-        display_id=payload.get("displayId"),
-        created_at=parse_datetime(payload.get("createdAt")),
-        category=payload.get("category"),
-        order_timing=payload.get("orderTiming"),
-        order_type=payload.get("orderType"),
-        preparation_start=parse_datetime(payload.get("preparationStartDateTime")),
-        is_test=payload.get("isTest"),
-        sales_channel=payload.get("salesChannel"),
-        status=full_code,
-        order_amount=total.get("orderAmount"),
-        sub_total=total.get("subTotal"),
-        delivery_fee=total.get("deliveryFee"),
-        benefits=total.get("benefits"),
-        additional_fees_total=total.get("additionalFees"),
-        details=payload,
-        merchant_id=merchant.id,
-        customer_id=customer.id,
-        delivery_id=delivery.id
-    )
-    db.add(order)
-    db.flush()
+        await event_dedup.release(db, "ifood", event_key)
+        raise
+    if status_code >= 400:
+        await event_dedup.release(db, "ifood", event_key)
+        return status_code, content
+    await db.commit()
+    event_dedup.confirm("ifood", event_key)
+    invalidate_order_cache(order_id)
+    return status_code, content
+
+async def _confirm_order(order_id, payload, db: AsyncSession):
+    await confirmar_pedido_ifood(order_id)
+
+async def _print_label(order_id, payload, db: AsyncSession):
+    order = await load_order_async(db, order_id, options=LABEL_GRAPH)
+    zpl = await gerar_zpl_ifood_async(order)
+    if PRINT_MODE == "spool":
+        await enqueue_print(db, zpl, dedupe_key=order_id)
+    else:
+        await get_printer_backend().print_zpl(DEFAULT_PRINTER_ID, zpl, "Etiqueta iFood")
 
-    # Items
-    for idx, item in enumerate(payload.get("items", [])):
-        order_item = OrderItemORM(
-            order_id=order.id,
-            index=idx,
-            item_id=item.get("id"),
-            unique_id=item.get("uniqueId"),
-            name=item.get("name"),
-            external_code=item.get("externalCode"),
-            ean=item.get("ean"),
-            quantity=item.get("quantity"),
-            unit=item.get("unit"),
-            unit_price=item.get("unitPrice"),
-            options_price=item.get("optionsPrice"),
-            total_price=item.get("totalPrice"),
-            price=item.get("price"),
-            observations=item.get("observations"),
-            image_url=item.get("imageUrl"),
-            type=item.get("type")
-        )
-        db.add(order_item)
-        db.flush()
-        # Options
-        for oidx, option in enumerate(item.get("options", [])):
-            order_option = OrderItemOptionORM(
-                item_id=order_item.id,
-                index=oidx,
-                option_id=option.get("id"),
-                name=option.get("name"),
-                type=option.get("type"),
-                group_name=option.get("groupName"),
-                external_code=option.get("externalCode"),
-                ean=option.get("ean"),
-                quantity=option.get("quantity"),
-                unit=option.get("unit"),
-                unit_price=option.get("unitPrice"),
-                addition=option.get("addition"),
-                price=option.get("price"),
-                option_type=option.get("optionType")
-            )
-            db.add(order_option)
-            db.flush()
-            # Customizations
-            for cidx, customization in enumerate(option.get("customizations", [])):
-                order_customization = OrderItemCustomizationORM(
-                    option_id=order_option.id,
-                    customization_id=customization.get("id"),
-                    external_code=customization.get("externalCode"),
-                    name=customization.get("name"),
-                    group_name=customization.get("groupName"),
-                    type=customization.get("type"),
-                    quantity=customization.get("quantity"),
-                    unit_price=customization.get("unitPrice"),
-                    addition=customization.get("addition"),
-                    price=customization.get("price")
-                )
-                db.add(order_customization)
-    # Payments
-    for payment in payload.get("payments", []):
-        if isinstance(payment, dict):
-            order_payment = OrderPaymentORM(
-                order_id=order.id,
-                value=payment.get("value"),
-                currency=payment.get("currency"),
-                method=payment.get("method"),
-                prepaid=payment.get("prepaid"),
-                type=payment.get("type"),
-                card_brand=payment.get("card", {}).get("brand")
-            )
-            db.add(order_payment)
-        else:
-            logging.info("Pagamento ignorado (não é dict):{payment}")
+# Ordem do fluxo: cada evento é aceito a partir dos status anteriores ao que
+# ele grava. "PLACED" é o status gravado na inserção, antes da confirmação.
+IFOOD_FLOW = (
+    "PLACED", "received", "accepted", "separation_started", "separation_ended",
+    "ready_to_pickup", "ready_to_ship", "dispatched",
+)
 
-    # Additional Fees
-    for fee in payload.get("additionalFees", []):
-        order_fee = OrderAdditionalFeeORM(
-            order_id=order.id,
-            type=fee.get("type"),
-            description=fee.get("description"),
-            full_description=fee.get("fullDescription"),
-            value=fee.get("value"),
-            liabilities=fee.get("liabilities")
-        )
-        db.add(order_fee)
-    db.commit()
-    db.refresh(order)
-    return order
+def _before(status: str):
+    return IFOOD_FLOW[:IFOOD_FLOW.index(status)]
+
+# Evento -> status novo, status de onde o evento é aceito e efeitos colaterais.
+# delivered, concluded e cancelled são finais: nenhum evento tira o pedido deles.
+IFOOD_TRANSITIONS = {
+    "PLACED": Transition("received", ("PLACED",), effects=(_confirm_order, _print_label)),
+    "CONFIRMED": Transition("accepted", _before("accepted")),
+    "SEPARATION_STARTED": Transition("separation_started", _before("separation_started")),
+    "SEPARATION_ENDED": Transition("separation_ended", _before("separation_ended")),
+    "READY_TO_PICKUP": Transition("ready_to_pickup", _before("ready_to_pickup")),
+    "READY_TO_SHIP": Transition("ready_to_ship", _before("ready_to_ship")),
+    "DISPATCHED": Transition("dispatched", _before("dispatched")),
+    "DELIVERED": Transition("delivered", IFOOD_FLOW),
+    "CONCLUDED": Transition("concluded", IFOOD_FLOW),
+    "CANCELLED": Transition("cancelled", IFOOD_FLOW),
+}
+
+async def _apply_ifood_event(payload, order_id, event_type, db: AsyncSession):
+    # Não faz commit: process_ifood_event commita ou desfaz tudo junto
+    outcome, status, transition = await apply_transition(db, order_id, event_type, IFOOD_TRANSITIONS)
+    if outcome == "missing" and event_type == "PLACED":
+        await populate_order_from_payload_async(payload, event_type, db)
+        outcome, status, transition = await apply_transition(db, order_id, event_type, IFOOD_TRANSITIONS)
+    if outcome == "missing":
+        return 404, {"success": False, "message": f"Order {order_id} not found"}
+    if outcome == "rejected":
+        logging.info(f"Evento {event_type} ignorado: pedido {order_id} já está em '{status}'.")
+        return 200, {"success": True, "order_id": order_id, "status": status, "ignored": True}
+    if outcome == "unmapped":
+        logging.info(f"Evento {event_type} pedido {order_id} sem transição mapeada, status segue '{status}'.")
+        return 200, {"success": True, "order_id": order_id, "status": status, "ignored": True}
+
+    for effect in transition.effects:
+        await effect(order_id, payload, db)
+
+    return 200, {"success": True, "order_id": order_id, "status": status}
+
+async def _handle_queued_event(payload, db: AsyncSession):
+    status_code, content = await process_ifood_event(payload, db)
+    if status_code >= 400:
+        # Ex.: CONFIRMED chegou antes do PLACED; tenta de novo mais tarde
+        raise Exception(content.get("message"))
+
+register_handler("ifood", _handle_queued_event)
 
 @router.post("")
-async def ifood_webhook(request: Request, db: Session = Depends(get_db)):
+async def ifood_webhook(request: Request, db: AsyncSession = Depends(get_async_db)):
     payload = await request.json()
     print(payload)
     order_id = payload.get("orderId") or payload.get("id")
@@ -238,72 +139,27 @@ async def ifood_webhook(request: Request, db: Session = Depends(get_db)):
             content={"success": False, "message": "orderId or eventType/fullCode/status not found in payload"}
         )
 
-    order = db.query(OrderORM).filter_by(order_id=order_id).first()
-    if not order:
-        if event_type == "PLACED":
-            # Use a função de popular pedido se quiser todos os dados completos:
-            order = populate_order_from_payload(payload, event_type, db)
-        else:
-            return JSONResponse(
-                status_code=404,
-                content={"success": False, "message": f"Order {order_id} not found"}
-            )
-
-    # Status mapping in English
-    previous_status = (
-        payload.get("metadata", {})
-        .get("triggerEvent", {})
-        .get("previousStatus", "")
-    ).upper()
+    # Reentrega já conhecida: responde sem tocar no banco
+    if event_dedup.seen("ifood", ifood_event_key(payload)):
+        return JSONResponse(status_code=200, content={"success": True, "order_id": order_id, "duplicate": True})
 
-    if event_type == "PLACED":
-        order.status = "received"
-        # Só confirma se o status anterior NÃO for PLACED nem CONFIRMED
-        if previous_status not in ("PLACED", "CONFIRMED"):
-            access_token = await get_ifood_token()
-            await confirmar_pedido_ifood(order_id, access_token)
-        else:
-            logging.info(f"Pedido {order_id} já estava confirmado ou em PLACED anteriormente, não será reenviado.")
-        # Imprime etiqueta apenas se não for repetido
-        if previous_status not in ("PLACED", "CONFIRMED"):
-            zpl = gerar_zpl_ifood(order)
-            await imprimir_zpl_printnode(zpl)
-    elif event_type == "CONFIRMED":
-        if previous_status != "CONFIRMED":
-            order.status = "accepted"
-    elif event_type == "READY_TO_SHIP":
-        if previous_status != "READY_TO_SHIP":
-            order.status = "ready_to_ship"
-    elif event_type == "DISPATCHED":
-        if previous_status != "DISPATCHED":
-            order.status = "dispatched"
-    elif event_type == "DELIVERED":
-        if previous_status != "DELIVERED":
-            order.status = "delivered"
-    elif event_type == "CANCELLED":
-        if previous_status != "CANCELLED":
-            order.status = "cancelled"
-    else:
-        order.status = event_type.lower()
-        logging.info(f"Evento {event_type} pedido {order_id} previousStatus='{previous_status}'")
-
-    db.commit()
+    if WEBHOOK_MODE == "queue":
+        # Persiste o evento bruto e responde na hora; os workers fazem o resto
+        event = await enqueue_event(db, "ifood", payload)
+        return JSONResponse(
+            status_code=200,
+            content={"success": True, "order_id": order_id, "queued": True, "event_id": event.id}
+        )
 
-    return JSONResponse(
-        status_code=200,
-        content={"success": True, "order_id": order_id, "status": order.status}
-    )
+    status_code, content = await process_ifood_event(payload, db)
+    return JSONResponse(status_code=status_code, content=content)
 
-async def confirmar_pedido_ifood(order_id, access_token):
+async def confirmar_pedido_ifood(order_id):
     url = f"https://merchant-api.ifood.com.br/order/v1.0/orders/{order_id}/confirm"
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, headers=headers)
-        if response.status_code != 200:
-            logging.error(f"Erro ao confirmar pedido {order_id}: Status {response.status_code} - {response.text}")
-            raise Exception(f"Erro ao confirmar pedido {order_id}: {response.text}")
-        logging.info(f"Pedido {order_id} confirmado com sucesso no iFood.")
-        return response.json()
+    headers = {"Content-Type": "application/json"}
+    response = await ifood_tokens.request("POST", url, headers=headers)
+    if response.status_code != 200:
+        logging.error(f"Erro ao confirmar pedido {order_id}: Status {response.status_code} - {response.text}")
+        raise Exception(f"Erro ao confirmar pedido {order_id}: {response.text}")
+    logging.info(f"Pedido {order_id} confirmado com sucesso no iFood.")
+    return response.json()
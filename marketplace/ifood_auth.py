@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import os
+import time
+import httpx
+from fastapi import HTTPException
+from core import metrics
+from core.http_clients import get_http_client
+
+IFOOD_CLIENT_ID = os.getenv("IFOOD_CLIENT_ID")
+IFOOD_CLIENT_SECRET = os.getenv("IFOOD_CLIENT_SECRET")
+IFOOD_AUTH_URL = "https://merchant-api.ifood.com.br/authentication/v1.0/oauth/token"
+# Renova o token esse tanto de segundos antes do expiresIn
+IFOOD_TOKEN_REFRESH_MARGIN = int(os.getenv("IFOOD_TOKEN_REFRESH_MARGIN", "300"))
+IFOOD_TOKEN_RETRY_INTERVAL = int(os.getenv("IFOOD_TOKEN_RETRY_INTERVAL", "30"))
+
+token_hits = metrics.counter("ifood_token_cache_hits", "Pedidos de token servidos do cache")
+token_misses = metrics.counter("ifood_token_cache_misses", "Pedidos de token que esperaram uma renovação")
+token_fetch_errors = metrics.counter("ifood_token_fetch_errors", "Falhas ao autenticar no iFood")
+token_rejected = metrics.counter("ifood_token_rejected", "Respostas 401 com o token em cache (revogado)")
+token_fetch_seconds = metrics.histogram("ifood_token_fetch_seconds", "Latência do client_credentials no iFood")
+metrics.gauge("ifood_token_cache_hit_rate", lambda: metrics.ratio(token_hits, token_misses))
+
+class IfoodTokenManager:
+    """
+    Mantém o access token do iFood em memória até pouco antes do expiresIn.
+    Chamadores concorrentes compartilham a mesma renovação em andamento e,
+    com start(), uma task renova o token em segundo plano antes de vencer.
+    """
+    def __init__(self, refresh_margin: int = IFOOD_TOKEN_REFRESH_MARGIN):
+        self.refresh_margin = refresh_margin
+        self._token = None
+        self._expires_at = 0.0
+        self._refresh_at = 0.0
+        self._inflight = None
+        self._background = None
+
+    async def get_token(self):
+        now = time.monotonic()
+        if self._token and now < self._expires_at:
+            token_hits.inc()
+            if now >= self._refresh_at:
+                # Ainda válido, mas perto de vencer: renova sem bloquear quem chamou
+                self._ensure_refresh()
+            return self._token
+        token_misses.inc()
+        return await self.refresh()
+
+    async def refresh(self):
+        return await asyncio.shield(self._ensure_refresh())
+
+    def invalidate(self, token: str = None):
+        """
+        Descarta o token em cache (ex.: o iFood respondeu 401 com ele). Com
+        `token`, só descarta se ainda for o atual: outra chamada pode já ter
+        renovado.
+        """
+        if token is not None and token != self._token:
+            return
+        self._token = None
+        self._expires_at = 0.0
+        self._refresh_at = 0.0
+
+    async def request(self, method: str, url: str, headers: dict = None, **kwargs):
+        """
+        Chamada autenticada à API do iFood. Um token revogado antes do
+        expiresIn volta 401: descarta-o e tenta uma vez com um token novo.
+        """
+        for attempt in (1, 2):
+            token = await self.get_token()
+            response = await get_http_client("ifood").request(
+                method, url, headers={**(headers or {}), "Authorization": f"Bearer {token}"}, **kwargs
+            )
+            if response.status_code != 401 or attempt == 2:
+                return response
+            token_rejected.inc()
+            logging.warning(f"iFood recusou o token em cache (401) em {method} {url}; renovando.")
+            self.invalidate(token)
+
+    def _ensure_refresh(self):
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.ensure_future(self._fetch())
+            self._inflight.add_done_callback(_log_refresh_failure)
+        return self._inflight
+
+    async def _fetch(self):
+        data = {
+            "grantType": "client_credentials",
+            "clientId": IFOOD_CLIENT_ID,
+            "clientSecret": IFOOD_CLIENT_SECRET
+        }
+        headers = {"Content-Type": "application/x-www-form-urlencoded"}
+        start = time.perf_counter()
+        try:
+            response = await get_http_client("ifood").post(IFOOD_AUTH_URL, data=data, headers=headers)
+        except httpx.HTTPError:
+            token_fetch_errors.inc()
+            raise
+        finally:
+            token_fetch_seconds.observe(time.perf_counter() - start)
+        if response.status_code != 200:
+            token_fetch_errors.inc()
+            raise HTTPException(status_code=500, detail=f"Erro ao autenticar no iFood: {response.text}")
+        body = response.json()
+        lifetime = int(body.get("expiresIn", 3600))
+        now = time.monotonic()
+        self._token = body["accessToken"]
+        self._expires_at = now + lifetime
+        # Tokens curtos renovam na metade da vida em vez de entrar em loop
+        self._refresh_at = now + max(lifetime - self.refresh_margin, lifetime / 2)
+        return self._token
+
+    async def start(self):
+        if self._background is None:
+            self._background = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._background is not None:
+            self._background.cancel()
+            await asyncio.gather(self._background, return_exceptions=True)
+            self._background = None
+
+    async def _refresh_loop(self):
+        while True:
+            delay = self._refresh_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # _log_refresh_failure já registrou o erro
+                await asyncio.sleep(IFOOD_TOKEN_RETRY_INTERVAL)
+
+def _log_refresh_failure(task):
+    if not task.cancelled() and task.exception() is not None:
+        logging.warning(f"Falha ao renovar token do iFood: {task.exception()!r}")
+
+ifood_tokens = IfoodTokenManager()
@@ -1,9 +1,12 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, JSON, Index, LargeBinary
 from sqlalchemy.orm import relationship, declarative_base
 from sqlalchemy.dialects.postgresql import JSONB
 
 Base = declarative_base()
 
+# JSONB no Postgres, JSON comum no SQLite (testes e benchmarks)
+JSONType = JSONB().with_variant(JSON(), "sqlite")
+
 class OrderORM(Base):
     __tablename__ = "orders"
     id = Column(Integer, primary_key=True)
@@ -23,7 +26,8 @@ class OrderORM(Base):
     delivery_fee = Column(Float)
     benefits = Column(Float)
     additional_fees_total = Column(Float)
-    details = Column(JSONB)  # payload completo
+    details = Column(JSONType)  # payload completo
+    details_compressed = Column(LargeBinary)  # payload completo em JSON+zlib (ORDER_RAW_COMPRESSION=zlib)
 
     # Foreign keys
     merchant_id = Column(Integer, ForeignKey("order_merchants.id"))
@@ -34,10 +38,35 @@ class OrderORM(Base):
     merchant = relationship("OrderMerchantORM", back_populates="orders")
     customer = relationship("OrderCustomerORM", back_populates="orders")
     delivery = relationship("OrderDeliveryORM", back_populates="orders")
-    items = relationship("OrderItemORM", back_populates="order", cascade="all, delete-orphan")
+    items = relationship("OrderItemORM", back_populates="order", cascade="all, delete-orphan", order_by="OrderItemORM.index")
     payments = relationship("OrderPaymentORM", back_populates="order", cascade="all, delete-orphan")
     additional_fees = relationship("OrderAdditionalFeeORM", back_populates="order", cascade="all, delete-orphan")
 
+    # Listagem paginada por (created_at, id), com e sem filtro de status/loja
+    __table_args__ = (
+        Index("ix_orders_created", "created_at", "id"),
+        Index("ix_orders_status_created", "status", "created_at", "id"),
+        Index("ix_orders_merchant_created", "merchant_id", "created_at", "id"),
+    )
+
+# Pedidos finalizados tirados de orders pelo job de core.order_archive. No
+# Postgres é particionada por mês de created_at (partições criadas sob demanda);
+# a PK começa por order_id, então a busca por id usa o índice de cada partição.
+class OrderArchiveORM(Base):
+    __tablename__ = "orders_archive"
+    order_id = Column(String, primary_key=True)
+    created_at = Column(DateTime, primary_key=True)
+    status = Column(String)
+    display_id = Column(String)
+    merchant_id = Column(String)  # id externo da loja
+    order_amount = Column(Float)
+    archived_at = Column(DateTime, nullable=False)
+    body = Column(LargeBinary, nullable=False)  # resposta de GET /orders/{id} em JSON+zlib
+
+    __table_args__ = (
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
 class OrderMerchantORM(Base):
     __tablename__ = "order_merchants"
     id = Column(Integer, primary_key=True)
@@ -84,7 +113,7 @@ class OrderDeliveryORM(Base):
 class OrderItemORM(Base):
     __tablename__ = "order_items"
     id = Column(Integer, primary_key=True)
-    order_id = Column(Integer, ForeignKey("orders.id"))
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True)
     index = Column(Integer)
     item_id = Column(String)
     unique_id = Column(String)
@@ -101,12 +130,12 @@ class OrderItemORM(Base):
     image_url = Column(String)
     type = Column(String)
     order = relationship("OrderORM", back_populates="items")
-    options = relationship("OrderItemOptionORM", back_populates="item", cascade="all, delete-orphan")
+    options = relationship("OrderItemOptionORM", back_populates="item", cascade="all, delete-orphan", order_by="OrderItemOptionORM.index")
 
 class OrderItemOptionORM(Base):
     __tablename__ = "order_item_options"
     id = Column(Integer, primary_key=True)
-    item_id = Column(Integer, ForeignKey("order_items.id"))
+    item_id = Column(Integer, ForeignKey("order_items.id"), index=True)
     index = Column(Integer)
     option_id = Column(String)
     name = Column(String)
@@ -126,7 +155,7 @@ class OrderItemOptionORM(Base):
 class OrderItemCustomizationORM(Base):
     __tablename__ = "order_item_customizations"
     id = Column(Integer, primary_key=True)
-    option_id = Column(Integer, ForeignKey("order_item_options.id"))
+    option_id = Column(Integer, ForeignKey("order_item_options.id"), index=True)
     customization_id = Column(String)
     external_code = Column(String)
     name = Column(String)
@@ -141,7 +170,7 @@ class OrderItemCustomizationORM(Base):
 class OrderPaymentORM(Base):
     __tablename__ = "order_payments"
     id = Column(Integer, primary_key=True)
-    order_id = Column(Integer, ForeignKey("orders.id"))
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True)
     value = Column(Float)
     currency = Column(String)
     method = Column(String)
@@ -153,10 +182,10 @@ class OrderPaymentORM(Base):
 class OrderAdditionalFeeORM(Base):
     __tablename__ = "order_additional_fees"
     id = Column(Integer, primary_key=True)
-    order_id = Column(Integer, ForeignKey("orders.id"))
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True)
     type = Column(String)
     description = Column(String)
     full_description = Column(String)
     value = Column(Float)
-    liabilities = Column(JSONB)
+    liabilities = Column(JSONType)
     order = relationship("OrderORM", back_populates="additional_fees")
\ No newline at end of file
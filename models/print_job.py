@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index
+from sqlalchemy.orm import declarative_base
+
+Base = declarative_base()
+
+class PrintJobORM(Base):
+    __tablename__ = "print_jobs"
+    id = Column(Integer, primary_key=True)
+    printer_id = Column(String, nullable=False)
+    dedupe_key = Column(String, unique=True)  # ex.: order_id; evita imprimir de novo em redeliveries
+    title = Column(String)
+    zpl = Column(Text, nullable=False)
+    status = Column(String, nullable=False, default="pending")  # pending, printing, done, dead
+    attempts = Column(Integer, nullable=False, default=0)
+    available_at = Column(DateTime, nullable=False)
+    last_error = Column(Text)
+    created_at = Column(DateTime, nullable=False)
+    printed_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_print_jobs_claim", "status", "available_at"),
+    )
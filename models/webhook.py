@@ -0,0 +1,38 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, Index, UniqueConstraint
+from sqlalchemy.orm import declarative_base
+
+Base = declarative_base()
+
+class WebhookEventORM(Base):
+    __tablename__ = "webhook_events"
+    id = Column(Integer, primary_key=True)
+    source = Column(String, nullable=False)  # ifood, amazon, shopee...
+    payload = Column(JSON, nullable=False)  # evento bruto, como recebido
+    status = Column(String, nullable=False, default="pending")  # pending, processing, done, dead
+    attempts = Column(Integer, nullable=False, default=0)
+    available_at = Column(DateTime, nullable=False)  # fim do visibility timeout / próximo retry
+    locked_by = Column(String)
+    last_error = Column(Text)
+    created_at = Column(DateTime, nullable=False)
+    processed_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_webhook_events_claim", "status", "available_at"),
+    )
+
+class ProcessedEventORM(Base):
+    """
+    Eventos de webhook já processados, para descartar reentregas do marketplace.
+    """
+    __tablename__ = "processed_events"
+    id = Column(Integer, primary_key=True)
+    source = Column(String, nullable=False)
+    event_key = Column(String, nullable=False)  # id do evento, ou order_id:fullCode se não vier id
+    order_id = Column(String, index=True)
+    event_type = Column(String)
+    processed_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("source", "event_key", name="uq_processed_events_key"),
+        Index("ix_processed_events_processed_at", "processed_at"),
+    )
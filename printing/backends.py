@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import os
+import time
+from core import metrics
+from printing.graphics import LABEL_GRAPHICS_MODE, graphics_tracker
+from printing.printnode_utils import PRINTNODE_PRINTER_ID, imprimir_zpl_printnode
+
+# printnode: API na nuvem do PrintNode; raw: socket direto na porta 9100 da Zebra
+PRINTER_BACKEND = os.getenv("PRINTER_BACKEND", "printnode").lower()
+DEFAULT_PRINTER_ID = os.getenv("PRINTER_ID") or str(PRINTNODE_PRINTER_ID)
+# Ex.: RAW_PRINTERS="cozinha=192.168.0.50:9100,balcao=192.168.0.51"
+RAW_PRINTERS = os.getenv("RAW_PRINTERS", "")
+RAW_PRINTER_CONNECT_TIMEOUT = float(os.getenv("RAW_PRINTER_CONNECT_TIMEOUT", "3"))
+RAW_PRINTER_IO_TIMEOUT = float(os.getenv("RAW_PRINTER_IO_TIMEOUT", "5"))
+
+printer_send_seconds = metrics.histogram("printer_send_seconds", "Tempo para entregar um job à impressora")
+
+class PrinterError(Exception):
+    pass
+
+class PrinterBackend:
+    """
+    Interface dos backends de impressão. printer_id é sempre string.
+    """
+    name = "base"
+
+    async def print_zpl(self, printer_id: str, zpl: str, title: str = "Etiqueta"):
+        raise NotImplementedError
+
+    async def status(self, printer_id: str):
+        """
+        Estado da impressora (dict) ou None se o backend não consegue consultar.
+        """
+        return None
+
+    async def close(self):
+        pass
+
+class PrintNodeBackend(PrinterBackend):
+    name = "printnode"
+
+    async def print_zpl(self, printer_id: str, zpl: str, title: str = "Etiqueta"):
+        start = time.perf_counter()
+        try:
+            return await imprimir_zpl_printnode(zpl, printer_id=int(printer_id))
+        finally:
+            printer_send_seconds.observe(time.perf_counter() - start)
+
+def parse_host_status(raw: bytes):
+    """
+    Interpreta a resposta do ~HS: três linhas <STX>...<ETX><CR><LF>.
+    """
+    lines = [
+        part.strip(b"\x02\r\n ").decode("ascii", "replace")
+        for part in raw.split(b"\x03") if part.strip(b"\x02\r\n ")
+    ]
+    if len(lines) < 2:
+        raise PrinterError(f"Resposta ~HS inválida: {raw!r}")
+    first = lines[0].split(",")
+    second = lines[1].split(",")
+    return {
+        "paper_out": first[1] == "1",
+        "paused": first[2] == "1",
+        "formats_in_buffer": int(first[4]),
+        "buffer_full": first[5] == "1",
+        "ram_corrupt": first[9] == "1",
+        "under_temperature": first[10] == "1",
+        "over_temperature": first[11] == "1",
+        "head_up": second[2] == "1",
+        "ribbon_out": second[3] == "1",
+        "labels_remaining": int(second[8]),
+        "graphics_stored": int(second[10]),
+    }
+
+class _RawConnection:
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+        self.lock = asyncio.Lock()
+
+    @property
+    def connected(self):
+        # Impressora que fechou a conexão (reinício, timeout ocioso) aparece como EOF
+        return self.writer is not None and not self.writer.is_closing() and not self.reader.at_eof()
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), timeout=RAW_PRINTER_CONNECT_TIMEOUT
+        )
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+        self.reader = self.writer = None
+
+class RawTcpBackend(PrinterBackend):
+    """
+    Envia ZPL direto para a impressora pela porta 9100, mantendo uma conexão
+    persistente por impressora. Jobs para a mesma impressora são escritos em
+    sequência na mesma conexão, sem esperar resposta (o protocolo raw não tem
+    ack); se a conexão caiu, reconecta e reenvia uma vez.
+    """
+    name = "raw"
+
+    def __init__(self, printers: dict):
+        self.printers = printers  # printer_id -> (host, port)
+        self._connections = {}
+
+    def _connection(self, printer_id: str):
+        connection = self._connections.get(printer_id)
+        if connection is None:
+            try:
+                host, port = self.printers[printer_id]
+            except KeyError:
+                raise PrinterError(f"Impressora {printer_id} não está em RAW_PRINTERS")
+            connection = _RawConnection(host, port)
+            self._connections[printer_id] = connection
+        return connection
+
+    async def _send(self, connection: _RawConnection, data: bytes):
+        for attempt in (1, 2):
+            try:
+                if not connection.connected:
+                    await connection.connect()
+                connection.writer.write(data)
+                await asyncio.wait_for(connection.writer.drain(), timeout=RAW_PRINTER_IO_TIMEOUT)
+                return
+            except (ConnectionError, OSError, asyncio.TimeoutError) as exc:
+                await connection.close()
+                if attempt == 2:
+                    raise PrinterError(f"Falha ao enviar para {connection.host}:{connection.port}: {exc!r}")
+
+    async def print_zpl(self, printer_id: str, zpl: str, title: str = "Etiqueta"):
+        connection = self._connection(printer_id)
+        start = time.perf_counter()
+        async with connection.lock:
+            # Dentro do lock: jobs em sequência não regravam o mesmo gráfico
+            zpl, uploaded = graphics_tracker.prepare(printer_id, zpl)
+            await self._send(connection, zpl.encode())
+            graphics_tracker.mark_uploaded(printer_id, uploaded)
+        printer_send_seconds.observe(time.perf_counter() - start)
+
+    async def status(self, printer_id: str):
+        connection = self._connection(printer_id)
+        async with connection.lock:
+            await self._send(connection, b"~HS")
+            raw = b""
+            try:
+                while raw.count(b"\x03") < 3:
+                    chunk = await asyncio.wait_for(connection.reader.read(256), timeout=RAW_PRINTER_IO_TIMEOUT)
+                    if not chunk:
+                        break
+                    raw += chunk
+            except (ConnectionError, OSError, asyncio.TimeoutError) as exc:
+                await connection.close()
+                raise PrinterError(f"Sem resposta do ~HS em {connection.host}:{connection.port}: {exc!r}")
+        status = parse_host_status(raw)
+        if status["graphics_stored"] == 0:
+            # Memória vazia: impressora reiniciou ou foi limpa; regrava os gráficos
+            graphics_tracker.mark_printer_reset(printer_id)
+        return status
+
+    async def close(self):
+        for connection in self._connections.values():
+            await connection.close()
+        self._connections = {}
+
+def parse_raw_printers(value: str):
+    printers = {}
+    for entry in filter(None, (part.strip() for part in value.split(","))):
+        printer_id, _, address = entry.partition("=")
+        host, _, port = address.partition(":")
+        printers[printer_id.strip()] = (host.strip(), int(port or 9100))
+    return printers
+
+_backend = None
+
+def get_printer_backend() -> PrinterBackend:
+    global _backend
+    if _backend is None:
+        if PRINTER_BACKEND == "raw":
+            _backend = RawTcpBackend(parse_raw_printers(RAW_PRINTERS))
+        else:
+            _backend = PrintNodeBackend()
+            if LABEL_GRAPHICS_MODE == "stored":
+                logging.warning(
+                    "LABEL_GRAPHICS_MODE=stored com o backend printnode: o ~DG só é regravado a cada "
+                    "PRINTER_GRAPHICS_REUPLOAD_INTERVAL, sem detectar reset da impressora, então o ^XG "
+                    "pode sair em branco nesse meio tempo. Prefira inline."
+                )
+        logging.info(f"Backend de impressão: {_backend.name}")
+    return _backend
+
+async def close_printer_backend():
+    global _backend
+    if _backend is not None:
+        await _backend.close()
+        _backend = None
@@ -0,0 +1,189 @@
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from core import metrics
+from printing.labelary_utils import gerar_pdf_etiqueta, gerar_png_etiqueta
+
+LABEL_CACHE_MEMORY_BYTES = int(os.getenv("LABEL_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))
+LABEL_CACHE_DIR = os.getenv("LABEL_CACHE_DIR", os.path.join(tempfile.gettempdir(), "lollapet-labels"))
+LABEL_CACHE_DISK_BYTES = int(os.getenv("LABEL_CACHE_DISK_BYTES", str(512 * 1024 * 1024)))  # 0 desliga o disco
+
+label_cache_memory_hits = metrics.counter("label_cache_memory_hits", "Etiquetas renderizadas servidas da memória")
+label_cache_disk_hits = metrics.counter("label_cache_disk_hits", "Etiquetas renderizadas servidas do disco")
+label_cache_misses = metrics.counter("label_cache_misses", "Etiquetas que precisaram ser renderizadas")
+
+RENDERERS = {
+    "pdf": gerar_pdf_etiqueta,
+    "png": gerar_png_etiqueta,
+}
+
+def label_cache_key(zpl: str, fmt: str, width_mm, height_mm, dpmm):
+    """
+    Chave pelo conteúdo: mesmo ZPL, formato, tamanho e resolução geram os mesmos bytes.
+    """
+    digest = hashlib.sha256(f"{fmt}:{width_mm}x{height_mm}:{dpmm}\n".encode())
+    digest.update(zpl.encode())
+    return digest.hexdigest()
+
+class _MemoryTier:
+    """
+    LRU limitado pelo total de bytes guardados, e não pelo número de entradas.
+    """
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._data[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self.size -= len(evicted)
+
+class _DiskTier:
+    """
+    Um arquivo por chave em <dir>/<2 primeiros hex>/<chave>. O mtime é tocado a
+    cada leitura e, passando de `max_bytes`, os arquivos mais antigos saem primeiro.
+    """
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = None
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def _scan(self):
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = f.read()
+            os.utime(path)
+            return value
+        except FileNotFoundError:
+            return None
+
+    def set(self, key, value: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Escreve num temporário e renomeia: leitores nunca veem arquivo pela metade
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(value)
+        os.replace(tmp_path, path)
+        with self._lock:
+            if self.size is None:
+                self.size = sum(size for _, size, _ in self._scan())
+            else:
+                self.size += len(value)
+            if self.size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        entries = sorted(self._scan())
+        self.size = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9  # folga para não varrer o diretório a cada gravação
+        for _, size, path in entries:
+            if self.size <= target:
+                break
+            try:
+                os.remove(path)
+                self.size -= size
+            except FileNotFoundError:
+                pass
+
+class LabelCache:
+    """
+    Cache das etiquetas renderizadas (PDF/PNG), endereçado pelo conteúdo: memória
+    (LRU por bytes) na frente e disco atrás. Renderizações concorrentes da mesma
+    chave esperam uma única execução.
+    """
+    def __init__(self, memory_bytes: int = LABEL_CACHE_MEMORY_BYTES,
+                 directory: str = LABEL_CACHE_DIR, disk_bytes: int = LABEL_CACHE_DISK_BYTES):
+        self.memory = _MemoryTier(memory_bytes)
+        self.disk = _DiskTier(directory, disk_bytes) if disk_bytes > 0 else None
+        self._inflight = {}
+        metrics.gauge("label_cache_memory_bytes", lambda: self.memory.size)
+        metrics.gauge("label_cache_disk_bytes", lambda: self.disk.size if self.disk else None)
+
+    async def _read_disk(self, key):
+        if self.disk is None:
+            return None
+        try:
+            return await asyncio.to_thread(self.disk.get, key)
+        except OSError as exc:
+            logging.warning(f"Falha ao ler etiqueta {key} do cache em disco: {exc!r}")
+            return None
+
+    async def _write_disk(self, key, value):
+        if self.disk is None:
+            return
+        try:
+            await asyncio.to_thread(self.disk.set, key, value)
+        except OSError as exc:
+            logging.warning(f"Falha ao gravar etiqueta {key} no cache em disco: {exc!r}")
+
+    async def get_or_render(self, key: str, fmt: str, zpl: str, width_mm, height_mm, dpmm):
+        value = self.memory.get(key)
+        if value is not None:
+            label_cache_memory_hits.inc()
+            return value
+
+        flight = self._inflight.get(key)
+        if flight is not None:
+            return await asyncio.shield(flight)
+        flight = asyncio.get_running_loop().create_future()
+        self._inflight[key] = flight
+        try:
+            value = await self._read_disk(key)
+            if value is not None:
+                label_cache_disk_hits.inc()
+            else:
+                label_cache_misses.inc()
+                value = await RENDERERS[fmt](zpl, width_mm, height_mm, dpmm)
+                await self._write_disk(key, value)
+            self.memory.set(key, value)
+            flight.set_result(value)
+            return value
+        except Exception as exc:
+            flight.set_exception(exc)
+            flight.exception()  # evita o aviso de exceção não lida quando ninguém espera
+            raise
+        finally:
+            self._inflight.pop(key, None)
+            if not flight.done():
+                flight.cancel()
+
+label_cache = LabelCache()
@@ -0,0 +1,80 @@
+import os
+import re
+
+LABELS_DIR = os.path.join(os.path.dirname(__file__), "labels")
+
+# {campo} é escapado para uso dentro de ^FH^FD; {campo!raw} entra como está (trechos ZPL)
+_PLACEHOLDER = re.compile(r"\{(\w+)(!raw)?\}")
+
+# Com ^FH, "_" seguido de dois dígitos hex vira o byte correspondente
+_FIELD_ESCAPES = str.maketrans({
+    "_": "_5F",
+    "^": "_5E",
+    "~": "_7E",
+    "\r": " ",
+    "\n": " ",
+})
+
+def escape_field(value):
+    if value is None:
+        return ""
+    return str(value).translate(_FIELD_ESCAPES)
+
+class LabelTemplate:
+    """
+    Template ZPL compilado: o texto é quebrado uma única vez em trechos fixos e
+    campos, e render() só junta os trechos com os valores já escapados.
+    """
+    def __init__(self, name: str, source: str):
+        self.name = name
+        self.segments = []
+        self.fields = set()
+        position = 0
+        for match in _PLACEHOLDER.finditer(source):
+            if match.start() > position:
+                self.segments.append(source[position:match.start()])
+            field, raw = match.group(1), bool(match.group(2))
+            self.segments.append((field, raw))
+            self.fields.add(field)
+            position = match.end()
+        if position < len(source):
+            self.segments.append(source[position:])
+
+    def render(self, values: dict):
+        missing = self.fields - values.keys()
+        if missing:
+            raise ValueError(f"Campos ausentes para o template {self.name}: {sorted(missing)}")
+        return "".join(
+            segment if isinstance(segment, str)
+            else (str(values[segment[0]]) if segment[1] else escape_field(values[segment[0]]))
+            for segment in self.segments
+        )
+
+    def render_batch(self, values_list):
+        """
+        Vários labels (^XA...^XZ) num único fluxo ZPL, para reimpressões em lote.
+        """
+        return "\n".join(self.render(values) for values in values_list)
+
+def load_templates(directory: str = LABELS_DIR):
+    """
+    Carrega e compila os templates <marketplace>_<tamanho>.zpl do diretório.
+    """
+    templates = {}
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".zpl"):
+            continue
+        name = filename[:-4]
+        marketplace, _, size = name.partition("_")
+        with open(os.path.join(directory, filename), encoding="utf-8") as f:
+            templates[(marketplace, size)] = LabelTemplate(name, f.read().strip())
+    return templates
+
+# Compilados uma vez, na importação (startup da aplicação)
+TEMPLATES = load_templates()
+
+def get_template(marketplace: str, size: str = "100x150"):
+    try:
+        return TEMPLATES[(marketplace, size)]
+    except KeyError:
+        raise ValueError(f"Nenhum template de etiqueta para {marketplace} {size}")
@@ -1,11 +1,27 @@
-import httpx
+import os
+from core.http_clients import get_http_client
+from printing.render_pool import preview_pool, preview_seconds
+from printing.zpl_render import zpl_to_pdf, zpl_to_png
+
+# local: rasteriza no próprio processo (printing/zpl_render.py); labelary: API pública
+LABEL_PREVIEW_RENDERER = os.getenv("LABEL_PREVIEW_RENDERER", "local").lower()
 
 async def gerar_pdf_labelary(zpl: str, width_mm=100, height_mm=150, dpi=8):
     url = f"https://api.labelary.com/v1/printers/{dpi}dpmm/labels/{width_mm}x{height_mm}/0/"
     headers = {"Accept": "application/pdf"}
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, data=zpl.encode(), headers=headers)
-        if response.status_code == 200:
-            return response.content  # PDF em bytes
-        else:
-            raise Exception(f"Erro ao gerar PDF: {response.text}")
\ No newline at end of file
+    response = await get_http_client("labelary").post(url, content=zpl.encode(), headers=headers)
+    if response.status_code == 200:
+        return response.content  # PDF em bytes
+    else:
+        raise Exception(f"Erro ao gerar PDF: {response.text}")
+
+async def gerar_pdf_etiqueta(zpl: str, width_mm=100, height_mm=150, dpmm=8):
+    """
+    Preview em PDF da etiqueta, no renderizador configurado em LABEL_PREVIEW_RENDERER.
+    """
+    if LABEL_PREVIEW_RENDERER == "labelary":
+        return await gerar_pdf_labelary(zpl, width_mm, height_mm, dpmm)
+    return await preview_pool.submit(preview_seconds, zpl_to_pdf, zpl, width_mm, height_mm, dpmm)
+
+async def gerar_png_etiqueta(zpl: str, width_mm=100, height_mm=150, dpmm=8):
+    return await preview_pool.submit(preview_seconds, zpl_to_png, zpl, width_mm, height_mm, dpmm)
@@ -1,6 +1,7 @@
 import base64
-import httpx
 import os
+from core.http_clients import get_http_client
+from printing.graphics import graphics_tracker
 
 PRINTNODE_API_KEY = os.getenv("PRINTNODE_API_KEY")
 PRINTNODE_PRINTER_ID = int(os.getenv("PRINTNODE_PRINTER_ID", "0"))  # Defina no .env
@@ -10,6 +11,8 @@ async def imprimir_zpl_printnode(zpl: str, printer_id: int = None, api_key: str
         printer_id = PRINTNODE_PRINTER_ID
     if api_key is None:
         api_key = PRINTNODE_API_KEY
+    # Inclui os ~DG dos gráficos que a impressora ainda não tem
+    zpl, uploaded = graphics_tracker.prepare(printer_id, zpl)
     url = "https://api.printnode.com/printjobs"
     data = {
         "printerId": printer_id,
@@ -18,8 +21,8 @@ async def imprimir_zpl_printnode(zpl: str, printer_id: int = None, api_key: str
         "content": base64.b64encode(zpl.encode()).decode()
     }
     auth = (api_key, "")
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, json=data, auth=auth)
-        if response.status_code != 201:
-            raise Exception(f"Erro ao imprimir: {response.text}")
-        return response.json()
\ No newline at end of file
+    response = await get_http_client("printnode").post(url, json=data, auth=auth)
+    if response.status_code != 201:
+        raise Exception(f"Erro ao imprimir: {response.text}")
+    graphics_tracker.mark_uploaded(printer_id, uploaded)
+    return response.json()
\ No newline at end of file
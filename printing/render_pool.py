@@ -0,0 +1,66 @@
+import os
+from types import SimpleNamespace
+from core import metrics
+from core.bounded_pool import BoundedPool, PoolFull
+from core.order_storage import raw_payload
+from core.order_writer import customer_row, delivery_row
+from printing.zpl_utils import gerar_zpl_ifood
+
+LABEL_RENDER_EXECUTOR = os.getenv("LABEL_RENDER_EXECUTOR", "thread")  # thread ou process
+LABEL_RENDER_WORKERS = int(os.getenv("LABEL_RENDER_WORKERS", "2"))
+# Máximo de renderizações aguardando ou em execução; acima disso rejeita na hora
+LABEL_RENDER_MAX_PENDING = int(os.getenv("LABEL_RENDER_MAX_PENDING", "64"))
+# Previews (GET /orders/{id}/label) têm pool e fila próprios: uma rajada de
+# previews é rejeitada ali sem encher a fila das etiquetas dos pedidos novos
+LABEL_PREVIEW_WORKERS = int(os.getenv("LABEL_PREVIEW_WORKERS", "1"))
+LABEL_PREVIEW_MAX_PENDING = int(os.getenv("LABEL_PREVIEW_MAX_PENDING", "16"))
+
+render_seconds = metrics.histogram("label_render_seconds", "Tempo de renderização da etiqueta no worker")
+preview_seconds = metrics.histogram("label_preview_seconds", "Tempo de renderização do preview (ZPL, PDF, PNG) no worker")
+
+class RenderPoolFull(PoolFull):
+    pass
+
+# Renderização das etiquetas (QR, Pillow, ZPL) fora do event loop
+render_pool = BoundedPool(
+    "label_render", LABEL_RENDER_WORKERS, LABEL_RENDER_MAX_PENDING,
+    kind=LABEL_RENDER_EXECUTOR, full_error=RenderPoolFull
+)
+preview_pool = BoundedPool(
+    "label_preview", LABEL_PREVIEW_WORKERS, LABEL_PREVIEW_MAX_PENDING,
+    kind=LABEL_RENDER_EXECUTOR, full_error=RenderPoolFull
+)
+
+def order_label_snapshot(order):
+    """
+    Cópia simples (serializável) dos campos do pedido usados na etiqueta, para
+    mandar ao worker sem levar o objeto ORM/sessão junto. Pedidos gravados só
+    com o payload bruto (ORDER_STORAGE_MODE=raw) leem cliente e endereço dele.
+    """
+    customer = getattr(order, "customer", None)
+    delivery = getattr(order, "delivery", None)
+    if customer is None or delivery is None:
+        raw = raw_payload(order) or {}
+        customer = customer or SimpleNamespace(**customer_row(raw.get("customer") or {}))
+        delivery = delivery or SimpleNamespace(**delivery_row(raw.get("delivery") or {}))
+    return SimpleNamespace(
+        order_id=getattr(order, "order_id", None),
+        display_id=getattr(order, "display_id", None),
+        order_amount=getattr(order, "order_amount", None),
+        customer=SimpleNamespace(name=getattr(customer, "name", None)),
+        delivery=SimpleNamespace(**{
+            field: getattr(delivery, field, None)
+            for field in (
+                "address_street", "address_number", "address_complement",
+                "address_neighborhood", "address_city"
+            )
+        }),
+    )
+
+async def gerar_zpl_ifood_async(order, qr_mode=None, graphics_mode=None, preview=False):
+    """
+    gerar_zpl_ifood executado no pool de renderização (ou no de previews, com
+    `preview`). Levanta RenderPoolFull se a fila do pool estiver cheia.
+    """
+    pool, seconds = (preview_pool, preview_seconds) if preview else (render_pool, render_seconds)
+    return await pool.submit(seconds, gerar_zpl_ifood, order_label_snapshot(order), qr_mode, graphics_mode)
@@ -0,0 +1,248 @@
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from core import metrics
+from core.retention import delete_in_batches, register_purge
+from core.sql import dialect_insert
+from database import AsyncSessionLocal
+from models.print_job import PrintJobORM
+from printing.backends import DEFAULT_PRINTER_ID, get_printer_backend
+
+# spool: etiquetas vão para a fila durável e o spooler imprime
+# direct: imprime na hora, dentro do webhook (comportamento antigo)
+PRINT_MODE = os.getenv("PRINT_MODE", "spool").lower()
+# Jobs da mesma impressora que chegam dentro dessa janela saem num único job
+PRINT_COALESCE_WINDOW = float(os.getenv("PRINT_COALESCE_WINDOW", "0.5"))  # segundos
+PRINT_MAX_BATCH = int(os.getenv("PRINT_MAX_BATCH", "50"))
+PRINT_MAX_ATTEMPTS = int(os.getenv("PRINT_MAX_ATTEMPTS", "8"))
+PRINT_RETRY_BACKOFF = float(os.getenv("PRINT_RETRY_BACKOFF", "2"))  # segundos, dobra a cada tentativa
+PRINT_RETRY_BACKOFF_MAX = float(os.getenv("PRINT_RETRY_BACKOFF_MAX", "300"))
+PRINT_VISIBILITY_TIMEOUT = int(os.getenv("PRINT_VISIBILITY_TIMEOUT", "120"))
+PRINT_POLL_INTERVAL = float(os.getenv("PRINT_POLL_INTERVAL", "2.0"))
+# Impressora pausada ou com erro: os jobs esperam isso sem gastar tentativa
+PRINT_HOLD_INTERVAL = float(os.getenv("PRINT_HOLD_INTERVAL", "30"))  # segundos
+# Campos do status do backend em que a impressora não imprime
+# Jobs impressos (com o ZPL inteiro) saem da tabela depois disso; os desistidos ficam mais
+PRINT_JOB_RETENTION_HOURS = float(os.getenv("PRINT_JOB_RETENTION_HOURS", "24"))
+PRINT_DEAD_RETENTION_DAYS = float(os.getenv("PRINT_DEAD_RETENTION_DAYS", "30"))
+PRINTER_HOLD_FLAGS = ("paused", "paper_out", "head_up", "ribbon_out", "over_temperature", "ram_corrupt")
+
+print_jobs_enqueued = metrics.counter("print_jobs_enqueued", "Etiquetas colocadas na fila de impressão")
+print_jobs_deduplicated = metrics.counter("print_jobs_deduplicated", "Etiquetas descartadas por já estarem na fila")
+print_jobs_printed = metrics.counter("print_jobs_printed", "Etiquetas impressas pelo spooler")
+print_batches_sent = metrics.counter("print_batches_sent", "Jobs enviados à impressora (após agrupar)")
+print_jobs_failed = metrics.counter("print_jobs_failed", "Tentativas de impressão que falharam")
+print_jobs_dead = metrics.counter("print_jobs_dead", "Etiquetas desistidas após PRINT_MAX_ATTEMPTS")
+print_jobs_held = metrics.counter("print_jobs_held", "Envios adiados com a impressora pausada ou com erro")
+
+_wakeup = asyncio.Event()
+
+async def enqueue_print(db: AsyncSession, zpl: str, printer_id=None, dedupe_key: str = None, title: str = "Etiqueta iFood"):
+    """
+    Coloca a etiqueta na fila durável, na transação de quem chamou (não faz
+    commit). Com `dedupe_key` (ex.: order_id), uma segunda chamada com a mesma
+    chave é ignorada. Retorna True se enfileirou.
+    """
+    now = datetime.utcnow()
+    insert = dialect_insert(db)
+    stmt = insert(PrintJobORM).values(
+        printer_id=str(printer_id if printer_id is not None else DEFAULT_PRINTER_ID),
+        dedupe_key=dedupe_key,
+        title=title,
+        zpl=zpl,
+        status="pending",
+        attempts=0,
+        available_at=now,
+        created_at=now
+    ).on_conflict_do_nothing(index_elements=["dedupe_key"])
+    result = await db.execute(stmt)
+    if result.rowcount == 0:
+        print_jobs_deduplicated.inc()
+        logging.info(f"Etiqueta {dedupe_key} já estava na fila de impressão, ignorando.")
+        return False
+    print_jobs_enqueued.inc()
+    # Só acorda o spooler depois do commit de quem chamou: antes disso o job
+    # não é visível para ele
+    db.sync_session.info["print_wakeup"] = True
+    return True
+
+@event.listens_for(Session, "after_commit")
+def _wake_spooler(session):
+    if session.info.pop("print_wakeup", False):
+        _wakeup.set()
+
+@event.listens_for(Session, "after_rollback")
+def _discard_wakeup(session):
+    session.info.pop("print_wakeup", None)
+
+async def purge_print_jobs(db: AsyncSession):
+    now = datetime.utcnow()
+    done = await delete_in_batches(
+        db, PrintJobORM,
+        PrintJobORM.status == "done",
+        PrintJobORM.printed_at < now - timedelta(hours=PRINT_JOB_RETENTION_HOURS)
+    )
+    dead = await delete_in_batches(
+        db, PrintJobORM,
+        PrintJobORM.status == "dead",
+        PrintJobORM.created_at < now - timedelta(days=PRINT_DEAD_RETENTION_DAYS)
+    )
+    return done + dead
+
+register_purge("print_jobs", purge_print_jobs)
+
+async def send_to_printer(printer_id: str, zpl: str, title: str):
+    await get_printer_backend().print_zpl(printer_id, zpl, title)
+
+class PrintSpooler:
+    """
+    Consome a fila print_jobs: agrupa os jobs de cada impressora num único ZPL
+    com várias etiquetas, tenta de novo com backoff exponencial e desiste
+    (status "dead") depois de PRINT_MAX_ATTEMPTS.
+    """
+    def __init__(self):
+        self.queue_depth = {}
+        self._printer_locks = {}
+        self._task = None
+        metrics.gauge("print_queue_depth", lambda: dict(self.queue_depth))
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=PRINT_POLL_INTERVAL)
+                # Chegou etiqueta nova: espera a janela para juntar as que vierem atrás
+                await asyncio.sleep(PRINT_COALESCE_WINDOW)
+            except asyncio.TimeoutError:
+                pass
+            _wakeup.clear()
+            try:
+                await self.drain_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logging.exception("Erro inesperado no spooler de impressão")
+
+    async def drain_once(self):
+        async with AsyncSessionLocal() as db:
+            jobs = await self._claim(db)
+            by_printer = defaultdict(list)
+            for job in jobs:
+                by_printer[job.printer_id].append(job)
+            await asyncio.gather(*[
+                self._print_printer(db, printer_id, batch) for printer_id, batch in by_printer.items()
+            ])
+            await db.commit()
+            await self._refresh_depth(db)
+            return len(jobs)
+
+    async def _claim(self, db: AsyncSession):
+        now = datetime.utcnow()
+        stmt = (
+            select(PrintJobORM)
+            .filter(
+                PrintJobORM.status.in_(("pending", "printing")),
+                PrintJobORM.available_at <= now
+            )
+            .order_by(PrintJobORM.printer_id, PrintJobORM.created_at, PrintJobORM.id)
+            .limit(PRINT_MAX_BATCH * 10)
+            .with_for_update(skip_locked=True)
+        )
+        jobs = (await db.execute(stmt)).scalars().all()
+        for job in jobs:
+            job.status = "printing"
+            job.attempts += 1
+            job.available_at = now + timedelta(seconds=PRINT_VISIBILITY_TIMEOUT)
+        await db.commit()
+        return jobs
+
+    async def _print_printer(self, db: AsyncSession, printer_id: str, jobs):
+        """
+        Impressoras em paralelo, mas os lotes de cada uma em sequência e sob
+        um lock por impressora: a consulta de status vale para o envio que
+        vem logo depois, e as etiquetas saem na ordem da fila.
+        """
+        lock = self._printer_locks.setdefault(printer_id, asyncio.Lock())
+        async with lock:
+            for i in range(0, len(jobs), PRINT_MAX_BATCH):
+                if not await self._print_batch(db, printer_id, jobs[i:i + PRINT_MAX_BATCH]):
+                    rest = jobs[i + PRINT_MAX_BATCH:]
+                    if rest:
+                        self._hold(printer_id, rest, ["lote anterior não foi impresso"])
+                    return
+
+    async def _print_batch(self, db: AsyncSession, printer_id: str, jobs):
+        """
+        Envia um lote. Retorna True se a impressora aceitou.
+        """
+        zpl = "\n".join(job.zpl for job in jobs)
+        title = jobs[0].title if len(jobs) == 1 else f"{len(jobs)} etiquetas"
+        try:
+            # Consulta antes de enviar: num reset (memória de gráficos vazia) o
+            # backend já marca os gráficos para regravar neste envio
+            status = await get_printer_backend().status(printer_id)
+            problems = [flag for flag in PRINTER_HOLD_FLAGS if status and status.get(flag)]
+            if problems:
+                self._hold(printer_id, jobs, problems)
+                return False
+            await send_to_printer(printer_id, zpl, title)
+        except Exception as exc:
+            print_jobs_failed.inc(len(jobs))
+            now = datetime.utcnow()
+            for job in jobs:
+                job.last_error = repr(exc)
+                if job.attempts >= PRINT_MAX_ATTEMPTS:
+                    job.status = "dead"
+                    print_jobs_dead.inc()
+                else:
+                    job.status = "pending"
+                    delay = min(PRINT_RETRY_BACKOFF * (2 ** (job.attempts - 1)), PRINT_RETRY_BACKOFF_MAX)
+                    job.available_at = now + timedelta(seconds=delay)
+            logging.warning(f"Falha ao imprimir {len(jobs)} etiqueta(s) na impressora {printer_id}: {exc!r}")
+            return False
+        now = datetime.utcnow()
+        for job in jobs:
+            job.status = "done"
+            job.last_error = None
+            job.printed_at = now
+        print_jobs_printed.inc(len(jobs))
+        print_batches_sent.inc()
+        return True
+
+    def _hold(self, printer_id: str, jobs, problems):
+        # Enviar agora só perderia as etiquetas (ou encheria o buffer da impressora)
+        print_jobs_held.inc(len(jobs))
+        available_at = datetime.utcnow() + timedelta(seconds=PRINT_HOLD_INTERVAL)
+        for job in jobs:
+            job.status = "pending"
+            job.attempts -= 1
+            job.available_at = available_at
+            job.last_error = f"Impressora {printer_id}: {', '.join(problems)}"
+        logging.warning(
+            f"Impressora {printer_id} indisponível ({', '.join(problems)}); "
+            f"{len(jobs)} etiqueta(s) aguardando {PRINT_HOLD_INTERVAL:g}s."
+        )
+
+    async def _refresh_depth(self, db: AsyncSession):
+        stmt = (
+            select(PrintJobORM.printer_id, func.count())
+            .filter(PrintJobORM.status.in_(("pending", "printing")))
+            .group_by(PrintJobORM.printer_id)
+        )
+        self.queue_depth = {printer_id: count for printer_id, count in (await db.execute(stmt)).all()}
+
+print_spooler = PrintSpooler()
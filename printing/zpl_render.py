@@ -0,0 +1,272 @@
+import io
+import logging
+import os
+import unicodedata
+from functools import lru_cache
+import qrcode
+from PIL import Image, ImageDraw, ImageFont
+from printing.graphics import GRAPHICS
+from printing.zpl_utils import decode_graphic_data
+
+# Fonte TrueType usada no lugar da fonte 0 da Zebra
+LABEL_PREVIEW_FONT = os.getenv("LABEL_PREVIEW_FONT")
+_FONT_CANDIDATES = (
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+    "/Library/Fonts/Arial.ttf",
+    "C:/Windows/Fonts/arial.ttf",
+)
+# Sem nenhuma delas, usa a fonte embutida do Pillow (só ASCII; acentos são removidos)
+PREVIEW_FONT_PATH = LABEL_PREVIEW_FONT or next((path for path in _FONT_CANDIDATES if os.path.exists(path)), None)
+
+_QR_ERROR_LEVELS = {
+    "H": qrcode.constants.ERROR_CORRECT_H,
+    "Q": qrcode.constants.ERROR_CORRECT_Q,
+    "M": qrcode.constants.ERROR_CORRECT_M,
+    "L": qrcode.constants.ERROR_CORRECT_L,
+}
+
+@lru_cache(maxsize=32)
+def _font(size: int):
+    if PREVIEW_FONT_PATH:
+        return ImageFont.truetype(PREVIEW_FONT_PATH, size)
+    return ImageFont.load_default(size=size)
+
+def _ascii(text: str):
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+
+def _split_commands(zpl: str):
+    """
+    Quebra o ZPL em (comando, parâmetros). ^FD vai até o ^FS seguinte, pois o
+    texto do campo pode ter vírgulas e outros caracteres.
+    """
+    position = 0
+    length = len(zpl)
+    while True:
+        start = min(
+            (i for i in (zpl.find("^", position), zpl.find("~", position)) if i != -1),
+            default=-1
+        )
+        if start == -1 or start + 3 > length:
+            return
+        command = zpl[start + 1:start + 3].upper()
+        if command == "FD":
+            end = zpl.find("^FS", start + 3)
+        else:
+            end = min(
+                (i for i in (zpl.find("^", start + 3), zpl.find("~", start + 3)) if i != -1),
+                default=-1
+            )
+        if end == -1:
+            end = length
+        yield zpl[start] + command, zpl[start + 3:end]
+        position = end
+
+def _int(value, default=0):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+def _bitmap_mask(bitmap: bytes, row_bytes: int):
+    # Bit 1 no ZPL é ponto preto; no modo "1" do Pillow vira máscara de pintura
+    return Image.frombytes("1", (row_bytes * 8, len(bitmap) // row_bytes), bitmap)
+
+@lru_cache(maxsize=64)
+def _graphic_mask(total_bytes: int, row_bytes: int, data: str):
+    # Cacheado: o mesmo ^GFA (logo inline, por exemplo) se repete em toda etiqueta
+    return _bitmap_mask(decode_graphic_data(data, total_bytes, row_bytes), row_bytes)
+
+@lru_cache(maxsize=16)
+def _stored_graphic_mask(name: str, checksum: str):
+    graphic = next(g for g in GRAPHICS.values() if g.name == name)
+    return _bitmap_mask(graphic.bitmap, graphic.row_bytes)
+
+def _graphic_name(filename: str):
+    return filename.split(":")[-1].split(".")[0].upper()
+
+class _LabelCanvas:
+    """
+    Estado de um ^XA...^XZ: posição do campo, fonte e tipo do próximo campo.
+    """
+    def __init__(self, size, stored_graphics):
+        self.image = Image.new("1", size, 1)
+        self.draw = ImageDraw.Draw(self.image)
+        self.stored_graphics = stored_graphics
+        self.origin = (0, 0)
+        self.default_font = (30, 30)
+        self.font = None
+        self.hex_escape = None
+        self.encoding = "cp1252"
+        self.barcode = None
+
+    def end_field(self):
+        self.font = None
+        self.hex_escape = None
+        self.barcode = None
+
+    def decode_field(self, data: str):
+        if self.hex_escape is None:
+            return data
+        raw = bytearray()
+        i = 0
+        while i < len(data):
+            if data[i] == self.hex_escape and i + 2 < len(data):
+                try:
+                    raw.append(int(data[i + 1:i + 3], 16))
+                    i += 3
+                    continue
+                except ValueError:
+                    pass
+            raw += data[i].encode(self.encoding, "replace")
+            i += 1
+        return raw.decode(self.encoding, "replace")
+
+    def text(self, text: str):
+        height, width = self.font or self.default_font
+        font = _font(max(1, height))
+        if not PREVIEW_FONT_PATH:
+            text = _ascii(text)
+        if width == height:
+            self.draw.text(self.origin, text, font=font, fill=0)
+            return
+        # Largura diferente da altura: desenha numa máscara e estica na horizontal
+        left, top, right, bottom = font.getbbox(text)
+        if right <= 0 or bottom <= 0:
+            return
+        mask = Image.new("1", (right, bottom), 0)
+        ImageDraw.Draw(mask).text((0, 0), text, font=font, fill=1)
+        mask = mask.resize((max(1, right * width // height), bottom), Image.NEAREST)
+        self.image.paste(0, self.origin, mask)
+
+    def qr(self, data: str, magnification: int):
+        level = _QR_ERROR_LEVELS.get(data[:1].upper(), qrcode.constants.ERROR_CORRECT_M)
+        _, _, payload = data.partition(",")
+        qr = qrcode.QRCode(error_correction=level, box_size=1, border=0)
+        qr.add_data(payload)
+        qr.make(fit=True)
+        matrix = qr.get_matrix()
+        modules = len(matrix)
+        mask = Image.new("L", (modules, modules), 0)
+        mask.putdata([255 if cell else 0 for row in matrix for cell in row])
+        mask = mask.resize((modules * magnification, modules * magnification), Image.NEAREST)
+        self.image.paste(0, self.origin, mask)
+
+    def box(self, params):
+        values = params.split(",")
+        thickness = max(1, _int(values[2] if len(values) > 2 else None, 1))
+        width = max(thickness, _int(values[0], thickness))
+        height = max(thickness, _int(values[1] if len(values) > 1 else None, thickness))
+        color = 1 if len(values) > 3 and values[3].strip().upper() == "W" else 0
+        rounding = _int(values[4] if len(values) > 4 else None, 0)
+        x, y = self.origin
+        rect = (x, y, x + width - 1, y + height - 1)
+        if rounding:
+            radius = min(width, height) * min(rounding, 8) // 16
+            self.draw.rounded_rectangle(rect, radius=radius, outline=color, width=thickness)
+        else:
+            self.draw.rectangle(rect, outline=color, width=thickness)
+
+    def graphic(self, params):
+        values = params.split(",", 4)
+        if len(values) < 5 or values[0].strip().upper() != "A":
+            logging.debug(f"^GF não suportado no preview: {params[:20]}")
+            return
+        total_bytes, row_bytes = _int(values[2]), _int(values[3])
+        if not total_bytes or not row_bytes:
+            return
+        self.image.paste(0, self.origin, _graphic_mask(total_bytes, row_bytes, values[4]))
+
+    def recall(self, params):
+        values = params.split(",")
+        name = _graphic_name(values[0])
+        mask = self.stored_graphics.get(name)
+        if mask is None:
+            graphic = next((g for g in GRAPHICS.values() if g.name == name), None)
+            if graphic is None:
+                logging.debug(f"Gráfico {name} desconhecido no preview")
+                return
+            mask = _stored_graphic_mask(graphic.name, graphic.checksum)
+        scale_x = max(1, _int(values[1] if len(values) > 1 else None, 1))
+        scale_y = max(1, _int(values[2] if len(values) > 2 else None, 1))
+        if (scale_x, scale_y) != (1, 1):
+            mask = mask.resize((mask.width * scale_x, mask.height * scale_y), Image.NEAREST)
+        self.image.paste(0, self.origin, mask)
+
+def render_zpl(zpl: str, width_mm=100, height_mm=150, dpmm=8):
+    """
+    Rasteriza o subconjunto de ZPL usado nas nossas etiquetas (^FO, ^A0/^CF, ^FD,
+    ^FH, ^GB, ^GFA, ^BQ, ^XG/~DG, ^CI28). Retorna uma imagem 1-bit por ^XA...^XZ.
+    Rotação de fonte e comandos fora desse subconjunto são ignorados.
+    """
+    size = (round(width_mm * dpmm), round(height_mm * dpmm))
+    stored_graphics = {}
+    labels = []
+    canvas = None
+    for command, params in _split_commands(zpl):
+        if command == "^XA":
+            canvas = _LabelCanvas(size, stored_graphics)
+        elif command == "~DG":
+            values = params.split(",", 3)
+            if len(values) == 4:
+                stored_graphics[_graphic_name(values[0])] = _graphic_mask(
+                    _int(values[1]), _int(values[2]), values[3]
+                )
+        elif canvas is None:
+            continue
+        elif command == "^XZ":
+            labels.append(canvas.image)
+            canvas = None
+        elif command == "^FO":
+            values = params.split(",")
+            canvas.origin = (_int(values[0]), _int(values[1] if len(values) > 1 else None))
+        elif command.startswith("^A") and command != "^A@":
+            values = params.lstrip("NRIB").lstrip(",").split(",")
+            height = _int(values[0], canvas.default_font[0])
+            canvas.font = (height, _int(values[1] if len(values) > 1 else None, height))
+        elif command == "^CF":
+            values = params.split(",")
+            height = _int(values[1] if len(values) > 1 else None, canvas.default_font[0])
+            canvas.default_font = (height, _int(values[2] if len(values) > 2 else None, height))
+        elif command == "^CI":
+            canvas.encoding = "utf-8" if _int(params.split(",")[0]) == 28 else "cp1252"
+        elif command == "^FH":
+            canvas.hex_escape = params[:1] or "_"
+        elif command == "^BQ":
+            values = params.split(",")
+            canvas.barcode = ("qr", _int(values[2] if len(values) > 2 else None, 2))
+        elif command == "^FD":
+            data = canvas.decode_field(params)
+            if canvas.barcode:
+                canvas.qr(data, canvas.barcode[1])
+            else:
+                canvas.text(data)
+        elif command == "^GB":
+            canvas.box(params)
+        elif command == "^GF":
+            canvas.graphic(params)
+        elif command == "^XG":
+            canvas.recall(params)
+        elif command == "^FS":
+            canvas.end_field()
+    return labels
+
+def zpl_to_png(zpl: str, width_mm=100, height_mm=150, dpmm=8, index=0):
+    labels = render_zpl(zpl, width_mm, height_mm, dpmm)
+    if not labels:
+        raise ValueError("ZPL sem nenhuma etiqueta (^XA...^XZ)")
+    buffer = io.BytesIO()
+    labels[index].save(buffer, format="PNG", dpi=(dpmm * 25.4, dpmm * 25.4))
+    return buffer.getvalue()
+
+def zpl_to_pdf(zpl: str, width_mm=100, height_mm=150, dpmm=8):
+    """
+    PDF com uma página por etiqueta, no tamanho físico do label.
+    """
+    labels = render_zpl(zpl, width_mm, height_mm, dpmm)
+    if not labels:
+        raise ValueError("ZPL sem nenhuma etiqueta (^XA...^XZ)")
+    buffer = io.BytesIO()
+    labels[0].save(buffer, format="PDF", save_all=True, append_images=labels[1:], resolution=dpmm * 25.4)
+    return buffer.getvalue()
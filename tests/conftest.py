@@ -0,0 +1,71 @@
+import asyncio
+import os
+import tempfile
+import pytest
+
+# database.py cria as engines e as tabelas no import: aponta para um SQLite
+# descartável antes que algum teste importe o app
+os.environ["DATABASE_URL"] = os.getenv(
+    "TEST_DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='tests-')}/test.db"
+)
+os.environ.pop("ASYNC_DATABASE_URL", None)
+
+@pytest.fixture
+def db():
+    """
+    Sessão síncrona sobre tabelas vazias e sem os caches em memória que
+    guardam dados do banco (PKs de lojas, pedidos, usuários).
+    """
+    from database import SessionLocal, engine
+    from core.authentication import token_cache, user_cache
+    from core.order import order_cache
+    from core.order_writer import merchant_pks
+    from models.user import Base as UserBase
+    from models.order import Base as OrderBase
+    from models.webhook import Base as WebhookBase
+    from models.print_job import Base as PrintJobBase
+
+    with engine.begin() as conn:
+        for base in (UserBase, OrderBase, WebhookBase, PrintJobBase):
+            for table in reversed(base.metadata.sorted_tables):
+                conn.execute(table.delete())
+    for cache in (merchant_pks, order_cache, user_cache, token_cache):
+        cache.clear()
+    session = SessionLocal()
+    yield session
+    session.close()
+
+@pytest.fixture
+def run_async():
+    """
+    asyncio.run que fecha as conexões da engine async no fim; sem isso as
+    threads do aiosqlite presas ao loop encerrado seguram o processo.
+    """
+    from database import async_engine
+
+    def run(coro):
+        async def main():
+            try:
+                return await coro
+            finally:
+                await async_engine.dispose()
+        return asyncio.run(main())
+    return run
+
+@pytest.fixture
+def api(db):
+    """
+    Cliente HTTP das rotas de pedidos, com a autenticação desligada.
+    """
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from core.authentication import get_current_user
+    from core.order import router as order_router
+    from core.order_export import router as order_export_router
+
+    app = FastAPI()
+    app.include_router(order_export_router, prefix="/orders")
+    app.include_router(order_router, prefix="/orders")
+    app.dependency_overrides[get_current_user] = lambda: object()
+    with TestClient(app) as client:
+        yield client
@@ -1,2 +1,53 @@
+import pytest
+from fastapi import HTTPException
+from benchmarks.fixtures import StatementCounter
+from core import authentication as module
+from core.authentication import create_access_token, get_current_user, invalidate_user_cache
+
 def test_dummy():
     assert True
+
+def test_current_user_is_resolved_from_caches(db, monkeypatch):
+    from database import engine
+    from models.user import UserORM
+
+    user = UserORM(username="ana", email="ana@lolla.pet", hashed_password="x", disabled=False)
+    db.add(user)
+    db.commit()
+    token = create_access_token({"sub": str(user.id)})
+
+    decodes = []
+    decode = module.jwt.decode
+    monkeypatch.setattr(module.jwt, "decode", lambda *args, **kwargs: decodes.append(1) or decode(*args, **kwargs))
+    counter = StatementCounter(engine)
+    assert get_current_user(token, db).username == "ana"
+    queries = counter.count
+    assert get_current_user(token, db).username == "ana"
+    assert counter.count == queries  # segunda requisição sem ir ao banco
+    assert len(decodes) == 1
+
+    user.disabled = True
+    db.commit()
+    invalidate_user_cache(user.id)
+    assert get_current_user(token, db).disabled is True
+    with pytest.raises(HTTPException) as exc:
+        get_current_user(token + "x", db)
+    assert exc.value.status_code == 401
+
+def test_disabled_user_can_reenable_and_delete_the_account(db):
+    from models.user import UserORM, UserUpdate
+
+    user = UserORM(username="bia", email="bia@lolla.pet", hashed_password="x", disabled=True)
+    db.add(user)
+    db.commit()
+    token = create_access_token({"sub": str(user.id)})
+
+    def current_orm():
+        return module.get_current_user_orm(db, get_current_user(token, db))
+
+    assert module.update_me(UserUpdate(disabled=False), db, current_orm()).disabled is False
+    assert get_current_user(token, db).disabled is False
+    assert module.delete_me(db, current_orm()) == {"success": True}
+    with pytest.raises(HTTPException) as exc:
+        get_current_user(token, db)
+    assert exc.value.status_code == 401
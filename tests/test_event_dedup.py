@@ -0,0 +1,61 @@
+from benchmarks.fixtures import make_order_payload
+from core.event_dedup import ifood_event_key
+from core.order_writer import bulk_insert_order
+
+def test_fallback_key_uses_order_id():
+    assert ifood_event_key({"orderId": "a", "fullCode": "CONFIRMED"}) == "a:CONFIRMED"
+    assert ifood_event_key({"id": "a", "fullCode": "CONFIRMED"}) == "a:CONFIRMED"
+    assert ifood_event_key({"orderId": "a", "id": "evt-1", "fullCode": "CONFIRMED"}) == "evt-1"
+    assert ifood_event_key({"orderId": "a", "fullCode": "CONFIRMED"}) != ifood_event_key(
+        {"orderId": "b", "fullCode": "CONFIRMED"}
+    )
+
+def test_same_event_on_two_orders_is_applied_to_both(db, run_async):
+    from database import AsyncSessionLocal
+    from marketplace.ifood import process_ifood_event
+    from models.order import OrderORM
+
+    first, second = make_order_payload(seq=9001), make_order_payload(seq=9002)
+    for payload in (first, second):
+        bulk_insert_order(payload, "PLACED", db)
+    db.commit()
+
+    async def scenario():
+        async with AsyncSessionLocal() as session:
+            results = [
+                await process_ifood_event({"orderId": payload["id"], "fullCode": "CONFIRMED"}, session)
+                for payload in (first, second)
+            ]
+            redelivery = await process_ifood_event({"orderId": first["id"], "fullCode": "CONFIRMED"}, session)
+        return results, redelivery
+
+    results, redelivery = run_async(scenario())
+    assert [content.get("duplicate") for _, content in results] == [None, None]
+    assert redelivery == (200, {"success": True, "order_id": first["id"], "duplicate": True})
+    db.expire_all()
+    statuses = {order.order_id: order.status for order in db.query(OrderORM)}
+    assert statuses == {first["id"]: "accepted", second["id"]: "accepted"}
+
+def test_processed_events_are_purged_after_retention(db, run_async):
+    from datetime import datetime, timedelta
+    from core.retention import delete_in_batches, retention_job
+    from database import AsyncSessionLocal
+    from models.webhook import ProcessedEventORM
+
+    now = datetime.utcnow()
+    for n, age in enumerate([1, 100, 200, 300, 400]):
+        db.add(ProcessedEventORM(source="ifood", event_key=f"evt-{n}", processed_at=now - timedelta(hours=age)))
+    db.commit()
+
+    async def scenario():
+        async with AsyncSessionLocal() as session:
+            # Lote de uma linha: apaga as duas mais antigas em várias transações
+            in_batches = await delete_in_batches(
+                session, ProcessedEventORM, ProcessedEventORM.processed_at < now - timedelta(hours=250), batch=1
+            )
+        return in_batches, await retention_job.purge_once()
+
+    in_batches, purged = run_async(scenario())
+    assert in_batches == 2
+    assert purged["processed_events"] == 1  # a de 200h; a retenção padrão é 168h
+    assert sorted(event.event_key for event in db.query(ProcessedEventORM)) == ["evt-0", "evt-1"]
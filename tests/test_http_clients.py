@@ -0,0 +1,28 @@
+import asyncio
+from core.http_clients import UPSTREAMS, HttpClientRegistry, get_http_client, http_clients
+
+def test_one_client_per_upstream_is_reused():
+    async def scenario():
+        registry = HttpClientRegistry(UPSTREAMS)
+        ifood = registry.get("ifood")
+        assert registry.get("ifood") is ifood
+        assert registry.get("printnode") is not ifood
+        assert ifood.timeout.read == UPSTREAMS["ifood"]["timeout"]
+        await registry.aclose()
+        assert ifood.is_closed
+        # Fechado, o próximo get cria outro em vez de devolver o cliente morto
+        reopened = registry.get("ifood")
+        assert reopened is not ifood and not reopened.is_closed
+        await registry.aclose()
+    asyncio.run(scenario())
+
+def test_lifespan_opens_and_closes_the_shared_clients(db):
+    from fastapi.testclient import TestClient
+    from main import app
+
+    with TestClient(app):
+        clients = {name: get_http_client(name) for name in UPSTREAMS}
+        assert all(not client.is_closed for client in clients.values())
+        assert get_http_client("labelary") is clients["labelary"]
+    assert all(client.is_closed for client in clients.values())
+    assert http_clients._clients == {}
@@ -0,0 +1,50 @@
+import asyncio
+import httpx
+from marketplace import ifood_auth as module
+from marketplace.ifood_auth import IfoodTokenManager
+
+def _fake_ifood(monkeypatch, revoked):
+    """
+    iFood de mentira: cada autenticação devolve um token novo (t1, t2...) e a
+    API responde 401 para os tokens em `revoked`.
+    """
+    calls = {"auth": 0, "api": []}
+
+    def handler(request):
+        if request.url.path.endswith("/oauth/token"):
+            calls["auth"] += 1
+            return httpx.Response(200, json={"accessToken": f"t{calls['auth']}", "expiresIn": 3600})
+        token = request.headers["Authorization"].removeprefix("Bearer ")
+        calls["api"].append(token)
+        return httpx.Response(401 if token in revoked else 200, json={"token": token})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(module, "get_http_client", lambda name: client)
+    return calls
+
+def test_request_retries_once_with_a_new_token_after_401(monkeypatch):
+    calls = _fake_ifood(monkeypatch, revoked={"t1"})
+    tokens = IfoodTokenManager()
+
+    async def scenario():
+        response = await tokens.request("POST", "https://ifood.test/orders/1/confirm")
+        assert response.status_code == 200 and response.json() == {"token": "t2"}
+        # O token novo fica em cache
+        assert (await tokens.request("GET", "https://ifood.test/orders/1")).status_code == 200
+
+    asyncio.run(scenario())
+    assert calls == {"auth": 2, "api": ["t1", "t2", "t2"]}
+
+def test_request_gives_up_after_second_401(monkeypatch):
+    calls = _fake_ifood(monkeypatch, revoked={"t1", "t2"})
+    response = asyncio.run(IfoodTokenManager().request("GET", "https://ifood.test/orders/1"))
+    assert response.status_code == 401
+    assert calls == {"auth": 2, "api": ["t1", "t2"]}
+
+def test_invalidate_ignores_token_already_replaced():
+    tokens = IfoodTokenManager()
+    tokens._token, tokens._expires_at = "t2", float("inf")
+    tokens.invalidate("t1")
+    assert tokens._token == "t2"
+    tokens.invalidate("t2")
+    assert tokens._token is None
@@ -0,0 +1,51 @@
+import pytest
+from benchmarks.fixtures import make_order_payload
+from core.order_status import Transition
+from marketplace import ifood as module
+from printing import spooler
+
+@pytest.fixture
+def placed(monkeypatch):
+    """
+    PLACED sem chamar o iFood e com ZPL fixo.
+    """
+    async def fake_render(order):
+        return f"^XA^FD{order.order_id}^FS^XZ"
+
+    monkeypatch.setattr(module, "gerar_zpl_ifood_async", fake_render)
+    monkeypatch.setattr(module, "PRINT_MODE", "spool")
+    monkeypatch.setitem(module.IFOOD_TRANSITIONS, "PLACED", Transition("received", ("PLACED",), effects=(module._print_label,)))
+
+def _process(run_async, payload):
+    from database import AsyncSessionLocal
+
+    async def scenario():
+        async with AsyncSessionLocal() as session:
+            return await module.process_ifood_event(payload, session)
+    return run_async(scenario())
+
+def _counts(db):
+    from models.order import OrderORM
+    from models.print_job import PrintJobORM
+    from models.webhook import ProcessedEventORM
+    return [db.query(model).count() for model in (OrderORM, PrintJobORM, ProcessedEventORM)]
+
+def test_placed_commits_order_and_print_job_together(db, run_async, placed):
+    spooler._wakeup.clear()
+    payload = make_order_payload(seq=7001)
+    assert _process(run_async, payload) == (200, {"success": True, "order_id": payload["id"], "status": "received"})
+    assert _counts(db) == [1, 1, 1]
+    assert spooler._wakeup.is_set()
+
+def test_failed_effect_rolls_back_print_job(db, run_async, placed, monkeypatch):
+    async def failing(order_id, payload, session):
+        raise RuntimeError("falhou depois de enfileirar")
+
+    monkeypatch.setitem(
+        module.IFOOD_TRANSITIONS, "PLACED", Transition("received", ("PLACED",), effects=(module._print_label, failing))
+    )
+    spooler._wakeup.clear()
+    with pytest.raises(RuntimeError):
+        _process(run_async, make_order_payload(seq=7002))
+    assert _counts(db) == [0, 0, 0]
+    assert not spooler._wakeup.is_set()
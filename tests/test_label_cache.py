@@ -0,0 +1,52 @@
+import asyncio
+from printing import label_cache as module
+from printing.label_cache import LabelCache, _DiskTier, _MemoryTier, label_cache_key
+
+def test_key_depends_on_zpl_format_and_resolution():
+    key = label_cache_key("^XA^XZ", "pdf", 100, 150, 8)
+    assert key == label_cache_key("^XA^XZ", "pdf", 100, 150, 8)
+    assert key != label_cache_key("^XA^XZ", "png", 100, 150, 8)
+    assert key != label_cache_key("^XA^XZ", "pdf", 100, 150, 12)
+    assert key != label_cache_key("^XA^FDx^FS^XZ", "pdf", 100, 150, 8)
+
+def test_memory_tier_evicts_least_recently_used_by_bytes():
+    tier = _MemoryTier(max_bytes=25)
+    tier.set("a", b"a" * 10)
+    tier.set("b", b"b" * 10)
+    tier.get("a")
+    tier.set("c", b"c" * 10)
+    assert tier.get("b") is None
+    assert tier.get("a") and tier.get("c")
+    assert tier.size == 20
+
+def test_disk_tier_evicts_oldest_files(tmp_path):
+    tier = _DiskTier(str(tmp_path), max_bytes=3000)
+    for i in range(10):
+        tier.set(f"{i:064x}", b"x" * 1000)
+    assert tier.size <= 3000
+    assert tier.get(f"{9:064x}") == b"x" * 1000
+    assert tier.get(f"{0:064x}") is None
+
+def test_concurrent_requests_render_once(tmp_path, monkeypatch):
+    calls = []
+
+    async def fake_render(zpl, width_mm, height_mm, dpmm):
+        calls.append(zpl)
+        await asyncio.sleep(0.01)
+        return b"%PDF fake"
+
+    monkeypatch.setitem(module.RENDERERS, "pdf", fake_render)
+    cache = LabelCache(memory_bytes=1024, directory=str(tmp_path), disk_bytes=1024)
+    key = label_cache_key("^XA^XZ", "pdf", 100, 150, 8)
+
+    async def scenario():
+        results = await asyncio.gather(*[
+            cache.get_or_render(key, "pdf", "^XA^XZ", 100, 150, 8) for _ in range(5)
+        ])
+        assert results == [b"%PDF fake"] * 5
+        # Memória vazia: volta do disco sem renderizar de novo
+        cache.memory = _MemoryTier(1024)
+        assert await cache.get_or_render(key, "pdf", "^XA^XZ", 100, 150, 8) == b"%PDF fake"
+
+    asyncio.run(scenario())
+    assert len(calls) == 1
@@ -0,0 +1,44 @@
+import pytest
+from types import SimpleNamespace
+from printing.label_templates import LabelTemplate, escape_field
+from printing.zpl_utils import gerar_zpl_ifood, gerar_zpl_ifood_lote
+
+def _order(**overrides):
+    values = dict(
+        order_id="4f6c9a3e-3a1b-4f1e-9d9a-6c1f0b3e2a10",
+        display_id="1234",
+        order_amount=59.9,
+        customer=SimpleNamespace(name="Maria"),
+        delivery=SimpleNamespace(
+            address_street="Rua das Flores", address_number="123", address_complement=None,
+            address_neighborhood="Centro", address_city="São Paulo"
+        ),
+    )
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+def test_escape_field_neutralizes_zpl_control_characters():
+    assert escape_field("a_b^c~d\ne") == "a_5Fb_5Ec_7Ed e"
+    assert escape_field(None) == ""
+
+def test_template_renders_escaped_and_raw_fields():
+    template = LabelTemplate("t", "^XA^FH^FD{name}^FS{logo!raw}^XZ")
+    assert template.render({"name": "x^y", "logo": "^XGE:L.GRF,1,1"}) == "^XA^FH^FDx_5Ey^FS^XGE:L.GRF,1,1^XZ"
+    with pytest.raises(ValueError):
+        template.render({"name": "x"})
+
+def test_ifood_label_uses_stored_logo_and_native_qr():
+    zpl = gerar_zpl_ifood(_order(customer=SimpleNamespace(name="Ana ^XZ")), graphics_mode="stored")
+    assert "^XGE:LOLLA.GRF,1,1^FS" in zpl
+    assert "^FDMA,https://lolla.pet/nfe/4f6c9a3e-3a1b-4f1e-9d9a-6c1f0b3e2a10^FS" in zpl
+    assert "Cliente: Ana _5EXZ^FS" in zpl
+    assert zpl.startswith("^XA") and zpl.endswith("^XZ")
+
+def test_inline_logo_carries_the_bitmap():
+    zpl = gerar_zpl_ifood(_order(), graphics_mode="inline")
+    assert "^GFA,5000,5000,25," in zpl and "^XG" not in zpl
+
+def test_batch_renders_one_label_per_order():
+    batch = gerar_zpl_ifood_lote([_order(display_id=str(i)) for i in range(3)])
+    assert batch.count("^XA") == 3
+    assert "Código: 2^FS" in batch
@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta
+from benchmarks.fixtures import make_order_payload
+from core.order_archive import OrderArchiver
+from core.order_writer import bulk_insert_order
+
+def test_finished_orders_are_archived_and_still_served(db, api, run_async):
+    from models.order import OrderArchiveORM, OrderItemORM, OrderORM
+
+    old = datetime.utcnow() - timedelta(days=120)
+    stored = {}
+    for seq, (status, created_at) in enumerate([
+        ("delivered", old), ("cancelled", old), ("accepted", old), ("delivered", datetime.utcnow())
+    ]):
+        payload = make_order_payload(2, 1, 1, seq=seq, created_at=created_at)
+        bulk_insert_order(payload, "PLACED", db, mode="normalized" if seq else "hybrid")
+        db.query(OrderORM).filter_by(order_id=payload["id"]).update({"status": status})
+        stored[status if created_at is old else "recent"] = payload["id"]
+    db.commit()
+    before = {name: api.get(f"/orders/{order_id}") for name, order_id in stored.items()}
+
+    assert run_async(OrderArchiver(after_days=90).archive_once()) == 2
+    db.expire_all()
+    assert {order.order_id for order in db.query(OrderORM)} == {stored["accepted"], stored["recent"]}
+    assert db.query(OrderItemORM).count() == 4  # itens dos arquivados foram junto
+    assert {row.order_id for row in db.query(OrderArchiveORM)} == {stored["delivered"], stored["cancelled"]}
+
+    for name, order_id in stored.items():
+        after = api.get(f"/orders/{order_id}")
+        assert after.status_code == 200
+        assert after.content == before[name].content and after.headers["ETag"] == before[name].headers["ETag"]
+    assert run_async(OrderArchiver(after_days=90).archive_once()) == 0
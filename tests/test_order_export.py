@@ -0,0 +1,48 @@
+import csv
+import io
+import json
+from benchmarks.fixtures import make_order_payload
+from core.order_export import _accepts_gzip, iter_export
+from core.order_writer import bulk_insert_order
+
+def _store_orders(db, count, mode="normalized"):
+    ids = []
+    for seq in range(count):
+        payload = make_order_payload(2, 1, 0, seq=seq, merchant_id="loja-b" if seq % 2 else "loja-a")
+        bulk_insert_order(payload, "PLACED", db, mode=mode)
+        ids.append(payload["id"])
+    db.commit()
+    return ids
+
+def test_accepts_gzip():
+    assert _accepts_gzip("gzip, deflate")
+    assert _accepts_gzip("br;q=1.0, gzip;q=0.5")
+    assert not _accepts_gzip("gzip;q=0")
+    assert not _accepts_gzip(None)
+
+def test_export_streams_in_chunks_in_chronological_order(db):
+    from database import SessionLocal
+
+    ids = _store_orders(db, 7)
+    chunks = list(iter_export(SessionLocal, [], "ndjson", chunk_size=3))
+    assert len(chunks) == 3  # um pedaço por lote do cursor
+    orders = [json.loads(line) for line in b"".join(chunks).splitlines()]
+    assert [order["id"] for order in orders] == ids
+    assert all("details" not in order and len(order["items"]) == 2 for order in orders)
+
+def test_csv_export_has_one_row_per_item_and_is_gzipped(db, api):
+    ids = _store_orders(db, 4, mode="raw")
+    response = api.get("/orders/export", params={"format": "csv", "merchant_id": "loja-b"},
+                       headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.content.decode())))
+    assert [(row["order_id"], row["item_index"]) for row in rows] == [
+        (ids[1], "0"), (ids[1], "1"), (ids[3], "0"), (ids[3], "1")
+    ]
+    assert rows[0]["item_options"] == "1x Opção 0" and rows[0]["merchant_id"] == "loja-b"
+
+    plain = api.get("/orders/export", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert len(plain.content.splitlines()) == 4
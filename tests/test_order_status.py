@@ -0,0 +1,86 @@
+from benchmarks.fixtures import make_order_payload
+from core.order_status import apply_transition
+from core.order_writer import bulk_insert_order
+from marketplace.ifood import IFOOD_TRANSITIONS
+
+def test_out_of_order_events_are_rejected_without_changing_status(db, run_async):
+    from database import AsyncSessionLocal
+
+    payload = make_order_payload(seq=0)
+    bulk_insert_order(payload, "PLACED", db)
+    db.commit()
+    order_id = payload["id"]
+
+    async def scenario():
+        results = []
+        async with AsyncSessionLocal() as session:
+            for event_type in (
+                "CONFIRMED", "PLACED", "DELIVERED", "CUSTOM_EVENT", "CONCLUDED", "DISPATCHED", "CONFIRMED", "CANCELLED"
+            ):
+                outcome, status, _ = await apply_transition(session, order_id, event_type, IFOOD_TRANSITIONS)
+                results.append((event_type, outcome, status))
+            missing = await apply_transition(session, "nao-existe", "CONFIRMED", IFOOD_TRANSITIONS)
+            await session.commit()
+        return results, missing[:2]
+
+    results, missing = run_async(scenario())
+    assert missing == ("missing", None)
+    assert results == [
+        ("CONFIRMED", "applied", "accepted"),
+        # PLACED repetido não reconfirma nem reimprime
+        ("PLACED", "rejected", "accepted"),
+        ("DELIVERED", "applied", "delivered"),
+        # Evento fora da tabela não mexe no status
+        ("CUSTOM_EVENT", "unmapped", "delivered"),
+        # delivered é final: nada tira o pedido de lá
+        ("CONCLUDED", "rejected", "delivered"),
+        ("DISPATCHED", "rejected", "delivered"),
+        ("CONFIRMED", "rejected", "delivered"),
+        ("CANCELLED", "rejected", "delivered"),
+    ]
+
+def test_unknown_current_status_only_accepts_final_events(db, run_async):
+    from database import AsyncSessionLocal
+    from models.order import OrderORM
+
+    payload = make_order_payload(seq=2)
+    bulk_insert_order(payload, "PLACED", db)
+    db.query(OrderORM).update({"status": "status_legado"})
+    db.commit()
+
+    async def scenario():
+        async with AsyncSessionLocal() as session:
+            results = [
+                (await apply_transition(session, payload["id"], event_type, IFOOD_TRANSITIONS))[:2]
+                for event_type in ("PLACED", "CONFIRMED", "DISPATCHED", "CONCLUDED", "CANCELLED")
+            ]
+            await session.commit()
+        return results
+
+    assert run_async(scenario()) == [
+        ("rejected", "status_legado"),
+        ("rejected", "status_legado"),
+        ("rejected", "status_legado"),
+        ("applied", "concluded"),
+        ("rejected", "concluded"),
+    ]
+
+def test_rejected_event_is_acknowledged_and_remembered(db, run_async):
+    from database import AsyncSessionLocal
+    from marketplace.ifood import process_ifood_event
+
+    from models.order import OrderORM
+
+    payload = make_order_payload(seq=1)
+    bulk_insert_order(payload, "PLACED", db)
+    db.query(OrderORM).update({"status": "delivered"})
+    db.commit()
+    event = {"orderId": payload["id"], "id": "evento-atrasado", "fullCode": "DISPATCHED"}
+
+    async def scenario():
+        async with AsyncSessionLocal() as session:
+            return [await process_ifood_event(event, session) for _ in range(2)]
+
+    rejected, redelivery = run_async(scenario())
+    assert rejected == (200, {"success": True, "order_id": payload["id"], "status": "delivered", "ignored": True})
+    assert redelivery[1]["duplicate"] is True
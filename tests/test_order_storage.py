@@ -0,0 +1,45 @@
+import copy
+import json
+from benchmarks.fixtures import StatementCounter, make_order_payload
+from core import order_storage
+from core.order import load_order, load_stored_order, serialize_order
+from core.order_export import iter_export
+from core.order_writer import bulk_insert_order
+
+PAYLOAD = make_order_payload(n_items=3)
+PAYLOAD["preparationStartDateTime"] = "2026-01-01T09:05:00-03:00"
+PAYLOAD["customer"]["phone"]["localizerExpiration"] = "2026-01-01T15:00:00Z"
+PAYLOAD["delivery"]["pickupCode"] = "4321"
+PAYLOAD["payments"].append("dinheiro")  # não é dict: o writer ignora
+
+def _store(db, mode, compression="none", seq=0):
+    payload = copy.deepcopy(PAYLOAD)
+    payload["id"] = f"pedido-{seq}"
+    bulk_insert_order(payload, "PLACED", db, mode=mode, compression=compression)
+    db.commit()
+    return payload["id"]
+
+def test_response_shape_is_the_same_in_every_storage_mode(db):
+    expected = serialize_order(load_order(db, _store(db, "normalized")), include_details=False)
+    assert expected["delivery"]["pickupCode"] == "4321"
+    assert expected["customer"]["phone"]["localizerExpiration"] == "2026-01-01T15:00:00"
+
+    for seq, (mode, compression) in enumerate([("hybrid", "none"), ("raw", "none"), ("raw", "zlib")], start=1):
+        order_id = _store(db, mode, compression, seq=seq)
+        db.expunge_all()
+        body = serialize_order(load_stored_order(db, order_id), include_details=False)
+        assert json.dumps(dict(body, id=expected["id"])) == json.dumps(expected), mode
+
+def test_export_loads_normalized_only_orders_per_batch(db, monkeypatch):
+    from database import SessionLocal, engine
+
+    monkeypatch.setattr(order_storage, "ORDER_STORAGE_MODE", "hybrid")
+    for seq in range(20):
+        _store(db, "normalized", seq=seq)
+    _store(db, "raw", seq=20)
+    counter = StatementCounter(engine)
+    lines = b"".join(iter_export(SessionLocal, [], "ndjson", chunk_size=50)).splitlines()
+    assert len(lines) == 21
+    assert all(len(json.loads(line)["items"]) == 3 for line in lines)
+    # Uma query da listagem e uma por nível do grafo para o lote, não por pedido
+    assert counter.count <= 8
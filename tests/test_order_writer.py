@@ -0,0 +1,79 @@
+from datetime import datetime
+from benchmarks.fixtures import StatementCounter, make_order_payload
+from core.order_writer import bulk_insert_order, parse_datetime
+
+def test_parse_datetime_returns_naive_utc():
+    assert parse_datetime("2026-01-01T12:00:00Z") == datetime(2026, 1, 1, 12, 0)
+    assert parse_datetime("2026-01-01T09:00:00-03:00") == datetime(2026, 1, 1, 12, 0)
+    assert parse_datetime("2026-01-01T12:00:00") == datetime(2026, 1, 1, 12, 0)
+    assert parse_datetime("") is None
+    assert parse_datetime("ontem") is None
+
+def test_stored_datetimes_are_naive(db):
+    from models.order import OrderORM
+
+    payload = make_order_payload(seq=0)
+    payload["customer"]["phone"]["localizerExpiration"] = "2026-01-01T15:00:00-03:00"
+    order = db.get(OrderORM, bulk_insert_order(payload, "PLACED", db, mode="normalized"))
+    db.commit()
+    values = (order.created_at, order.delivery.delivery_datetime, order.customer.phone_localizer_expiration)
+    assert values == (datetime(2026, 1, 1, 12, 0), datetime(2026, 1, 1, 12, 0), datetime(2026, 1, 1, 18, 0))
+    assert all(value.tzinfo is None for value in values)
+
+def test_insert_uses_the_same_number_of_statements_for_any_order_size(db):
+    from database import engine
+    from core.order import load_order
+
+    counter = StatementCounter(engine)
+    counts = []
+    # O primeiro pedido ainda grava a loja; os seguintes pegam o id do cache
+    for seq, size in enumerate([(1, 1, 1), (1, 1, 1), (20, 3, 2)]):
+        payload = make_order_payload(*size, seq=seq)
+        counter.reset()
+        bulk_insert_order(payload, "PLACED", db, mode="normalized")
+        counts.append(counter.count)
+        db.commit()
+    assert counts[1] == counts[2]
+
+    order = load_order(db, payload["id"])
+    assert [item.item_id for item in order.items] == [f"item-{i}" for i in range(20)]
+    assert [option.option_id for option in order.items[7].options] == ["opt-7-0", "opt-7-1", "opt-7-2"]
+    assert [c.customization_id for c in order.items[7].options[2].customizations] == ["cus-7-2-0", "cus-7-2-1"]
+    assert len(order.payments) == 1 and len(order.additional_fees) == 1
+
+def test_merchants_and_customers_are_upserted_and_merchant_ids_cached_after_commit(db):
+    from core.order_writer import merchant_pks
+    from models.order import OrderCustomerORM, OrderMerchantORM
+
+    first = make_order_payload(seq=0, customer_id="cliente-1")
+    bulk_insert_order(first, "PLACED", db)
+    assert merchant_pks.get("merchant-1") is None  # ainda sem commit
+    db.rollback()
+    assert merchant_pks.get("merchant-1") is None
+
+    bulk_insert_order(first, "PLACED", db)
+    db.commit()
+    merchant_pk = merchant_pks.get("merchant-1")
+    assert merchant_pk == db.query(OrderMerchantORM).one().id
+
+    second = make_order_payload(seq=1, customer_id="cliente-1")
+    second["customer"]["name"] = "Maria Souza"
+    bulk_insert_order(second, "PLACED", db)
+    db.commit()
+    customer = db.query(OrderCustomerORM).one()
+    assert customer.name == "Maria Souza"
+    assert db.query(OrderMerchantORM).count() == 1
+
+def test_customer_without_id_keeps_its_own_row(db):
+    from models.order import OrderORM
+
+    names = ["Ana", "Bia"]
+    for seq, name in enumerate(names):
+        payload = make_order_payload(seq=seq)
+        payload["customer"].pop("id")
+        payload["customer"]["name"] = name
+        bulk_insert_order(payload, "PLACED", db)
+    db.commit()
+    orders = db.query(OrderORM).order_by(OrderORM.id).all()
+    assert [order.customer.name for order in orders] == names
+    assert orders[0].customer_id != orders[1].customer_id
@@ -0,0 +1,79 @@
+from benchmarks.fixtures import StatementCounter, make_order_payload
+from core import order_storage
+from core.order_writer import bulk_insert_order
+
+def _store(db, *size, seq=0, mode="normalized", **kwargs):
+    payload = make_order_payload(*size, seq=seq, **kwargs)
+    bulk_insert_order(payload, "PLACED", db, mode=mode)
+    db.commit()
+    return payload["id"]
+
+def test_order_detail_loads_the_graph_in_a_fixed_number_of_queries(db, api, monkeypatch):
+    from database import engine
+
+    monkeypatch.setattr(order_storage, "ORDER_STORAGE_MODE", "normalized")
+    small, large = _store(db, 1, 1, 1, seq=0), _store(db, 25, 3, 2, seq=1)
+    counter = StatementCounter(engine)
+    counts = []
+    for order_id in (small, large):
+        counter.reset()
+        response = api.get(f"/orders/{order_id}")
+        assert response.status_code == 200
+        counts.append(counter.count)
+    # JOIN de loja/cliente/entrega + uma query por nível (itens, opções, personalizações, pagamentos, taxas)
+    assert counts == [6, 6]
+    body = response.json()
+    assert len(body["items"]) == 25 and len(body["items"][0]["options"][0]["customizations"]) == 2
+
+def test_order_detail_is_cached_and_answers_conditional_gets(db, api):
+    from database import engine
+    from core.order import invalidate_order_cache
+    from models.order import OrderORM
+
+    order_id = _store(db, 2, 1, 1)
+    first = api.get(f"/orders/{order_id}")
+    etag = first.headers["ETag"]
+    counter = StatementCounter(engine)
+    again = api.get(f"/orders/{order_id}")
+    assert again.content == first.content and again.headers["ETag"] == etag
+    assert counter.count == 0  # veio do cache
+
+    not_modified = api.get(f"/orders/{order_id}", headers={"If-None-Match": f'W/{etag}, "outro"'})
+    assert not_modified.status_code == 304 and not_modified.content == b""
+    assert not_modified.headers["ETag"] == etag
+
+    db.query(OrderORM).filter_by(order_id=order_id).update({"status": "accepted"})
+    db.commit()
+    invalidate_order_cache(order_id)
+    changed = api.get(f"/orders/{order_id}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+    assert changed.json()["fullCode"] == "accepted"
+    assert api.get("/orders/nao-existe").status_code == 404
+
+def test_order_listing_pages_with_keyset_cursors(db, api):
+    from datetime import datetime
+
+    created_at = datetime(2026, 3, 1, 10, 0)
+    # Três pedidos no mesmo instante: o id desempata a ordem e o cursor
+    ids = [
+        _store(db, 1, 0, 0, seq=seq, created_at=created_at if seq < 3 else None,
+               merchant_id="loja-b" if seq % 2 else "loja-a", mode="raw")
+        for seq in range(7)
+    ]
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        page = api.get("/orders", params=params).json()
+        assert len(page["items"]) <= 3
+        seen += [item["id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    # Mais recentes primeiro (os de março); nos empatados, o id maior antes
+    assert seen == list(reversed(ids[:3])) + list(reversed(ids[3:]))
+
+    filtered = api.get("/orders", params={"merchant_id": "loja-b", "limit": 50}).json()
+    assert [item["id"] for item in filtered["items"]] == [ids[1], ids[5], ids[3]]
+    assert {item["merchantId"] for item in filtered["items"]} == {"loja-b"}
+    assert filtered["next_cursor"] is None
+    assert api.get("/orders", params={"cursor": "lixo"}).status_code == 400
@@ -0,0 +1,21 @@
+import asyncio
+import threading
+import pytest
+from core.bounded_pool import BoundedPool
+from core.password_pool import PasswordPoolFull, password_verify_seconds
+
+def test_rejects_when_queue_is_full():
+    release = threading.Event()
+
+    async def run():
+        pool = BoundedPool("password_hash", workers=1, max_pending=2, full_error=PasswordPoolFull)
+        tasks = [asyncio.create_task(pool.submit(password_verify_seconds, release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        with pytest.raises(PasswordPoolFull):
+            await pool.submit(password_verify_seconds, release.wait)
+        release.set()
+        assert await asyncio.gather(*tasks) == [True, True]
+        assert pool.pending == 0
+        await pool.stop()
+
+    asyncio.run(run())
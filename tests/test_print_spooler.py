@@ -0,0 +1,104 @@
+from printing import spooler as module
+from printing.backends import PrinterBackend
+from printing.spooler import PrintSpooler, enqueue_print
+
+class FakeBackend(PrinterBackend):
+    def __init__(self, status):
+        self.printer_status = status
+        self.calls = []
+
+    async def status(self, printer_id):
+        self.calls.append(("status", printer_id))
+        return self.printer_status
+
+    async def print_zpl(self, printer_id, zpl, title="Etiqueta"):
+        self.calls.append(("print", printer_id))
+
+def _enqueue_and_drain(run_async, keys):
+    from database import AsyncSessionLocal
+
+    async def scenario():
+        async with AsyncSessionLocal() as session:
+            for key in keys:
+                await enqueue_print(session, f"^XA^FD{key}^FS^XZ", printer_id="p1", dedupe_key=key)
+            await session.commit()
+        return await PrintSpooler().drain_once()
+    return run_async(scenario())
+
+def test_paused_printer_holds_jobs_without_spending_attempts(db, run_async, monkeypatch):
+    from models.print_job import PrintJobORM
+
+    backend = FakeBackend({"paused": True, "paper_out": False, "graphics_stored": 1})
+    monkeypatch.setattr(module, "get_printer_backend", lambda: backend)
+    assert _enqueue_and_drain(run_async, ["a", "b"]) == 2
+    assert backend.calls == [("status", "p1")]
+    jobs = db.query(PrintJobORM).all()
+    assert [(job.status, job.attempts) for job in jobs] == [("pending", 0), ("pending", 0)]
+    assert all("paused" in job.last_error for job in jobs)
+
+def test_status_is_checked_before_each_batch(db, run_async, monkeypatch):
+    from models.print_job import PrintJobORM
+
+    backend = FakeBackend(None)  # backend que não informa status: imprime direto
+    monkeypatch.setattr(module, "get_printer_backend", lambda: backend)
+    assert _enqueue_and_drain(run_async, ["c", "d"]) == 2
+    assert backend.calls == [("status", "p1"), ("print", "p1")]
+    assert [job.status for job in db.query(PrintJobORM)] == ["done", "done"]
+
+def test_batches_for_one_printer_run_one_at_a_time(db, run_async, monkeypatch):
+    import asyncio
+    from models.print_job import PrintJobORM
+
+    class SlowBackend(FakeBackend):
+        active = peak = 0
+
+        async def print_zpl(self, printer_id, zpl, title="Etiqueta"):
+            SlowBackend.active += 1
+            SlowBackend.peak = max(SlowBackend.peak, SlowBackend.active)
+            await asyncio.sleep(0.01)
+            SlowBackend.active -= 1
+            await super().print_zpl(printer_id, zpl, title)
+
+    backend = SlowBackend(None)
+    monkeypatch.setattr(module, "get_printer_backend", lambda: backend)
+    monkeypatch.setattr(module, "PRINT_MAX_BATCH", 2)
+    assert _enqueue_and_drain(run_async, ["e", "f", "g", "h", "i"]) == 5
+    assert backend.calls == [("status", "p1"), ("print", "p1")] * 3
+    assert SlowBackend.peak == 1
+    assert [job.status for job in db.query(PrintJobORM)] == ["done"] * 5
+
+def test_failed_batch_holds_the_rest_of_the_printer_queue(db, run_async, monkeypatch):
+    from models.print_job import PrintJobORM
+
+    class FailingBackend(FakeBackend):
+        async def print_zpl(self, printer_id, zpl, title="Etiqueta"):
+            raise ConnectionError("impressora desligada")
+
+    monkeypatch.setattr(module, "get_printer_backend", lambda: FailingBackend(None))
+    monkeypatch.setattr(module, "PRINT_MAX_BATCH", 2)
+    _enqueue_and_drain(run_async, ["j", "k", "l"])
+    jobs = {job.dedupe_key: job for job in db.query(PrintJobORM)}
+    assert [(jobs[key].status, jobs[key].attempts) for key in "jkl"] == [("pending", 1), ("pending", 1), ("pending", 0)]
+
+def test_finished_jobs_are_purged_after_retention(db, run_async):
+    from datetime import datetime, timedelta
+    from database import AsyncSessionLocal
+    from models.print_job import PrintJobORM
+
+    now = datetime.utcnow()
+    for key, status, age in [
+        ("novo", "done", timedelta(hours=1)), ("velho", "done", timedelta(hours=48)),
+        ("pendente", "pending", timedelta(days=60)), ("morto", "dead", timedelta(days=40)),
+    ]:
+        db.add(PrintJobORM(
+            printer_id="p1", dedupe_key=key, zpl="^XA^XZ", status=status, attempts=1, available_at=now,
+            created_at=now - age, printed_at=now - age if status == "done" else None
+        ))
+    db.commit()
+
+    async def scenario():
+        async with AsyncSessionLocal() as session:
+            return await module.purge_print_jobs(session)
+
+    assert run_async(scenario()) == 2
+    assert sorted(job.dedupe_key for job in db.query(PrintJobORM)) == ["novo", "pendente"]
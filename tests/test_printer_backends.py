@@ -0,0 +1,122 @@
+import asyncio
+from printing.backends import RawTcpBackend, parse_host_status, parse_raw_printers
+from printing.graphics import LOGO, graphics_tracker
+
+HOST_STATUS = (
+    b"\x02030,0,0,1245,000,0,0,0,000,0,0,0\x03\r\n"
+    b"\x02001,0,1,0,1,2,4,0,00000000,1,{graphics}\x03\r\n"
+    b"\x021234,0\x03\r\n"
+)
+
+class FakePrinter:
+    """
+    Impressora Zebra de mentira na porta 9100: guarda o que recebe e responde ao ~HS.
+    """
+    def __init__(self, graphics_stored=1):
+        self.received = b""
+        self.connections = 0
+        self.graphics_stored = graphics_stored
+        self._writers = []
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        self._writers.append(writer)
+        while data := await reader.read(65536):
+            self.received += data
+            if b"~HS" in data:
+                writer.write(HOST_STATUS.replace(b"{graphics}", b"%03d" % self.graphics_stored))
+                await writer.drain()
+        writer.close()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    def drop_connections(self):
+        for writer in self._writers:
+            writer.close()
+        self._writers = []
+
+    async def stop(self):
+        self.drop_connections()
+        self.server.close()
+        await self.server.wait_closed()
+
+async def _wait_for(condition):
+    for _ in range(100):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condição não atingida")
+
+def test_parse_raw_printers():
+    assert parse_raw_printers("cozinha=10.0.0.5:9101, balcao=10.0.0.6") == {
+        "cozinha": ("10.0.0.5", 9101),
+        "balcao": ("10.0.0.6", 9100),
+    }
+
+def test_parse_host_status():
+    status = parse_host_status(HOST_STATUS.replace(b"{graphics}", b"002"))
+    assert status["paper_out"] is False
+    assert status["head_up"] is True
+    assert status["graphics_stored"] == 2
+
+def test_raw_backend_reuses_connection_and_reconnects():
+    async def scenario():
+        printer = FakePrinter()
+        port = await printer.start()
+        backend = RawTcpBackend({"p1": ("127.0.0.1", port)})
+        graphics_tracker.mark_printer_reset("p1")
+        try:
+            await asyncio.gather(*[backend.print_zpl("p1", f"^XA^FO0,0{LOGO.recall()}^FS^FD{i}^FS^XZ") for i in range(5)])
+            await _wait_for(lambda: printer.received.count(b"^XZ") >= 5)
+            assert printer.connections == 1
+            # Primeiro job leva o logo junto, os outros só chamam ^XG
+            assert printer.received.count(LOGO.download().encode()) == 1
+
+            printer.drop_connections()
+            await asyncio.sleep(0.05)
+            await backend.print_zpl("p1", "^XA^FDdepois^FS^XZ")
+            await _wait_for(lambda: b"depois" in printer.received)
+            assert printer.connections == 2
+        finally:
+            await backend.close()
+            await printer.stop()
+    asyncio.run(scenario())
+
+def test_raw_backend_status_detects_printer_reset():
+    async def scenario():
+        printer = FakePrinter(graphics_stored=0)
+        port = await printer.start()
+        backend = RawTcpBackend({"p2": ("127.0.0.1", port)})
+        try:
+            await backend.print_zpl("p2", f"^XA^FO0,0{LOGO.recall()}^FS^XZ")
+            assert not graphics_tracker._needs_upload("p2", LOGO)
+            status = await backend.status("p2")
+            assert status["graphics_stored"] == 0
+            assert graphics_tracker._needs_upload("p2", LOGO)
+        finally:
+            await backend.close()
+            await printer.stop()
+    asyncio.run(scenario())
+
+def test_printnode_sends_the_graphic_once_until_reupload(monkeypatch):
+    import base64
+    from types import SimpleNamespace
+    from printing import printnode_utils
+
+    sent = []
+
+    class FakeClient:
+        async def post(self, url, json, auth):
+            sent.append(base64.b64decode(json["content"]).decode())
+            return SimpleNamespace(status_code=201, json=lambda: len(sent))
+
+    monkeypatch.setattr(printnode_utils, "get_http_client", lambda name: FakeClient())
+    graphics_tracker.mark_printer_reset(77)
+
+    async def scenario():
+        for _ in range(2):
+            await printnode_utils.imprimir_zpl_printnode(f"^XA^FO0,0{LOGO.recall()}^FS^XZ", printer_id=77, api_key="k")
+    asyncio.run(scenario())
+    assert [LOGO.download() in zpl for zpl in sent] == [True, False]
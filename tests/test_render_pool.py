@@ -0,0 +1,59 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+import pytest
+from core import metrics
+from printing.labelary_utils import gerar_png_etiqueta
+from printing.render_pool import (
+    RenderPoolFull, gerar_zpl_ifood_async, preview_pool, preview_seconds, render_pool
+)
+
+def _order():
+    return SimpleNamespace(
+        order_id="pedido-1", display_id="1234", order_amount=SimpleNamespace(value=50.0),
+        customer=SimpleNamespace(name="Maria"),
+        delivery=SimpleNamespace(
+            address_street="Rua A", address_number="10", address_complement=None,
+            address_neighborhood="Centro", address_city="São Paulo"
+        ),
+    )
+
+def test_full_preview_pool_rejects_without_blocking_order_labels(monkeypatch):
+    monkeypatch.setattr(preview_pool, "max_pending", 2)
+    release = threading.Event()
+
+    async def run():
+        rejected, waited = preview_pool.rejected.value, preview_pool.queue_wait.count
+        blocked = [asyncio.create_task(preview_pool.submit(preview_seconds, release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        assert metrics.snapshot()["label_preview_pending"] == 2
+        with pytest.raises(RenderPoolFull):
+            await gerar_png_etiqueta("^XA^XZ")
+        with pytest.raises(RenderPoolFull):
+            await gerar_zpl_ifood_async(_order(), preview=True)
+        assert preview_pool.rejected.value == rejected + 2
+
+        # A etiqueta do pedido novo roda no outro pool, que continua livre
+        zpl = await gerar_zpl_ifood_async(_order(), graphics_mode="inline")
+        assert zpl.startswith("^XA") and render_pool.pending == 0
+
+        release.set()
+        assert await asyncio.gather(*blocked) == [True, True]
+        assert preview_pool.pending == 0
+        assert preview_pool.queue_wait.count == waited + 2
+        await preview_pool.stop()
+        await render_pool.stop()
+
+    asyncio.run(run())
+
+def test_label_preview_returns_503_when_preview_pool_is_full(db, api, monkeypatch):
+    from benchmarks.fixtures import make_order_payload
+    from core.order_writer import bulk_insert_order
+
+    payload = make_order_payload(seq=1)
+    bulk_insert_order(payload, "PLACED", db)
+    db.commit()
+    monkeypatch.setattr(preview_pool, "max_pending", 0)
+    response = api.get(f"/orders/{payload['id']}/label", params={"format": "zpl"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
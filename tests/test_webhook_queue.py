@@ -0,0 +1,105 @@
+from sqlalchemy import select
+from core import webhook_queue as module
+from core.webhook_queue import WebhookWorkerPool, enqueue_event, requeue_dead_events
+
+def test_failed_event_does_not_break_the_rest_of_the_batch(db, run_async, monkeypatch):
+    from database import AsyncSessionLocal
+    from models.webhook import WebhookEventORM
+
+    handled = []
+
+    async def handler(payload, session):
+        # Abre transação, como os handlers reais, para o rollback ter efeito
+        await session.execute(select(WebhookEventORM.id).limit(1))
+        if payload["fail"]:
+            raise ValueError("boom")
+        handled.append(payload["n"])
+
+    monkeypatch.setitem(module._handlers, "test", handler)
+
+    async def scenario():
+        async with AsyncSessionLocal() as session:
+            for n, fail in enumerate((True, False, True, False)):
+                await enqueue_event(session, "test", {"n": n, "fail": fail})
+        return await WebhookWorkerPool(size=1)._drain_once("worker-1")
+
+    assert run_async(scenario()) == 4
+    assert handled == [1, 3]
+    events = {event.payload["n"]: event for event in db.query(WebhookEventORM)}
+    assert [events[n].status for n in range(4)] == ["pending", "done", "pending", "done"]
+    assert events[0].attempts == 1 and "boom" in events[0].last_error
+    assert events[1].last_error is None and events[1].processed_at is not None
+
+def test_event_goes_dead_after_max_attempts_and_can_be_requeued(db, run_async, monkeypatch):
+    from database import AsyncSessionLocal
+    from models.webhook import WebhookEventORM
+
+    async def handler(payload, session):
+        raise ValueError("sempre falha")
+
+    monkeypatch.setitem(module._handlers, "test", handler)
+    monkeypatch.setattr(module, "WEBHOOK_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(module, "WEBHOOK_RETRY_BACKOFF", 0)
+
+    async def scenario():
+        async with AsyncSessionLocal() as session:
+            await enqueue_event(session, "test", {"n": 0})
+        pool = WebhookWorkerPool(size=1)
+        drained = [await pool._drain_once("worker-1") for _ in range(3)]
+        async with AsyncSessionLocal() as session:
+            requeued = await requeue_dead_events(session, "test")
+        return drained, requeued
+
+    assert run_async(scenario()) == ([1, 1, 0], 1)
+    event = db.query(WebhookEventORM).one()
+    assert (event.status, event.attempts) == ("pending", 0)
+
+def test_queue_mode_acknowledges_and_worker_applies_event(db, run_async, monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from benchmarks.fixtures import make_order_payload
+    from core.order_writer import bulk_insert_order
+    from marketplace import ifood
+    from models.order import OrderORM
+    from models.webhook import WebhookEventORM
+
+    monkeypatch.setattr(ifood, "WEBHOOK_MODE", "queue")
+    payload = make_order_payload(seq=5001)
+    bulk_insert_order(payload, "PLACED", db)
+    db.commit()
+    app = FastAPI()
+    app.include_router(ifood.router, prefix="/webhook/ifood")
+
+    with TestClient(app) as client:
+        response = client.post("/webhook/ifood", json={"orderId": payload["id"], "fullCode": "CONFIRMED"})
+    assert response.status_code == 200 and response.json()["queued"] is True
+    assert db.query(OrderORM).one().status == "PLACED"  # só enfileirou
+
+    assert run_async(WebhookWorkerPool(size=1)._drain_once("worker-1")) == 1
+    db.expire_all()
+    assert db.query(WebhookEventORM).one().status == "done"
+    assert db.query(OrderORM).one().status == "accepted"
+
+def test_finished_events_are_purged_after_retention(db, run_async):
+    from datetime import datetime, timedelta
+    from core.webhook_queue import purge_webhook_events
+    from database import AsyncSessionLocal
+    from models.webhook import WebhookEventORM
+
+    now = datetime.utcnow()
+    for n, (status, age) in enumerate([
+        ("done", timedelta(hours=1)), ("done", timedelta(hours=30)), ("pending", timedelta(days=60)),
+        ("dead", timedelta(days=5)), ("dead", timedelta(days=40)),
+    ]):
+        db.add(WebhookEventORM(
+            source="test", payload={"n": n}, status=status, attempts=1, available_at=now - age,
+            created_at=now - age, processed_at=now - age if status == "done" else None
+        ))
+    db.commit()
+
+    async def scenario():
+        async with AsyncSessionLocal() as session:
+            return await purge_webhook_events(session)
+
+    assert run_async(scenario()) == 2
+    assert sorted(event.payload["n"] for event in db.query(WebhookEventORM)) == [0, 2, 3]
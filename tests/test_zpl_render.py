@@ -0,0 +1,113 @@
+import io
+import os
+import pytest
+import qrcode
+from types import SimpleNamespace
+from PIL import Image, ImageChops
+from printing import zpl_render
+from printing.graphics import LOGO
+from printing.zpl_utils import encode_graphic_data, gerar_zpl_ifood
+
+GOLDEN_DIR = os.path.join(os.path.dirname(__file__), "golden")
+# UPDATE_GOLDEN=1 python -m pytest tests/test_zpl_render.py regrava as imagens de referência
+UPDATE_GOLDEN = os.getenv("UPDATE_GOLDEN") == "1"
+# Fração de pixels que pode divergir (diferenças de rasterização entre versões do FreeType)
+GOLDEN_TOLERANCE = 0.005
+
+PRIMITIVES = (
+    "^XA^CI28"
+    "^FO20,20^GB360,200,4^FS"
+    "^FO40,40^GB100,60,60^FS"
+    "^FO160,40^GB200,60,3,B,4^FS"
+    "^FO40,120^A0N,40,40^FDLollapet 123^FS"
+    "^FO40,170^A0N,30,20^FH^FDestreito _5F ok^FS"
+    "^FO20,240" + LOGO.inline() + "^FS"
+    "^FO250,240^BQN,2,4^FDMA,https://lolla.pet^FS"
+    "^XZ"
+)
+
+@pytest.fixture(autouse=True)
+def bundled_font(monkeypatch):
+    # As imagens de referência usam a fonte embutida do Pillow, igual em qualquer máquina
+    monkeypatch.setattr(zpl_render, "PREVIEW_FONT_PATH", None)
+    zpl_render._font.cache_clear()
+    yield
+    zpl_render._font.cache_clear()
+
+def _order():
+    return SimpleNamespace(
+        order_id="4f6c9a3e-3a1b-4f1e-9d9a-6c1f0b3e2a10",
+        display_id="1234",
+        order_amount=59.9,
+        customer=SimpleNamespace(name="Maria"),
+        delivery=SimpleNamespace(
+            address_street="Rua das Flores", address_number="123", address_complement="Casa 2",
+            address_neighborhood="Centro", address_city="São Paulo"
+        ),
+    )
+
+def _diff_ratio(a, b):
+    assert a.size == b.size
+    diff = ImageChops.difference(a.convert("L"), b.convert("L"))
+    return sum(1 for value in diff.getdata() if value) / (a.width * a.height)
+
+def _assert_golden(name, image):
+    path = os.path.join(GOLDEN_DIR, name)
+    if UPDATE_GOLDEN or not os.path.exists(path):
+        os.makedirs(GOLDEN_DIR, exist_ok=True)
+        image.save(path)
+        if not UPDATE_GOLDEN:
+            pytest.fail(f"Imagem de referência {name} não existia; gerada agora, confira e rode de novo")
+    with Image.open(path) as golden:
+        assert _diff_ratio(image, golden) <= GOLDEN_TOLERANCE
+
+@pytest.mark.parametrize("name, zpl, size", [
+    ("primitives_50x40.png", PRIMITIVES, (50, 40)),
+    ("ifood_100x150.png", None, (100, 150)),
+])
+def test_render_matches_golden(name, zpl, size):
+    zpl = zpl or gerar_zpl_ifood(_order(), qr_mode="native", graphics_mode="stored")
+    labels = zpl_render.render_zpl(zpl, *size)
+    assert len(labels) == 1
+    assert labels[0].size == (size[0] * 8, size[1] * 8)
+    _assert_golden(name, labels[0])
+
+def test_stored_and_inline_logo_render_the_same():
+    order = _order()
+    stored = zpl_render.render_zpl(gerar_zpl_ifood(order, graphics_mode="stored"))[0]
+    inline = zpl_render.render_zpl(gerar_zpl_ifood(order, graphics_mode="inline"))[0]
+    assert _diff_ratio(stored, inline) == 0
+
+def test_graphic_compressions_render_the_same():
+    images = []
+    for compression in ("hex", "acs", "z64"):
+        data = encode_graphic_data(LOGO.bitmap, LOGO.row_bytes, compression)
+        zpl = f"^XA^FO10,10^GFA,{LOGO.total_bytes},{LOGO.total_bytes},{LOGO.row_bytes},{data}^FS^XZ"
+        images.append(zpl_render.render_zpl(zpl, 30, 30)[0])
+    assert _diff_ratio(images[0], images[1]) == 0
+    assert _diff_ratio(images[0], images[2]) == 0
+    assert images[0].getbbox() is not None
+
+def test_native_qr_matches_qrcode_matrix():
+    data = "https://lolla.pet/nfe/123"
+    image = zpl_render.render_zpl(f"^XA^FO8,8^BQN,2,3^FDMA,{data}^FS^XZ", 20, 20)[0]
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, border=0)
+    qr.add_data(data)
+    qr.make(fit=True)
+    for row, cells in enumerate(qr.get_matrix()):
+        for col, cell in enumerate(cells):
+            pixel = image.getpixel((8 + col * 3 + 1, 8 + row * 3 + 1))
+            assert (pixel == 0) == cell
+
+def test_field_hex_escape_with_utf8():
+    escaped = zpl_render.render_zpl("^XA^CI28^FO10,10^A0N,30,30^FH^FDA_C3_A7_5F^FS^XZ", 30, 10)[0]
+    literal = zpl_render.render_zpl("^XA^CI28^FO10,10^A0N,30,30^FDAç_^FS^XZ", 30, 10)[0]
+    assert _diff_ratio(escaped, literal) == 0
+
+def test_multiple_labels_become_pdf_pages_and_png():
+    zpl = "\n".join([PRIMITIVES, PRIMITIVES])
+    assert len(zpl_render.render_zpl(zpl, 50, 40)) == 2
+    pdf = zpl_render.zpl_to_pdf(zpl, 50, 40)
+    assert pdf.startswith(b"%PDF") and b"/Count 2" in pdf
+    with Image.open(io.BytesIO(zpl_render.zpl_to_png(zpl, 50, 40, dpmm=12))) as png:
+        assert png.size == (600, 480)
@@ -0,0 +1,62 @@
+import random
+from PIL import Image
+from printing.zpl_utils import (
+    image_to_zpl, image_to_bitmap, pil_to_zpl, encode_graphic_data, decode_graphic_data
+)
+
+def _legacy_pil_to_zpl(image):
+    width, height = image.size
+    row_bytes = (width + 7) // 8
+    total_bytes = row_bytes * height
+    data = bytearray()
+    pixels = image.load()
+    for y in range(height):
+        byte = 0
+        bits = 0
+        for x in range(width):
+            if pixels[x, y] == 0:
+                byte |= (1 << (7 - bits))
+            bits += 1
+            if bits == 8:
+                data.append(byte)
+                byte = 0
+                bits = 0
+        if bits > 0:
+            data.append(byte)
+    return f"^GFA,{total_bytes},{total_bytes},{row_bytes},{data.hex().upper()}"
+
+def _random_image(width, height, seed=0):
+    rng = random.Random(seed)
+    image = Image.new("1", (width, height), 1)
+    pixels = image.load()
+    for y in range(height):
+        for x in range(width):
+            # blocos, para ter runs comprimíveis e linhas repetidas
+            if (x // 7 + y // 5 + rng.randint(0, 3)) % 3 == 0:
+                pixels[x, y] = 0
+    return image
+
+def test_pil_to_zpl_matches_legacy_encoder():
+    for width in (8, 13, 180, 203):
+        image = _random_image(width, 37, seed=width)
+        assert pil_to_zpl(image) == _legacy_pil_to_zpl(image)
+
+def test_compressed_encodings_round_trip():
+    image = _random_image(203, 120)
+    data, row_bytes = image_to_bitmap(image)
+    for compression in ("hex", "acs", "z64"):
+        encoded = encode_graphic_data(data, row_bytes, compression)
+        assert decode_graphic_data(encoded, len(data), row_bytes) == data
+
+def test_acs_handles_blank_and_solid_rows():
+    image = Image.new("1", (200, 4), 1)
+    for x in range(200):
+        image.putpixel((x, 2), 0)
+    zpl = image_to_zpl(image, compression="acs")
+    assert zpl == "^GFA,100,100,25,,:!,"
+
+def test_z64_has_crc():
+    zpl = image_to_zpl(_random_image(50, 50), compression="z64")
+    payload = zpl.split(",", 4)[4]
+    assert payload.startswith(":Z64:")
+    assert len(payload.rsplit(":", 1)[1]) == 4